@@ -0,0 +1,186 @@
+"""Admission control: bounded concurrency per class of route, shedding what does not fit.
+
+Routes are grouped into classes, such as the public catalogue, checkout, admin
+reports and password hashing. Each class admits at most `limit` requests at once
+and queues at most `max_queue` more. A request that finds the queue full, or that
+waits longer than `max_wait`, is answered at once with 503 and a Retry-After
+header. It does not add to the backlog on the event loop and the Mongo pool.
+
+One class is protected, normally checkout. `AdmissionController` watches its
+latency. Whenever the p95 over an interval exceeds the target, the limits of
+every adaptive class are cut multiplicatively. While it stays under the target,
+they grow back by one per interval, up to their configured limit. So the first
+thing a spike costs is report and catalogue capacity, not checkout latency.
+"""
+import asyncio
+import time
+from collections import deque
+from math import ceil
+from typing import Deque, Dict, List, Optional
+
+from fastapi.responses import JSONResponse
+
+from metrics import Registry
+from mongo_monitoring import percentile
+
+
+class Overloaded(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__(f"Overloaded; retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class AdmissionClass:
+    """A concurrency limit with a bounded FIFO queue in front of it."""
+
+    def __init__(self, name: str, limit: int, max_queue: int, max_wait: float,
+                 adaptive: bool = False, min_limit: int = 1):
+        self.name = name
+        self.max_limit = limit
+        self.limit = float(limit)
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.adaptive = adaptive
+        self.min_limit = min_limit
+        self.in_flight = 0
+        self.latency = 0.0  # moving average of admitted requests, for Retry-After
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> int:
+        # Roughly how long the current backlog takes to drain
+        return max(1, ceil(self.latency * (self.queued + 1) / max(int(self.limit), 1)))
+
+    async def acquire(self) -> None:
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            raise Overloaded(self.retry_after())
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.max_wait)
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                self.release()  # admitted just as it gave up
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                raise Overloaded(self.retry_after()) from None
+            raise
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self.admit_waiting()
+
+    def admit_waiting(self) -> None:
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def observe(self, seconds: float) -> None:
+        self.latency = seconds if not self.latency else 0.9 * self.latency + 0.1 * seconds
+
+
+class AdmissionController:
+    """The classes, plus the latency feedback that resizes them to protect one of them."""
+
+    def __init__(self, classes: List[AdmissionClass], protected: Optional[str] = None,
+                 target_latency: float = 0.25, interval: float = 1.0, decrease: float = 0.75,
+                 registry: Optional[Registry] = None):
+        self.classes: Dict[str, AdmissionClass] = {admission.name: admission for admission in classes}
+        self.protected = protected
+        self.target_latency = target_latency
+        self.interval = interval
+        self.decrease = decrease
+        self._samples: List[float] = []
+        self._window_started: Optional[float] = None
+        self._shed = registry.counter(
+            "http_requests_shed_total", "Requests refused with 503 by admission control, by class.", ["class"]
+        ) if registry else None
+        self._limits = registry.gauge(
+            "admission_limit", "Current concurrency limit by admission class.", ["class"]
+        ) if registry else None
+        for admission in classes:
+            self._report(admission)
+
+    def _report(self, admission: AdmissionClass) -> None:
+        if self._limits:
+            self._limits.set(admission.name, value=int(admission.limit))
+
+    def shed(self, name: str) -> None:
+        if self._shed:
+            self._shed.inc(name)
+
+    def observe(self, name: str, seconds: float, now: Optional[float] = None) -> None:
+        self.classes[name].observe(seconds)
+        if name == self.protected:
+            self._samples.append(seconds)
+        now = time.monotonic() if now is None else now
+        if self._window_started is None:
+            self._window_started = now
+        elif now - self._window_started >= self.interval:
+            self.adapt(percentile(self._samples, 95) if self._samples else None)
+            self._samples = []
+            self._window_started = now
+
+    def adapt(self, protected_p95: Optional[float]) -> None:
+        """Cut adaptive limits when the protected class is over target; otherwise grow them back."""
+        for admission in self.classes.values():
+            if not admission.adaptive:
+                continue
+            if protected_p95 is not None and protected_p95 > self.target_latency:
+                admission.limit = max(admission.min_limit, admission.limit * self.decrease)
+            else:
+                admission.limit = min(admission.max_limit, admission.limit + 1)
+                admission.admit_waiting()
+            self._report(admission)
+
+    def stats(self) -> Dict[str, dict]:
+        return {
+            name: {"limit": int(admission.limit), "in_flight": admission.in_flight, "queued": admission.queued}
+            for name, admission in self.classes.items()
+        }
+
+
+def admitted_route_class(route_class: type, controller: AdmissionController, routes: Dict[str, str]) -> type:
+    """Subclass `route_class` so the routes named in `routes` ("METHOD /path" -> class) pass admission."""
+
+    class AdmittedRoute(route_class):
+        def get_route_handler(self):
+            handler = super().get_route_handler()
+            classes = {
+                method: controller.classes[routes[f"{method} {self.path}"]]
+                for method in self.methods or () if f"{method} {self.path}" in routes
+            }
+            if not classes:
+                return handler
+
+            async def admitted_handler(request):
+                admission = classes.get(request.method)
+                if admission is None:
+                    return await handler(request)
+                try:
+                    await admission.acquire()
+                except Overloaded as e:
+                    controller.shed(admission.name)
+                    return JSONResponse(
+                        {"detail": "Server is busy, please retry shortly"}, status_code=503,
+                        headers={"Retry-After": str(e.retry_after)}
+                    )
+                started = time.perf_counter()
+                try:
+                    return await handler(request)
+                finally:
+                    admission.release()
+                    controller.observe(admission.name, time.perf_counter() - started)
+
+            return admitted_handler
+
+    return AdmittedRoute
@@ -0,0 +1,197 @@
+"""Hot and cold tiers for collections that only ever grow.
+
+Finished records older than a cutoff move from a hot collection, such as `orders`,
+to its archive, `orders_archive`, so the hot collection and its indexes stay
+small enough to live in memory. Archive collections are created with zstd block
+compression and only carry the indexes that the archive-aware reads need.
+
+`ArchivedCollection` reads both tiers as one collection. `find_one` tries the hot
+tier first. `find(...).sort(...).limit(...)` runs the query on each tier and merges
+the results. A document that is briefly in both tiers, while it is being moved, is
+returned once, from the hot tier, whatever the projection. `count_documents` adds
+up both tiers, so during a move it can over-count by up to one batch per run.
+
+`archive_batch` moves one batch. The copy is an idempotent upsert, acknowledged by
+a journaled majority before anything is deleted, and the delete repeats the
+archival filter, so an interrupted or concurrent run never loses a document. A
+document that changed so it no longer qualifies stays hot, and its copy is
+removed from the archive.
+"""
+import asyncio
+import heapq
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from pymongo import ReplaceOne, WriteConcern
+from pymongo.errors import CollectionInvalid
+
+ARCHIVE_SUFFIX = "_archive"
+ARCHIVE_STORAGE = {"wiredTiger": {"configString": "block_compressor=zstd"}}
+ARCHIVE_WRITE_CONCERN = WriteConcern(w="majority", j=True)
+
+
+def archive_name(name: str) -> str:
+    return name + ARCHIVE_SUFFIX
+
+
+async def create_archive_collections(database, names: List[str]) -> None:
+    """Create missing archive collections with compressed storage; existing ones are left alone."""
+    existing = set(await database.list_collection_names())
+    for name in names:
+        if archive_name(name) in existing:
+            continue
+        try:
+            await database.create_collection(archive_name(name), storageEngine=ARCHIVE_STORAGE)
+        except CollectionInvalid:
+            pass  # another worker created it first
+
+
+def sort_key(spec: List[Tuple[str, int]]):
+    fields = [field for field, _ in spec]
+    return lambda doc: tuple(doc.get(field) for field in fields)
+
+
+def merge_sorted(tiers: List[List[dict]], spec: List[Tuple[str, int]], limit: Optional[int] = None) -> List[dict]:
+    """Merge result lists already sorted by `spec`, keeping the first copy of each `id`.
+
+    Ties keep tier order, so a document found in both tiers comes from the first one.
+    """
+    directions = {direction for _, direction in spec}
+    if len(directions) > 1:
+        raise ValueError("Merged sorts must use one direction for every field")
+    merged = heapq.merge(*tiers, key=sort_key(spec), reverse=directions == {-1}) if spec else (
+        doc for tier in tiers for doc in tier
+    )
+    seen = set()
+    results = []
+    for doc in merged:
+        doc_id = doc.get("id")
+        if doc_id is not None:
+            if doc_id in seen:
+                continue
+            seen.add(doc_id)
+        results.append(doc)
+        if limit is not None and len(results) == limit:
+            break
+    return results
+
+
+def strip(doc: dict, fields: List[str]) -> dict:
+    for field in fields:
+        doc.pop(field, None)
+    return doc
+
+
+class MergedCursor:
+    """Enough of a Motor cursor for the app's reads: sort, limit, to_list and async iteration."""
+
+    def __init__(self, collections, query: dict, projection: Optional[dict]):
+        self._collections = collections
+        self._query = query
+        self._projection = projection
+        self._sort: List[Tuple[str, int]] = []
+        self._limit = 0
+
+    def sort(self, key, direction: int = 1) -> "MergedCursor":
+        self._sort = [(key, direction)] if isinstance(key, str) else list(key)
+        return self
+
+    def limit(self, limit: int) -> "MergedCursor":
+        self._limit = limit
+        return self
+
+    def _merge_projection(self) -> Tuple[Optional[dict], List[str]]:
+        """The projection plus `id` and the sort fields, which merging needs, and the fields to strip again."""
+        if not self._projection:
+            return self._projection, []
+        projection = dict(self._projection)
+        inclusive = any(value for field, value in projection.items() if field != "_id") or all(projection.values())
+        added = []
+        for field in ["id", *(field for field, _ in self._sort)]:
+            if inclusive and not projection.get(field):
+                projection[field] = 1
+                added.append(field)
+            elif not inclusive and field in projection:
+                del projection[field]
+                added.append(field)
+        return projection or None, added
+
+    def _cursor(self, collection, projection: Optional[dict]):
+        cursor = collection.find(self._query, projection)
+        if self._sort:
+            cursor = cursor.sort(self._sort)
+        return cursor.limit(self._limit) if self._limit else cursor
+
+    async def to_list(self, length: Optional[int]) -> List[dict]:
+        wanted = min(filter(None, [self._limit, length]), default=None)
+        projection, added = self._merge_projection()
+        tiers = await asyncio.gather(*(
+            self._cursor(collection, projection).to_list(wanted) for collection in self._collections
+        ))
+        return [strip(doc, added) for doc in merge_sorted(tiers, self._sort, wanted)]
+
+    async def __aiter__(self):
+        if self._sort:
+            for doc in await self.to_list(None):
+                yield doc
+            return
+        projection, added = self._merge_projection()
+        seen = set()
+        remaining = self._limit or None
+        for collection in self._collections:
+            async for doc in self._cursor(collection, projection):
+                if doc.get("id") is not None:
+                    if doc["id"] in seen:
+                        continue
+                    seen.add(doc["id"])
+                yield strip(doc, added)
+                if remaining is not None:
+                    remaining -= 1
+                    if remaining == 0:
+                        return
+
+
+class ArchivedCollection:
+    """A hot collection and its archive, read as one."""
+
+    def __init__(self, hot, archive):
+        self.hot = hot
+        self.archive = archive
+
+    @property
+    def name(self) -> str:
+        return self.hot.name
+
+    async def find_one(self, query: dict, projection: Optional[dict] = None) -> Optional[dict]:
+        doc = await self.hot.find_one(query, projection)
+        return doc if doc is not None else await self.archive.find_one(query, projection)
+
+    def find(self, query: dict, projection: Optional[dict] = None) -> MergedCursor:
+        return MergedCursor([self.hot, self.archive], query, projection)
+
+    async def count_documents(self, query: dict) -> int:
+        # Not de-duplicated: that would mean comparing every matching id across the tiers
+        return sum(await asyncio.gather(self.hot.count_documents(query), self.archive.count_documents(query)))
+
+
+async def archive_batch(hot, archive, query: dict, batch_size: int,
+                        on_moved: Optional[Callable[[List[dict]], Awaitable[None]]] = None) -> int:
+    """Move up to `batch_size` documents matching `query` to the archive; returns how many moved.
+
+    `on_moved`, if given, is called with the documents that left the hot collection.
+    """
+    batch = await hot.find(query).limit(batch_size).to_list(batch_size)
+    if not batch:
+        return 0
+    ids = [doc["_id"] for doc in batch]
+    archive = archive.with_options(write_concern=ARCHIVE_WRITE_CONCERN)
+    await archive.bulk_write([ReplaceOne({"_id": doc["_id"]}, doc, upsert=True) for doc in batch], ordered=False)
+    result = await hot.delete_many({"$and": [query, {"_id": {"$in": ids}}]})
+    kept = set()
+    if result.deleted_count < len(ids):
+        # Changed since it was copied and no longer qualifies: the hot copy is the real one
+        kept = {doc["_id"] for doc in await hot.find({"_id": {"$in": ids}}, {"_id": 1}).to_list(None)}
+        if kept:
+            await archive.delete_many({"_id": {"$in": list(kept)}})
+    if on_moved and result.deleted_count:
+        await on_moved([doc for doc in batch if doc["_id"] not in kept])
+    return result.deleted_count
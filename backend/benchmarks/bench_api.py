@@ -0,0 +1,386 @@
+"""
+Load benchmark for the API, run in-process against a local MongoDB.
+
+    python benchmarks/bench_api.py --scenario shop checkout admin crew login mixed \\
+        --duration 30 --concurrency 32 --output results/$(git rev-parse --short HEAD).json
+    python benchmarks/bench_api.py --scenario shop --compare results/abc1234.json
+
+Seeds a throwaway database (deterministic for a given --seed) and boots the app
+under uvicorn in a background thread. It then drives each scenario's request mix
+with --concurrency virtual users, for a warm-up and then --duration seconds. For
+every route it prints throughput and p50/p95/p99 latency. --output writes the
+same figures as JSON, with the commit, interpreter and MongoDB version. --compare
+prints each route's change against an earlier results file.
+
+Pass --url to drive an app that is already running; the database named by
+--mongo-url/--db is still seeded, so point both at the same deployment. A --db
+that already has data is refused unless --drop is passed, and is kept afterwards.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import bcrypt
+import httpx
+from pymongo import MongoClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from mongo_monitoring import percentile  # noqa: E402
+
+PASSWORD = "bench-password"
+CATEGORIES = ["indoor", "outdoor", "succulent", "flowering", "herb", "tree", "shrub", "bonsai"]
+ORDER_STATUSES = ["pending", "processing", "shipped", "completed", "cancelled"]
+
+
+# ============= SEED DATA =============
+
+def seed(db, rnd: random.Random, plants: int, customers: int, orders: int, crew: int) -> dict:
+    """Bulk-load a small but realistically shaped dataset; returns what the scenarios need to build requests."""
+    now = datetime.now(timezone.utc)
+    password = bcrypt.hashpw(PASSWORD.encode(), bcrypt.gensalt()).decode()
+
+    def user(user_id, role, email):
+        return {"id": user_id, "email": email, "password": password, "full_name": user_id.title(), "role": role,
+                "status": "active", "created_at": now - timedelta(days=rnd.uniform(0, 365))}
+
+    users = [user("bench-admin", "admin", "admin@bench.example.com")]
+    users += [user(f"crew-{i}", "crew", f"crew-{i}@bench.example.com") for i in range(crew)]
+    users += [user(f"customer-{i}", "customer", f"customer-{i}@bench.example.com") for i in range(customers)]
+    db.users.insert_many(users, ordered=False)
+
+    catalog = []
+    for i in range(plants):
+        catalog.append({
+            "id": str(uuid.UUID(int=rnd.getrandbits(128))), "sku": f"GA-BEN-{i:06d}", "batch_number": f"B-{i:06d}",
+            "name": f"Plant {i}", "scientific_name": f"Planta {i}", "category": rnd.choice(CATEGORIES),
+            "growth_stage": "mature", "location": "main", "price": round(rnd.uniform(3, 120), 2),
+            "cost": round(rnd.uniform(1, 40), 2), "quantity": rnd.choice([0] + [rnd.randint(1, 500)] * 9),
+            "reserved": 0, "min_stock": 10, "is_featured": rnd.random() < 0.03,
+            "created_at": now - timedelta(days=rnd.uniform(0, 720)), "updated_at": now,
+        })
+    db.plants.insert_many(catalog, ordered=False)
+
+    order_docs = []
+    for i in range(orders):
+        lines = rnd.sample(catalog, k=rnd.randint(1, 4))
+        items = [{"plant_id": p["id"], "name": p["name"], "quantity": rnd.randint(1, 5), "price": p["price"]} for p in lines]
+        subtotal = round(sum(item["quantity"] * item["price"] for item in items), 2)
+        order_docs.append({
+            "id": str(uuid.UUID(int=rnd.getrandbits(128))), "order_number": f"GA-BEN-{i:07d}",
+            "user_id": f"customer-{rnd.randrange(customers)}", "customer_name": "Bench Customer",
+            "customer_email": "orders@bench.example.com", "customer_phone": "555-0100", "customer_address": "1 Bench Road",
+            "items": items, "subtotal": subtotal, "discount": 0, "shipping": 0, "total": subtotal,
+            "order_type": "retail", "status": rnd.choice(ORDER_STATUSES),
+            "created_at": now - timedelta(days=rnd.uniform(0, 365)),
+        })
+    if order_docs:
+        db.orders.insert_many(order_docs, ordered=False)
+
+    projects = [{"id": f"bench-project-{i}", "name": f"Garden {i}", "status": "in_progress", "budget": 5000,
+                 "budget_variance": 5000, "actual_cost": 0, "labour_hours": 0, "created_at": now} for i in range(20)]
+    db.projects.insert_many(projects)
+    tasks, logs = [], []
+    for c in range(crew):
+        for n in range(15):
+            moment = now - timedelta(days=rnd.uniform(0, 60))
+            tasks.append({"id": str(uuid.UUID(int=rnd.getrandbits(128))), "project_id": rnd.choice(projects)["id"],
+                          "title": f"Task {n}", "assigned_to": f"crew-{c}", "start_date": moment, "end_date": moment,
+                          "status": rnd.choice(["pending", "in_progress", "completed"]), "created_at": moment,
+                          "updated_at": moment})
+            logs.append({"id": str(uuid.UUID(int=rnd.getrandbits(128))), "project_id": rnd.choice(projects)["id"],
+                         "crew_member_id": f"crew-{c}", "date": moment, "hours_worked": 6, "tasks_completed": "Planting",
+                         "created_at": moment, "updated_at": moment})
+    if tasks:
+        db.project_tasks.insert_many(tasks, ordered=False)
+        db.crew_logs.insert_many(logs, ordered=False)
+
+    return {
+        "plants": [(p["id"], p["name"], p["price"]) for p in catalog if p["quantity"] > 0],
+        "customers": customers,
+        "crew": crew,
+    }
+
+
+# ============= SCENARIOS =============
+# Each step returns (route label, method, url, request kwargs). A step may keep
+# per-user state, such as the crew sync token.
+
+def browse_products(rnd, ctx, state):
+    return "GET /api/products", "GET", "/api/products", {}
+
+
+def browse_category(rnd, ctx, state):
+    return "GET /api/products?category", "GET", "/api/products", {"params": {"category": rnd.choice(CATEGORIES)}}
+
+
+def view_product(rnd, ctx, state):
+    plant_id = rnd.choice(ctx["plants"])[0]
+    return "GET /api/products/{product_id}", "GET", f"/api/products/{plant_id}", {}
+
+
+def checkout(rnd, ctx, state):
+    lines = rnd.sample(ctx["plants"], k=min(len(ctx["plants"]), rnd.randint(1, 3)))
+    items = [{"plant_id": plant_id, "name": name, "quantity": rnd.randint(1, 3), "price": price} for plant_id, name, price in lines]
+    subtotal = round(sum(item["quantity"] * item["price"] for item in items), 2)
+    order = {"customer_name": "Bench Shopper", "customer_email": "shopper@bench.example.com", "customer_phone": "555-0101",
+             "customer_address": "2 Bench Road", "items": items, "subtotal": subtotal, "shipping": 5, "total": subtotal + 5}
+    return "POST /api/orders/public", "POST", "/api/orders/public", {"json": order}
+
+
+def admin_dashboard(rnd, ctx, state):
+    return "GET /api/admin/dashboard", "GET", "/api/admin/dashboard", {"headers": ctx["admin"]}
+
+
+def admin_orders(rnd, ctx, state):
+    return "GET /api/orders?status", "GET", "/api/orders", {"params": {"status": rnd.choice(ORDER_STATUSES)}, "headers": ctx["admin"]}
+
+
+def admin_inventory(rnd, ctx, state):
+    return "GET /api/inventory?category", "GET", "/api/inventory", {"params": {"category": rnd.choice(CATEGORIES)}, "headers": ctx["admin"]}
+
+
+def crew_sync(rnd, ctx, state):
+    if "crew" not in state:
+        state["crew"] = rnd.randrange(ctx["crew"])
+    params = {"since": state["sync_token"]} if state.get("sync_token") else {}
+    label = "GET /api/crew/sync?since" if params else "GET /api/crew/sync"
+    return label, "GET", "/api/crew/sync", {"params": params, "headers": ctx["crew_headers"][state["crew"]], "sync": True}
+
+
+def crew_me(rnd, ctx, state):
+    crew = state.setdefault("crew", rnd.randrange(ctx["crew"]))
+    return "GET /api/crew/me", "GET", "/api/crew/me", {"headers": ctx["crew_headers"][crew]}
+
+
+def login(rnd, ctx, state):
+    email = f"customer-{rnd.randrange(ctx['customers'])}@bench.example.com"
+    return "POST /api/auth/login", "POST", "/api/auth/login", {"json": {"email": email, "password": PASSWORD}}
+
+
+SCENARIOS = {
+    "shop": [(60, browse_products), (25, browse_category), (15, view_product)],
+    "checkout": [(40, view_product), (60, checkout)],
+    "admin": [(30, admin_dashboard), (40, admin_orders), (30, admin_inventory)],
+    "crew": [(70, crew_sync), (30, crew_me)],
+    "login": [(100, login)],
+    "mixed": [
+        (35, browse_products), (15, browse_category), (15, view_product), (8, checkout), (10, crew_sync),
+        (4, crew_me), (3, admin_dashboard), (3, admin_orders), (2, admin_inventory), (5, login),
+    ],
+}
+
+
+# ============= LOAD GENERATION =============
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+
+    def record(self, label: str, seconds: float, ok: bool):
+        self.latencies.setdefault(label, []).append(seconds)
+        if not ok:
+            self.errors[label] = self.errors.get(label, 0) + 1
+
+
+async def virtual_user(client, steps, ctx, rnd, deadline, recorder):
+    weights = [weight for weight, _ in steps]
+    state = {}
+    while time.perf_counter() < deadline:
+        step = rnd.choices(steps, weights=weights)[0][1]
+        label, method, url, kwargs = step(rnd, ctx, state)
+        is_sync = kwargs.pop("sync", False)
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            response, ok = None, False
+        recorder.record(label, time.perf_counter() - started, ok)
+        if is_sync and ok:
+            state["sync_token"] = response.json()["token"]
+
+
+async def drive(url, steps, ctx, concurrency, seconds, seed):
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+        deadline = time.perf_counter() + seconds
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            virtual_user(client, steps, ctx, random.Random(f"{seed}-{n}"), deadline, recorder) for n in range(concurrency)
+        ))
+        elapsed = time.perf_counter() - started
+    return recorder, elapsed
+
+
+def summarise(recorder: Recorder, elapsed: float) -> dict:
+    routes = {}
+    for label, latencies in sorted(recorder.latencies.items()):
+        routes[label] = {
+            "requests": len(latencies),
+            "errors": recorder.errors.get(label, 0),
+            "throughput_rps": round(len(latencies) / elapsed, 2),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+            "max_ms": round(max(latencies) * 1000, 2),
+        }
+    total = sum(route["requests"] for route in routes.values())
+    return {
+        "duration_s": round(elapsed, 2),
+        "requests": total,
+        "errors": sum(route["errors"] for route in routes.values()),
+        "throughput_rps": round(total / elapsed, 2),
+        "routes": routes,
+    }
+
+
+def print_summary(name: str, summary: dict, baseline: dict = None):
+    print(f"\n{name}: {summary['requests']} requests in {summary['duration_s']}s, "
+          f"{summary['throughput_rps']} req/s, {summary['errors']} errors")
+    print(f"  {'route':<36} {'reqs':>7} {'err':>5} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+          + (f" {'Δ p95':>8} {'Δ req/s':>8}" if baseline else ""))
+    for label, route in summary["routes"].items():
+        line = (f"  {label:<36} {route['requests']:>7} {route['errors']:>5} {route['throughput_rps']:>8} "
+                f"{route['p50_ms']:>8} {route['p95_ms']:>8} {route['p99_ms']:>8}")
+        before = (baseline or {}).get("routes", {}).get(label)
+        if before:
+            line += f" {change(before['p95_ms'], route['p95_ms']):>8} {change(before['throughput_rps'], route['throughput_rps']):>8}"
+        print(line)
+
+
+def change(before: float, after: float) -> str:
+    return f"{(after - before) / before * 100:+.1f}%" if before else "n/a"
+
+
+# ============= SETUP =============
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_app(port: int):
+    """Boot the app under uvicorn on a background thread; returns the server so it can be stopped."""
+    import uvicorn
+    import server
+
+    config = uvicorn.Config(server.app, host="127.0.0.1", port=port, log_level="warning", lifespan="on")
+    app_server = uvicorn.Server(config)
+    thread = threading.Thread(target=app_server.run, daemon=True)
+    thread.start()
+    while not app_server.started:
+        if not thread.is_alive():
+            raise SystemExit("The app failed to start; see the log above")
+        time.sleep(0.05)
+    return app_server, thread
+
+
+def git_commit() -> dict:
+    root = Path(__file__).resolve().parent.parent
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=root, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain"], cwd=root, capture_output=True, text=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+    return {"commit": commit, "dirty": dirty}
+
+
+def login_headers(url: str, email: str) -> dict:
+    response = httpx.post(f"{url}/api/auth/login", json={"email": email, "password": PASSWORD}, timeout=30)
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['token']}"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", nargs="+", choices=sorted(SCENARIOS), default=["mixed"])
+    parser.add_argument("--duration", type=float, default=20, help="measured seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=3, help="unmeasured seconds before each scenario")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--plants", type=int, default=2000)
+    parser.add_argument("--customers", type=int, default=500)
+    parser.add_argument("--orders", type=int, default=20000)
+    parser.add_argument("--crew", type=int, default=25)
+    parser.add_argument("--mongo-url", default=os.environ.get("BENCH_MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--db", help="database to seed (default: a throwaway one, dropped afterwards)")
+    parser.add_argument("--drop", action="store_true", help="drop --db first if it has data")
+    parser.add_argument("--url", help="benchmark an app that is already running instead of booting one")
+    parser.add_argument("--output", type=Path, help="write results as JSON")
+    parser.add_argument("--compare", type=Path, help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    database = args.db or f"bench_{uuid.uuid4().hex[:8]}"
+    mongo = MongoClient(args.mongo_url, serverSelectionTimeoutMS=3000)
+    mongo_version = mongo.server_info()["version"]
+    if args.db and mongo[database].list_collection_names():
+        if not args.drop:
+            sys.exit(f"Database {database} already has data; pass --drop to replace it")
+        mongo.drop_database(database)
+    started = time.perf_counter()
+    rnd = random.Random(args.seed)
+    ctx = seed(mongo[database], rnd, args.plants, args.customers, args.orders, args.crew)
+    print(f"Seeded {database} in {time.perf_counter() - started:.1f}s")
+
+    # The app reads its settings at import and startup, so they are set before either
+    os.environ.update({"MONGO_URL": args.mongo_url, "DB_NAME": database, "DATETIME_MIGRATION_ON_STARTUP": "false"})
+    app_server = thread = None
+    url = args.url
+    if not url:
+        port = free_port()
+        url = f"http://127.0.0.1:{port}"
+        app_server, thread = start_app(port)
+
+    baseline = json.loads(args.compare.read_text())["scenarios"] if args.compare else {}
+    results = {
+        "meta": {
+            **git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "mongodb": mongo_version,
+            "args": {k: str(v) if isinstance(v, Path) else v for k, v in vars(args).items()},
+        },
+        "scenarios": {},
+    }
+    try:
+        ctx["admin"] = login_headers(url, "admin@bench.example.com")
+        ctx["crew_headers"] = [login_headers(url, f"crew-{i}@bench.example.com") for i in range(args.crew)]
+        for name in args.scenario:
+            steps = SCENARIOS[name]
+            if args.warmup:
+                asyncio.run(drive(url, steps, ctx, args.concurrency, args.warmup, f"{args.seed}-warmup"))
+            recorder, elapsed = asyncio.run(drive(url, steps, ctx, args.concurrency, args.duration, args.seed))
+            summary = results["scenarios"][name] = summarise(recorder, elapsed)
+            print_summary(name, summary, baseline.get(name))
+    finally:
+        if app_server:
+            app_server.should_exit = True
+            thread.join(timeout=10)
+        if not args.db:
+            mongo.drop_database(database)
+        mongo.close()
+
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(results, indent=2))
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Carton packing benchmark over generated export shipments.
+
+    python benchmarks/bench_packing.py --lines 10 100 1000 --runs 5
+
+For each shipment size, prints the median packing time, the carton count and the
+volume lower bound (total unit volume / usable carton volume, with weight and
+dimensions ignored). The gap between cartons and bound shows the packing quality.
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+from math import ceil
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from packing import FREIGHT_RULES, PackItem, pack  # noqa: E402
+
+# (length, width, height, weight, quantity) ranges for typical nursery stock
+PLANT_PROFILES = [
+    ((8, 12), (8, 12), (10, 18), (0.1, 0.4), (20, 300)),    # plugs and seedlings
+    ((12, 20), (12, 20), (18, 35), (0.4, 1.5), (5, 120)),   # potted plants
+    ((20, 35), (20, 35), (30, 60), (1.5, 6.0), (1, 40)),    # shrubs
+    ((30, 45), (30, 45), (60, 120), (4.0, 15.0), (1, 6)),   # large specimens, some oversize
+]
+
+
+def generate_shipment(lines: int, rnd: random.Random) -> list:
+    items = []
+    for line in range(lines):
+        length, width, height, weight, quantity = rnd.choices(PLANT_PROFILES, weights=[4, 5, 2, 1])[0]
+        items.append(PackItem(
+            line=line,
+            name=f"Plant {line}",
+            quantity=rnd.randint(*quantity),
+            length=rnd.uniform(*length),
+            width=rnd.uniform(*width),
+            height=rnd.uniform(*height),
+            weight=rnd.uniform(*weight),
+        ))
+    return items
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lines", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--method", choices=sorted(FREIGHT_RULES), default="air")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rule = FREIGHT_RULES[args.method]
+    usable = rule.carton.volume * 0.85
+    rnd = random.Random(args.seed)
+    print(f"{'lines':>6} {'units':>8} {'median ms':>10} {'max ms':>8} {'cartons':>8} {'bound':>7} {'oversize':>9}")
+    for lines in args.lines:
+        items = generate_shipment(lines, rnd)
+        timings = []
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            plan = pack(items, rule)
+            timings.append((time.perf_counter() - started) * 1000)
+        oversize = sum(1 for c in plan["cartons"] if c["carton"] == "oversize")
+        packed_volume = sum(i.volume * i.quantity for i in items if i.line not in plan["oversize_lines"])
+        print(
+            f"{lines:>6} {sum(i.quantity for i in items):>8} {statistics.median(timings):>10.1f} "
+            f"{max(timings):>8.1f} {plan['total_boxes'] - oversize:>8} {ceil(packed_volume / usable):>7} {oversize:>9}"
+        )
+
+
+if __name__ == "__main__":
+    main()
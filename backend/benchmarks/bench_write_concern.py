@@ -0,0 +1,121 @@
+"""
+Insert latency by write concern on the app's write paths.
+
+    python benchmarks/bench_write_concern.py --mongo-url "mongodb://localhost:27017/?replicaSet=rs0" \\
+        --inserts 5000 --concurrency 16
+
+For each collection, times single-document inserts under each write concern, using
+documents shaped like the ones the routes write. It prints p50/p95/p99 latency and
+throughput. An arrow marks the concern `COLLECTION_WRITE_CONCERNS` gives that
+collection. Where that is not majority+j, a summary line compares the two.
+Run it against a replica set: on a standalone server, majority is acknowledged by
+the only member, so the tiers barely differ.
+"""
+import argparse
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+from pymongo import MongoClient, WriteConcern
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from mongo_monitoring import percentile  # noqa: E402
+
+CONCERNS = {
+    "w1": WriteConcern(w=1),
+    "w1+j": WriteConcern(w=1, j=True),
+    "majority": WriteConcern(w="majority"),
+    "majority+j": WriteConcern(w="majority", j=True),
+}
+
+
+def crew_log(n):
+    now = datetime.now(timezone.utc)
+    return {"id": str(uuid.uuid4()), "project_id": "bench-project", "crew_member_id": f"crew-{n % 50}", "date": now,
+            "hours_worked": 8.0, "tasks_completed": "Planting", "notes": None, "client_id": str(uuid.uuid4()),
+            "crew_member_name": "Bench Crew", "hourly_rate": 32.0, "labour_cost": 256.0, "created_at": now, "updated_at": now}
+
+
+def stock_movement(n):
+    return {"id": str(uuid.uuid4()), "plant_id": f"plant-{n % 1000}", "plant_name": "Bench Plant", "quantity_change": -2,
+            "new_quantity": 40, "reason": "Sale", "user_id": "bench-user", "user_name": "Bench User",
+            "created_at": datetime.now(timezone.utc)}
+
+
+def inquiry(n):
+    return {"id": str(uuid.uuid4()), "name": "Visitor", "email": f"visitor{n}@bench.example.com", "phone": None,
+            "company": None, "inquiry_type": "general", "message": "Please call me back about a garden makeover.",
+            "status": "new", "created_at": datetime.now(timezone.utc)}
+
+
+def order(n):
+    items = [{"plant_id": f"plant-{n % 1000}", "name": "Bench Plant", "quantity": 2, "price": 24.5}]
+    return {"id": str(uuid.uuid4()), "order_number": f"GA-BENCH-{n:07d}", "customer_name": "Bench Shopper",
+            "customer_email": "shopper@bench.example.com", "customer_phone": "555-0100", "customer_address": "1 Bench Road",
+            "items": items, "subtotal": 49.0, "discount": 0, "shipping": 7.5, "total": 56.5, "order_type": "retail",
+            "is_gift": False, "gift_message": None, "notes": None, "status": "pending",
+            "created_at": datetime.now(timezone.utc)}
+
+
+DOCUMENTS = {"crew_logs": crew_log, "stock_movements": stock_movement, "inquiries": inquiry, "orders": order}
+
+
+def run(collection, make_doc, inserts: int, concurrency: int):
+    def insert(n):
+        doc = make_doc(n)
+        started = time.perf_counter()
+        collection.insert_one(doc)
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(insert, range(inserts)))
+    return latencies, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-url", default="mongodb://localhost:27017")
+    parser.add_argument("--collections", nargs="+", choices=sorted(DOCUMENTS), default=list(DOCUMENTS))
+    parser.add_argument("--inserts", type=int, default=2000, help="inserts per collection and write concern")
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    os.environ.setdefault("MONGO_URL", args.mongo_url)
+    from server import COLLECTION_WRITE_CONCERNS
+
+    client = MongoClient(args.mongo_url, maxPoolSize=args.concurrency)
+    hello = client.admin.command("hello")
+    print(f"{'replica set ' + hello['setName'] if hello.get('setName') else 'standalone'}, "
+          f"{args.inserts} inserts x {args.concurrency} threads")
+    database = client[f"bench_wc_{uuid.uuid4().hex[:8]}"]
+    try:
+        print(f"  {'collection':<16} {'concern':<11} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'inserts/s':>10}  policy")
+        for name in args.collections:
+            policy = COLLECTION_WRITE_CONCERNS.get(name, WriteConcern())
+            results = {}
+            for label, concern in CONCERNS.items():
+                collection = database.get_collection(name, write_concern=concern)
+                run(collection, DOCUMENTS[name], min(200, args.inserts), args.concurrency)  # warm up
+                latencies, elapsed = run(collection, DOCUMENTS[name], args.inserts, args.concurrency)
+                results[label] = (percentile(latencies, 50), args.inserts / elapsed)
+                print(f"  {name:<16} {label:<11} {percentile(latencies, 50) * 1000:>8.2f} "
+                      f"{percentile(latencies, 95) * 1000:>8.2f} {percentile(latencies, 99) * 1000:>8.2f} "
+                      f"{args.inserts / elapsed:>10.0f}  {'<-' if concern == policy else ''}")
+            chosen = next((label for label, concern in CONCERNS.items() if concern == policy), None)
+            if chosen and chosen != "majority+j":
+                p50, rate = results[chosen]
+                base_p50, base_rate = results["majority+j"]
+                print(f"  {name:<16} {chosen} vs majority+j: p50 {p50 / base_p50:.2f}x, throughput {rate / base_rate:.2f}x")
+    finally:
+        client.drop_database(database.name)
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
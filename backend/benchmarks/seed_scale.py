@@ -0,0 +1,607 @@
+"""
+Bulk-load a production-sized dataset for load and query-plan testing.
+
+    python benchmarks/seed_scale.py --db greenacres_scale --drop
+    python benchmarks/seed_scale.py --db greenacres_small --scale 0.05 --seed 7
+
+With the default --scale 1 it writes 100k plants, 5M stock movements, 1M orders,
+20k AMC subscriptions with their visits and invoices, 3k partners with deals,
+and 1M crew logs against 10k projects. It also writes the users all of those
+refer to. Every document has the shape the server.py routes write.
+
+The data is skewed the way real traffic is:
+- a few hot SKUs account for most sales and stock movements
+- orders peak in spring and over the holidays, grow over the history, and land mostly in the evenings
+- repeat customers, busy crew members and top partners dominate their collections
+
+Project and plant totals agree with the crew logs and stock movements loaded for them.
+The same --seed, --scale and --as-of always produce the same documents.
+
+Documents are written in large unordered insert_many batches on --writers threads while
+the next batch is generated. Indexes are left to the app's startup, which builds them
+faster after the load than during it. Every user's password is --password.
+"""
+import argparse
+import random
+import sys
+import time
+import uuid
+import zlib
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import bcrypt
+import numpy as np
+from pymongo import MongoClient
+
+CATEGORIES = {
+    "indoor": ["Monstera", "Ficus", "Calathea", "Philodendron", "Pothos", "Sansevieria"],
+    "outdoor": ["Hydrangea", "Lavandula", "Salvia", "Hosta", "Heuchera", "Echinacea"],
+    "succulent": ["Echeveria", "Aloe", "Haworthia", "Crassula", "Sedum"],
+    "flowering": ["Rosa", "Camellia", "Gardenia", "Hibiscus", "Bougainvillea"],
+    "herb": ["Ocimum", "Mentha", "Rosmarinus", "Thymus", "Petroselinum"],
+    "tree": ["Acer", "Olea", "Citrus", "Magnolia", "Prunus"],
+    "shrub": ["Buxus", "Pittosporum", "Viburnum", "Photinia", "Azalea"],
+    "bonsai": ["Juniperus", "Ulmus", "Carmona", "Serissa"],
+}
+CATEGORY_WEIGHTS = [30, 20, 12, 12, 8, 6, 10, 2]
+GROWTH_STAGES = ["seedling", "juvenile", "mature", "flowering"]
+LOCATIONS = ["main", "greenhouse-a", "greenhouse-b", "shade-house", "field"]
+PROJECT_TYPES = ["landscaping", "maintenance", "irrigation", "hardscape", "vertical_garden"]
+SERVICE_TYPES = ["garden_maintenance", "lawn_care", "tree_care", "irrigation", "pest_control"]
+SERVICES = ["mowing", "pruning", "weeding", "fertilising", "pest inspection", "irrigation check", "leaf clearing"]
+WORK_DONE = ["Planting", "Pruning and shaping", "Irrigation install", "Turf laying", "Paving", "Mulching", "Site clean-up"]
+FREQUENCY_DAYS = {"monthly": 30, "quarterly": 90, "yearly": 365}
+
+# Relative volume by month: spring planting and the holidays are the busy seasons
+RETAIL_SEASON = [0.6, 0.7, 1.3, 1.8, 1.7, 1.2, 0.9, 0.8, 1.0, 1.1, 1.3, 1.6]
+FIELD_SEASON = [0.5, 0.6, 1.1, 1.4, 1.5, 1.4, 1.3, 1.2, 1.1, 1.0, 0.8, 0.5]
+# Relative volume by hour of day (UTC): shoppers come in the evening, crews log at end of shift
+RETAIL_HOURS = [2, 1, 1, 1, 1, 1, 2, 3, 4, 5, 6, 6, 7, 6, 6, 6, 6, 7, 9, 11, 12, 10, 6, 3]
+FIELD_HOURS = [0, 0, 0, 0, 0, 0, 1, 2, 2, 2, 2, 3, 4, 3, 3, 5, 8, 10, 8, 4, 2, 1, 0, 0]
+
+DEFAULT_COUNTS = {
+    "plants": 100_000,
+    "stock_movements": 5_000_000,
+    "customers": 200_000,
+    "orders": 1_000_000,
+    "amc_subscriptions": 20_000,
+    "partners": 3_000,
+    "partner_deals": 150_000,
+    "crew": 400,
+    "projects": 10_000,
+    "crew_logs": 1_000_000,
+}
+
+
+# ============= SAMPLING =============
+
+def rngs(seed: int, name: str):
+    """Independent generators per collection, so changing one count leaves the others' data alone."""
+    return random.Random(f"{seed}:{name}"), np.random.default_rng([seed, zlib.crc32(name.encode())])
+
+
+def make_id(rnd: random.Random) -> str:
+    return str(uuid.UUID(int=rnd.getrandbits(128), version=4))
+
+
+def suffix(rnd: random.Random, digits: int = 4) -> str:
+    return f"{rnd.getrandbits(4 * digits):0{digits}X}"
+
+
+def zipf(n: int, s: float) -> np.ndarray:
+    """Probabilities for ranks 0..n-1 falling off as 1/rank^s, so the first few items are hot."""
+    weights = np.arange(1, n + 1, dtype=float) ** -s
+    return weights / weights.sum()
+
+
+def day_weights(start: datetime, days: int, season: list, weekend: float, growth: float) -> np.ndarray:
+    weights = np.empty(days)
+    for i in range(days):
+        day = start + timedelta(days=i)
+        weights[i] = season[day.month - 1] * (weekend if day.weekday() >= 5 else 1) * (1 + growth * i / days)
+    return weights / weights.sum()
+
+
+def timeline(rng: np.random.Generator, n: int, start: datetime, days: int, season: list, hours: list,
+             weekend: float = 1.0, growth: float = 0.0):
+    """Yield (day index, [timestamps]) for n events spread over the history, in chronological order."""
+    hour_p = np.array(hours, dtype=float) / sum(hours)
+    for day, count in enumerate(rng.multinomial(n, day_weights(start, days, season, weekend, growth))):
+        if not count:
+            continue
+        seconds = np.sort(rng.choice(24, size=count, p=hour_p) * 3600 + rng.integers(0, 3600, size=count))
+        day_start = start + timedelta(days=day)
+        yield day, [day_start + timedelta(seconds=int(s)) for s in seconds]
+
+
+# ============= LOADING =============
+
+class Loader:
+    """Buffers documents per collection and writes full batches on a pool of writer threads."""
+
+    def __init__(self, db, batch_size: int, writers: int):
+        self.db = db
+        self.batch_size = batch_size
+        self.writers = writers
+        self.pool = ThreadPoolExecutor(max_workers=writers)
+        self.buffers = defaultdict(list)
+        self.in_flight = []
+        self.counts = defaultdict(int)
+
+    def add(self, collection: str, doc: dict):
+        buffer = self.buffers[collection]
+        buffer.append(doc)
+        if len(buffer) >= self.batch_size:
+            self._write(collection)
+
+    def add_many(self, collection: str, docs):
+        for doc in docs:
+            self.add(collection, doc)
+
+    def _write(self, collection: str):
+        batch, self.buffers[collection] = self.buffers[collection], []
+        self.counts[collection] += len(batch)
+        # Bounded so generation cannot run arbitrarily far ahead of the server
+        while len(self.in_flight) >= 2 * self.writers:
+            self.in_flight.pop(0).result()
+        self.in_flight.append(self.pool.submit(
+            self.db[collection].insert_many, batch, ordered=False, bypass_document_validation=True
+        ))
+
+    def flush(self):
+        for collection in [name for name, buffer in self.buffers.items() if buffer]:
+            self._write(collection)
+        for future in self.in_flight:
+            future.result()
+        self.in_flight = []
+
+    def close(self):
+        self.flush()
+        self.pool.shutdown()
+
+
+# ============= GENERATORS =============
+
+def seed_users(loader: Loader, seed: int, counts: dict, start: datetime, days: int, password: str) -> dict:
+    rnd, _ = rngs(seed, "users")
+    hashed = bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+
+    def user(role: str, n: int, **extra) -> dict:
+        doc = {
+            "id": make_id(rnd),
+            "email": f"{role}{n}@scale.example.com",
+            "password": hashed,
+            "full_name": f"{role.title()} {n}",
+            "phone": f"555-{rnd.randrange(10000):04d}",
+            "company": extra.pop("company", None),
+            "address": f"{rnd.randint(1, 999)} Garden Street",
+            "role": role,
+            "status": "active",
+            "avatar_url": None,
+            "created_at": start + timedelta(seconds=rnd.uniform(0, days * 86400)),
+            **extra,
+        }
+        loader.add("users", doc)
+        return doc
+
+    users = {
+        "admin": [user("admin", 0)],
+        "manager": [user("manager", n) for n in range(10)],
+        "vendor": [user("vendor", n, company=f"Vendor {n} Pty Ltd") for n in range(max(1, counts["partners"] // 20))],
+        "crew": [user("crew", n, hourly_rate=rnd.choice([28.0, 32.0, 35.0, 40.0, 45.0])) for n in range(counts["crew"])],
+        "partner": [
+            user("partner", n, company=f"Partner {n} Designs", commission_rate=rnd.choice([5, 8, 10, 10, 12, 15]))
+            for n in range(counts["partners"])
+        ],
+    }
+    # Customers are only needed as (id, name, email) on orders; the documents are not kept
+    users["customer"] = []
+    for n in range(counts["customers"]):
+        doc = user("customer", n)
+        users["customer"].append((doc["id"], doc["full_name"], doc["email"], doc["phone"], doc["address"]))
+    loader.flush()
+    return users
+
+
+def seed_plants_and_movements(loader: Loader, seed: int, counts: dict, start: datetime, days: int, staff: list) -> list:
+    """Stock movements are generated first so each plant's quantity is what its movements leave behind."""
+    rnd, rng = rngs(seed, "plants")
+    categories = rnd.choices(list(CATEGORIES), weights=CATEGORY_WEIGHTS, k=counts["plants"])
+    plants = []
+    for n, category in enumerate(categories):
+        created = start + timedelta(seconds=rnd.uniform(0, days * 86400 * 0.25))
+        genus = rnd.choice(CATEGORIES[category])
+        cost = round(rnd.lognormvariate(2.3, 0.7), 2)
+        plants.append({
+            "id": make_id(rnd),
+            "sku": f"GA-{category[:3].upper()}-{suffix(rnd, 6)}",
+            "batch_number": f"B-{created:%Y%m%d}-{suffix(rnd)}",
+            "name": f"{genus} {n}",
+            "scientific_name": f"{genus} {rnd.choice(['alba', 'rubra', 'compacta', 'nana', 'variegata'])}",
+            "category": category,
+            "growth_stage": rnd.choice(GROWTH_STAGES),
+            "price": round(cost * rnd.uniform(1.8, 3.2), 2),
+            "cost": cost,
+            "quantity": rnd.randint(0, 300),
+            "reserved": 0,
+            "min_stock": rnd.choice([5, 10, 10, 20, 50]),
+            "location": rnd.choice(LOCATIONS),
+            "description": None,
+            "care_info": None,
+            "image_url": None,
+            "length_cm": round(rnd.uniform(8, 45), 1),
+            "width_cm": round(rnd.uniform(8, 45), 1),
+            "height_cm": round(rnd.uniform(10, 150), 1),
+            "weight_kg": round(rnd.uniform(0.1, 15), 2),
+            "created_by": rnd.choice(staff)["id"],
+            "created_at": created,
+            "updated_at": created,
+        })
+
+    rnd, rng = rngs(seed, "stock_movements")
+    hot = zipf(len(plants), 1.1)
+    for _, moments in timeline(rng, counts["stock_movements"], start, days, RETAIL_SEASON, RETAIL_HOURS, 1.2, 0.5):
+        for index, moment in zip(rng.choice(len(plants), size=len(moments), p=hot), moments):
+            plant = plants[index]
+            roll = rnd.random()
+            if roll < 0.75:
+                change, reason = -rnd.randint(1, 5), "Sale"
+            elif roll < 0.92:
+                change, reason = rnd.randint(20, 200), "Restock"
+            elif roll < 0.96:
+                change, reason = -rnd.randint(1, 3), "Damaged"
+            else:
+                change, reason = rnd.randint(-10, 10), "Stock count adjustment"
+            if plant["quantity"] + change < 0:
+                change, reason = rnd.randint(50, 300), "Restock"
+            plant["quantity"] += change
+            plant["updated_at"] = moment
+            user = rnd.choice(staff)
+            loader.add("stock_movements", {
+                "id": make_id(rnd),
+                "plant_id": plant["id"],
+                "plant_name": plant["name"],
+                "quantity_change": change,
+                "new_quantity": plant["quantity"],
+                "reason": reason,
+                "user_id": user["id"],
+                "user_name": user["full_name"],
+                "created_at": moment,
+            })
+    loader.add_many("plants", plants)
+    loader.flush()
+    return [(plant["id"], plant["name"], plant["price"]) for plant in plants]
+
+
+def order_status(rnd: random.Random, age: timedelta) -> str:
+    if age < timedelta(days=2):
+        return rnd.choice(["pending", "pending", "processing"])
+    if age < timedelta(days=7):
+        return rnd.choice(["processing", "shipped", "shipped"])
+    return "cancelled" if rnd.random() < 0.06 else "completed"
+
+
+def seed_orders(loader: Loader, seed: int, counts: dict, start: datetime, days: int, as_of: datetime,
+                catalog: list, customers: list):
+    rnd, rng = rngs(seed, "orders")
+    hot = zipf(len(catalog), 1.1)
+    regulars = zipf(len(customers), 0.8)
+    for _, moments in timeline(rng, counts["orders"], start, days, RETAIL_SEASON, RETAIL_HOURS, 1.3, 0.8):
+        picks = iter(rng.choice(len(catalog), size=len(moments) * 6, p=hot))
+        buyers = iter(rng.choice(len(customers), size=len(moments), p=regulars))
+        for moment in moments:
+            wholesale = rnd.random() < 0.06
+            items = []
+            for _ in range(rnd.choices([1, 2, 3, 4, 6], weights=[45, 25, 15, 10, 5])[0]):
+                plant_id, name, price = catalog[next(picks)]
+                quantity = rnd.randint(10, 200) if wholesale else rnd.choices([1, 2, 3, 5], weights=[60, 25, 10, 5])[0]
+                items.append({"plant_id": plant_id, "name": name, "quantity": quantity, "price": price})
+            subtotal = round(sum(item["quantity"] * item["price"] for item in items), 2)
+            discount = round(subtotal * 0.1, 2) if wholesale or rnd.random() < 0.1 else 0
+            shipping = 0 if subtotal >= 75 else 7.5
+            is_gift = not wholesale and rnd.random() < 0.05
+            customer_id, name, email, phone, address = customers[next(buyers)]
+            order = {
+                "id": make_id(rnd),
+                "order_number": f"GA-{moment:%Y%m%d}-{suffix(rnd)}",
+            }
+            # Guest checkouts go through /orders/public, which stores no user_id
+            if wholesale or rnd.random() < 0.7:
+                order["user_id"] = customer_id
+            else:
+                name, email = f"Guest {rnd.randrange(10**6)}", f"guest{rnd.randrange(10**6)}@mail.example.com"
+            order.update({
+                "customer_name": name,
+                "customer_email": email,
+                "customer_phone": phone,
+                "customer_address": address,
+                "items": items,
+                "subtotal": subtotal,
+                "discount": discount,
+                "shipping": shipping,
+                "total": round(subtotal - discount + shipping, 2),
+                "order_type": "wholesale" if wholesale else "retail",
+                "is_gift": is_gift,
+                "gift_message": "Happy gardening!" if is_gift else None,
+                "notes": None,
+                "status": order_status(rnd, as_of - moment),
+                "created_at": moment,
+            })
+            loader.add("orders", order)
+    loader.flush()
+
+
+def seed_projects_and_crew_logs(loader: Loader, seed: int, counts: dict, start: datetime, days: int,
+                                crew: list, managers: list):
+    """Crew logs are generated first so each project's labour totals match its logs."""
+    rnd, rng = rngs(seed, "projects")
+    projects = []
+    for n in range(counts["projects"]):
+        begins = start + timedelta(days=rnd.uniform(0, days))
+        budget = round(rnd.lognormvariate(9.5, 0.8), 2)
+        projects.append({
+            "id": make_id(rnd),
+            "project_number": f"PRJ-{begins:%Y%m%d}-{suffix(rnd)}",
+            "name": f"Project {n}",
+            "client_id": None,
+            "client_name": f"Client {n}",
+            "client_email": f"client{n}@mail.example.com",
+            "client_phone": None,
+            "project_type": rnd.choices(PROJECT_TYPES, weights=[50, 20, 12, 12, 6])[0],
+            "description": None,
+            "site_address": f"{rnd.randint(1, 999)} Project Road",
+            "start_date": begins,
+            "end_date": begins + timedelta(days=rnd.randint(7, 120)),
+            "budget": budget,
+            "boq_items": [],
+            "status": "planning",
+            "progress": 0,
+            "actual_cost": 0.0,
+            "labour_hours": 0.0,
+            "budget_variance": budget,
+            "tasks_total": 0,
+            "tasks_completed": 0,
+            "created_by": rnd.choice(managers)["id"],
+            "created_at": begins - timedelta(days=rnd.randint(1, 30)),
+        })
+
+    rnd, rng = rngs(seed, "crew_logs")
+    busy = rng.gamma(2.0, 1.0, size=len(crew))
+    busy /= busy.sum()
+    big_jobs = zipf(len(projects), 0.9)
+    uploads = defaultdict(int)
+    for _, moments in timeline(rng, counts["crew_logs"], start, days, FIELD_SEASON, FIELD_HOURS, 0.3):
+        members = rng.choice(len(crew), size=len(moments), p=busy)
+        sites = rng.choice(len(projects), size=len(moments), p=big_jobs)
+        for member_index, project_index, moment in zip(members, sites, moments):
+            member, project = crew[member_index], projects[project_index]
+            hours = rnd.choice([4.0, 6.0, 7.5, 8.0, 8.0, 8.0, 9.0, 10.0])
+            rate = member["hourly_rate"]
+            log = {
+                "id": make_id(rnd),
+                "project_id": project["id"],
+                "crew_member_id": member["id"],
+                "date": moment.replace(hour=0, minute=0, second=0),
+                "hours_worked": hours,
+                "tasks_completed": rnd.choice(WORK_DONE),
+                "notes": None,
+            }
+            # Most logs arrive from the crew app's offline batch upload, which keys them by client_id
+            if rnd.random() < 0.6:
+                uploads[member["id"]] += 1
+                log.update({
+                    "client_id": f"{member['id'][:8]}-{uploads[member['id']]}",
+                    "crew_member_name": member["full_name"],
+                })
+            else:
+                log["created_by"] = rnd.choice([member, rnd.choice(managers)])["id"]
+            log.update({
+                "hourly_rate": rate,
+                "labour_cost": hours * rate,
+                "created_at": moment,
+                "updated_at": moment,
+            })
+            loader.add("crew_logs", log)
+            project["labour_hours"] += hours
+            project["actual_cost"] += hours * rate
+            project["budget_variance"] -= hours * rate
+            project["status"] = "in_progress"
+
+    ended = start + timedelta(days=days)
+    for project in projects:
+        if project["status"] == "in_progress" and project["end_date"] < ended - timedelta(days=30):
+            project["status"] = "completed"
+            project["progress"] = 100
+    loader.add_many("projects", projects)
+    loader.flush()
+
+
+def seed_amc(loader: Loader, seed: int, counts: dict, start: datetime, days: int, as_of: datetime,
+             crew: list, managers: list):
+    rnd, rng = rngs(seed, "amc")
+    horizon = as_of + timedelta(days=90)
+    for n in range(counts["amc_subscriptions"]):
+        frequency = rnd.choices(list(FREQUENCY_DAYS), weights=[60, 30, 10])[0]
+        step = timedelta(days=FREQUENCY_DAYS[frequency])
+        begins = (start + timedelta(days=int(days * rnd.random() ** 0.7))).replace(hour=0, minute=0, second=0)
+        amount = round(rnd.choice([89, 129, 189, 249, 399]) * step.days / 30, 2)
+        sub_id = make_id(rnd)
+        manager = rnd.choice(managers)
+        sub = {
+            "id": sub_id,
+            "contract_number": f"AMC-{begins:%Y%m%d}-{suffix(rnd)}",
+            "client_name": f"AMC Client {n}",
+            "client_email": f"amc{n}@mail.example.com",
+            "client_phone": f"555-{rnd.randrange(10000):04d}",
+            "service_type": rnd.choices(SERVICE_TYPES, weights=[45, 25, 12, 10, 8])[0],
+            "frequency": frequency,
+            "amount": amount,
+            "start_date": begins,
+            "property_address": f"{rnd.randint(1, 999)} Estate Avenue",
+            "services_included": rnd.sample(SERVICES, k=rnd.randint(2, 5)),
+            "notes": None,
+            "status": "active",
+        }
+
+        # A crew member keeps the same clients, with the odd visit covered by someone else
+        regular = rnd.choice(crew)
+        visits = 0
+        visit_date = begins
+        while visit_date < horizon:
+            created = min(visit_date, as_of) - timedelta(days=rnd.randint(1, 60))
+            visit = {
+                "id": make_id(rnd),
+                "subscription_id": sub_id,
+                "scheduled_date": visit_date,
+                "crew_assigned": (regular if rnd.random() < 0.85 else rnd.choice(crew))["id"],
+                "notes": None,
+                "status": "scheduled",
+                "schedule_key": f"{sub_id}:{visit_date.date().isoformat()}",
+                "auto_generated": True,
+                "created_by": manager["id"],
+                "created_at": created,
+                "updated_at": created,
+            }
+            if visit_date < as_of - timedelta(days=1):
+                done = visit_date + timedelta(hours=rnd.uniform(8, 17))
+                visit.update({
+                    "status": "completed",
+                    "completed_at": done,
+                    "completed_by": visit["crew_assigned"],
+                    "completion_notes": None,
+                    "updated_at": done,
+                })
+                visits += 1
+            loader.add("amc_visits", visit)
+            visit_date += step
+
+        # One invoice per billing period reached, each moving the next billing date on
+        next_billing = begins + step
+        while next_billing <= as_of:
+            issued = next_billing + timedelta(hours=rnd.uniform(0, 48))
+            loader.add("invoices", {
+                "id": make_id(rnd),
+                "invoice_number": f"INV-{issued:%Y%m%d}-{suffix(rnd)}",
+                "subscription_id": sub_id,
+                "client_name": sub["client_name"],
+                "client_email": sub["client_email"],
+                "amount": amount,
+                "service_type": sub["service_type"],
+                "status": "pending",
+                "due_date": issued + timedelta(days=15),
+                "created_at": issued,
+            })
+            next_billing += step
+
+        sub.update({
+            "next_billing_date": next_billing,
+            "total_visits": visits,
+            "created_by": manager["id"],
+            "created_at": begins - timedelta(days=rnd.randint(0, 14)),
+        })
+        loader.add("amc_subscriptions", sub)
+    loader.flush()
+
+
+def seed_partner_deals(loader: Loader, seed: int, counts: dict, start: datetime, days: int, as_of: datetime,
+                       partners: list, admins: list):
+    rnd, rng = rngs(seed, "partner_deals")
+    top = zipf(len(partners), 1.0)
+    for _, moments in timeline(rng, counts["partner_deals"], start, days, RETAIL_SEASON, RETAIL_HOURS, 0.6, 0.5):
+        for index, moment in zip(rng.choice(len(partners), size=len(moments), p=top), moments):
+            partner = partners[index]
+            value = round(rnd.lognormvariate(8.0, 0.9), 2)
+            deal = {
+                "id": make_id(rnd),
+                "partner_id": partner["id"],
+                "partner_name": partner["full_name"],
+                "client_name": f"Client {rnd.randrange(10**6)}",
+                "client_email": None,
+                "deal_value": value,
+                "description": None,
+                "commission_rate": partner["commission_rate"],
+                "commission": value * (partner["commission_rate"] / 100),
+                "status": "pending",
+                "locked": True,
+                "locked_at": moment,
+                "created_at": moment,
+            }
+            # Older deals have usually been approved, and most approved ones paid
+            age = (as_of - moment).days
+            if age > 14 and rnd.random() < 0.9:
+                approved = moment + timedelta(days=rnd.uniform(1, 10))
+                deal.update({"status": "approved", "approved_at": approved, "approved_by": rnd.choice(admins)["id"]})
+                if age > 45 and rnd.random() < 0.9:
+                    deal.update({"status": "paid", "paid_at": approved + timedelta(days=rnd.uniform(5, 30)),
+                                 "paid_by": rnd.choice(admins)["id"]})
+            loader.add("partner_deals", deal)
+    loader.flush()
+
+
+# ============= MAIN =============
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-url", default="mongodb://localhost:27017")
+    parser.add_argument("--db", required=True)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplies every default count")
+    parser.add_argument("--as-of", type=lambda s: datetime.fromisoformat(s).replace(tzinfo=timezone.utc),
+                        default=datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0),
+                        help="date the history ends on (default: today)")
+    parser.add_argument("--history-days", type=int, default=730)
+    parser.add_argument("--password", default="scale-password")
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--drop", action="store_true", help="drop the database first if it has data")
+    for name, count in DEFAULT_COUNTS.items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=int, dest=name, help=f"default {count:,} x scale")
+    args = parser.parse_args()
+
+    counts = {name: getattr(args, name) or max(1, round(count * args.scale)) for name, count in DEFAULT_COUNTS.items()}
+    mongo = MongoClient(args.mongo_url, w=1)
+    db = mongo[args.db]
+    if db.list_collection_names():
+        if not args.drop:
+            sys.exit(f"Database {args.db} already has data; pass --drop to replace it")
+        mongo.drop_database(args.db)
+
+    as_of, days = args.as_of, args.history_days
+    start = as_of - timedelta(days=days)
+    loader = Loader(db, args.batch_size, args.writers)
+    print(f"Seeding {args.db} with seed {args.seed}: {days} days of history up to {as_of:%Y-%m-%d}")
+
+    began = time.perf_counter()
+
+    def step(label, fn, *fn_args):
+        before, started = dict(loader.counts), time.perf_counter()
+        result = fn(loader, args.seed, counts, *fn_args)
+        elapsed = time.perf_counter() - started
+        for name, total in loader.counts.items():
+            written = total - before.get(name, 0)
+            if written:
+                print(f"  {label:<22} {name:<18} {written:>11,} docs")
+        total = sum(loader.counts.values()) - sum(before.values())
+        print(f"  {label:<22} {'':<18} {elapsed:>10.1f}s  ({total / elapsed:,.0f} docs/s)")
+        return result
+
+    try:
+        users = step("users", seed_users, start, days, args.password)
+        staff = users["admin"] + users["manager"] + users["crew"]
+        catalog = step("plants + movements", seed_plants_and_movements, start, days, staff)
+        step("orders", seed_orders, start, days, as_of, catalog, users["customer"])
+        step("projects + crew logs", seed_projects_and_crew_logs, start, days, users["crew"], users["manager"])
+        step("amc", seed_amc, start, days, as_of, users["crew"], users["manager"])
+        step("partner deals", seed_partner_deals, start, days, as_of, users["partner"], users["admin"])
+    finally:
+        loader.close()
+        mongo.close()
+
+    total = sum(loader.counts.values())
+    print(f"Loaded {total:,} documents in {time.perf_counter() - began:.0f}s; sign in as admin0@scale.example.com")
+
+
+if __name__ == "__main__":
+    main()
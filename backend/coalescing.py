@@ -0,0 +1,90 @@
+"""Single-flight coalescing for expensive read-only routes.
+
+When identical requests arrive together, only the first one runs the endpoint;
+the rest await the same result. Requests are identical when they hit the same
+endpoint with the same query and path parameters, as FastAPI parsed them, and
+the caller has the same role. Finished results can also be kept for
+`cache_seconds`, so a burst that arrives over a second or two is served by one
+computation as well.
+
+Only use this on endpoints whose answer depends on nothing but those inputs.
+Errors are shared with everyone waiting but never cached. Each worker process
+coalesces its own requests.
+"""
+import asyncio
+import functools
+import time
+from datetime import date
+from enum import Enum
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from metrics import Registry
+
+SCALARS = (str, int, float, bool, type(None), date, Enum)
+
+
+def request_key(endpoint: str, kwargs: Dict[str, Any]) -> Tuple[Hashable, ...]:
+    """Endpoint, caller role and every scalar parameter; handles such as `reads` are left out."""
+    user = kwargs.get("user")
+    params = []
+    for name, value in sorted(kwargs.items()):
+        if isinstance(value, SCALARS):
+            params.append((name, value))
+        elif isinstance(value, (list, tuple)) and all(isinstance(item, SCALARS) for item in value):
+            params.append((name, tuple(value)))
+    return endpoint, user.get("role") if isinstance(user, dict) else None, tuple(params)
+
+
+class SingleFlight:
+    """In-flight computations and short-lived results by request key."""
+
+    def __init__(self, cache_seconds: float = 0.0, registry: Optional[Registry] = None):
+        self.cache_seconds = cache_seconds
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._results: Dict[Hashable, Tuple[float, Any]] = {}
+        self._requests = registry.counter(
+            "http_coalesced_requests_total", "Requests to coalesced routes by how they were answered.",
+            ["endpoint", "outcome"]
+        ) if registry else None
+
+    def _count(self, endpoint: str, outcome: str) -> None:
+        if self._requests:
+            self._requests.inc(endpoint, outcome)
+
+    async def run(self, key: Hashable, compute) -> Any:
+        """Return `compute()`'s result, sharing one call among concurrent callers with the same key."""
+        endpoint = key[0] if isinstance(key, tuple) else str(key)
+        cached = self._results.get(key)
+        if cached and cached[0] > time.monotonic():
+            self._count(endpoint, "cached")
+            return cached[1]
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._compute(key, compute))
+            self._inflight[key] = task
+            self._count(endpoint, "computed")
+        else:
+            self._count(endpoint, "joined")
+        # A caller that disconnects must not cancel the computation the others are waiting on
+        return await asyncio.shield(task)
+
+    async def _compute(self, key: Hashable, compute) -> Any:
+        try:
+            result = await compute()
+            if self.cache_seconds > 0:
+                now = time.monotonic()
+                self._results = {k: v for k, v in self._results.items() if v[0] > now}
+                self._results[key] = (now + self.cache_seconds, result)
+            return result
+        finally:
+            self._inflight.pop(key, None)
+
+    def coalesce(self, endpoint):
+        """Decorate an async route endpoint; FastAPI still sees its original signature."""
+
+        @functools.wraps(endpoint)
+        async def coalesced(*args, **kwargs):
+            key = request_key(endpoint.__name__, kwargs)
+            return await self.run(key, lambda: endpoint(*args, **kwargs))
+
+        return coalesced
@@ -0,0 +1,202 @@
+"""In-memory per-crew booking indexes used for availability and double-booking checks.
+
+Project tasks and AMC visits assigned to a crew member are kept as half-open
+[start, end) intervals. Each crew member gets an IntervalIndex, so dispatch
+questions ("is X free", "who clashes with this booking") never scan the
+project_tasks or amc_visits collections.
+"""
+import random
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class Booking:
+    key: str
+    crew_id: str
+    kind: str
+    ref_id: str
+    start: datetime
+    end: datetime
+    label: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "kind": self.kind,
+            "id": self.ref_id,
+            "crew_id": self.crew_id,
+            "start": self.start,
+            "end": self.end,
+            "label": self.label,
+        }
+
+
+def day_inclusive_end(end: datetime) -> datetime:
+    """Date-only end dates mean "through that day", so push them to the next midnight."""
+    return end + timedelta(days=1) if end.time() == time(0) else end
+
+
+class _Node:
+    __slots__ = ("order", "booking", "end", "priority", "max_end", "left", "right")
+
+    def __init__(self, booking: Booking, priority: float):
+        self.order: Tuple[float, str] = (booking.start.timestamp(), booking.key)
+        self.booking = booking
+        self.end = booking.end.timestamp()
+        self.priority = priority
+        self.max_end = self.end
+        self.left: Optional["_Node"] = None
+        self.right: Optional["_Node"] = None
+
+    def update(self) -> "_Node":
+        self.max_end = max(self.end,
+                           self.left.max_end if self.left else float("-inf"),
+                           self.right.max_end if self.right else float("-inf"))
+        return self
+
+
+def _split(node: Optional[_Node], order: Tuple[float, str]) -> Tuple[Optional[_Node], Optional[_Node]]:
+    """Nodes before `order`, and the rest."""
+    if node is None:
+        return None, None
+    if node.order < order:
+        node.right, rest = _split(node.right, order)
+        return node.update(), rest
+    before, node.left = _split(node.left, order)
+    return before, node.update()
+
+
+def _merge(first: Optional[_Node], second: Optional[_Node]) -> Optional[_Node]:
+    """Join two treaps where every node of `first` comes before every node of `second`."""
+    if first is None or second is None:
+        return first or second
+    if first.priority > second.priority:
+        first.right = _merge(first.right, second)
+        return first.update()
+    second.left = _merge(first, second.left)
+    return second.update()
+
+
+class IntervalIndex:
+    """Intervals for one crew member in a treap ordered by start, with each subtree's max end.
+
+    A subtree whose max end is at or before a query's start holds no clash and is
+    skipped, as is everything after the first node starting at or after the query's
+    end. "Is anything booked" takes O(log n), listing k clashes O(k log n), and a
+    booking or release O(log n), so dispatch can interleave lookups and bookings freely.
+    """
+
+    def __init__(self):
+        self._root: Optional[_Node] = None
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def add(self, booking: Booking) -> None:
+        self._root = self._insert(self._root, _Node(booking, random.random()))
+        self._count += 1
+
+    def _insert(self, node: Optional[_Node], new: _Node) -> _Node:
+        if node is None or new.priority > node.priority:
+            new.left, new.right = _split(node, new.order)
+            return new.update()
+        if new.order < node.order:
+            node.left = self._insert(node.left, new)
+        else:
+            node.right = self._insert(node.right, new)
+        return node.update()
+
+    def remove(self, booking: Booking) -> None:
+        order = (booking.start.timestamp(), booking.key)
+        path = []
+        node = self._root
+        while node is not None and node.order != order:
+            path.append(node)
+            node = node.left if order < node.order else node.right
+        if node is None:
+            return
+        replacement = _merge(node.left, node.right)
+        if not path:
+            self._root = replacement
+        elif path[-1].left is node:
+            path[-1].left = replacement
+        else:
+            path[-1].right = replacement
+        for parent in reversed(path):
+            parent.update()
+        self._count -= 1
+
+    def is_free(self, start: datetime, end: datetime) -> bool:
+        lo, hi = start.timestamp(), end.timestamp()
+        node = self._root
+        while node is not None and node.max_end > lo:
+            starts_before_end = node.order[0] < hi
+            if starts_before_end and node.end > lo:
+                return False
+            if node.left is not None and node.left.max_end > lo:
+                # Something on the left ends after `lo`, and if this node starts before
+                # `hi` so does all of the left; either way nothing to the right can clash
+                node = node.left
+            elif starts_before_end:
+                node = node.right
+            else:
+                return True
+        return True
+
+    def overlapping(self, start: datetime, end: datetime) -> List[Booking]:
+        """The bookings that clash with [start, end), in start order."""
+        found: List[Booking] = []
+        self._collect(self._root, start.timestamp(), end.timestamp(), found)
+        return found
+
+    def _collect(self, node: Optional[_Node], lo: float, hi: float, found: List[Booking]) -> None:
+        if node is None or node.max_end <= lo:
+            return
+        self._collect(node.left, lo, hi, found)
+        if node.order[0] < hi:
+            if node.end > lo:
+                found.append(node.booking)
+            self._collect(node.right, lo, hi, found)
+
+
+class CrewCalendar:
+    """Bookings for every crew member, addressable by a stable key such as "task:<id>"."""
+
+    def __init__(self):
+        self._indexes: Dict[str, IntervalIndex] = {}
+        self._bookings: Dict[str, Booking] = {}
+
+    def clear(self) -> None:
+        self._indexes.clear()
+        self._bookings.clear()
+
+    def book(self, booking: Booking) -> None:
+        self.release(booking.key)
+        self._indexes.setdefault(booking.crew_id, IntervalIndex()).add(booking)
+        self._bookings[booking.key] = booking
+
+    def release(self, key: str) -> None:
+        booking = self._bookings.pop(key, None)
+        if booking:
+            self._indexes[booking.crew_id].remove(booking)
+
+    def conflicts(self, crew_id: str, start: datetime, end: datetime, exclude_key: Optional[str] = None) -> List[Booking]:
+        index = self._indexes.get(crew_id)
+        if not index:
+            return []
+        return [b for b in index.overlapping(start, end) if b.key != exclude_key]
+
+    def is_free(self, crew_id: str, start: datetime, end: datetime) -> bool:
+        index = self._indexes.get(crew_id)
+        return index is None or index.is_free(start, end)
+
+    def free_crew(self, crew_ids: Iterable[str], start: datetime, end: datetime) -> List[str]:
+        return [crew_id for crew_id in crew_ids if self.is_free(crew_id, start, end)]
+
+    def calendar(self, crew_ids: Iterable[str], start: datetime, end: datetime) -> Dict[str, List[Booking]]:
+        return {
+            crew_id: sorted(self.conflicts(crew_id, start, end), key=lambda b: b.start)
+            for crew_id in crew_ids
+        }
@@ -0,0 +1,178 @@
+"""Rendering of export documents (commercial invoices, packing lists, ...) to HTML or PDF.
+
+Everything here is pure and picklable so the server can run it in a process pool.
+The PDF writer is deliberately minimal: text-only pages in a base-14 font, which
+is all these shipping documents need and avoids a native rendering dependency.
+"""
+import hashlib
+import json
+from datetime import datetime
+from typing import List
+
+from jinja2 import Environment
+
+# Bump when the templates or layout change so cached files are regenerated
+RENDERER_VERSION = "1"
+
+# Fields that describe the cache itself rather than the document
+UNHASHED_FIELDS = {"_id", "render_cache"}
+
+DOC_TITLES = {
+    "commercial_invoice": "Commercial Invoice",
+    "packing_list": "Packing List",
+    "phytosanitary": "Phytosanitary Certificate Application",
+    "certificate_of_origin": "Certificate of Origin",
+}
+
+HTML_TEMPLATE = Environment(autoescape=True).from_string("""<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>{{ title }} {{ doc.doc_number }}</title>
+<style>
+  body { font-family: Helvetica, Arial, sans-serif; color: #1f2d1f; margin: 40px; }
+  h1 { font-size: 22px; margin-bottom: 4px; }
+  table { border-collapse: collapse; width: 100%; margin-top: 16px; }
+  th, td { border: 1px solid #c9d3c9; padding: 6px 8px; text-align: left; font-size: 13px; }
+  th { background: #eef3ee; }
+  .meta td { border: none; padding: 2px 8px 2px 0; }
+  .num { text-align: right; }
+</style>
+</head>
+<body>
+<h1>Green Arcadian &mdash; {{ title }}</h1>
+<table class="meta">
+  <tr><td>Document No.</td><td>{{ doc.doc_number }}</td></tr>
+  <tr><td>Date</td><td>{{ created }}</td></tr>
+  <tr><td>Customer</td><td>{{ doc.customer_name }}</td></tr>
+  <tr><td>Destination</td><td>{{ doc.destination_country }}</td></tr>
+  <tr><td>Shipping method</td><td>{{ doc.shipping_method }}</td></tr>
+  <tr><td>Status</td><td>{{ doc.status }}</td></tr>
+  {% if doc.order_id %}<tr><td>Order</td><td>{{ doc.order_id }}</td></tr>{% endif %}
+</table>
+<table>
+  <thead><tr><th>#</th><th>Item</th><th class="num">Quantity</th><th class="num">Weight (kg)</th></tr></thead>
+  <tbody>
+  {% for item in items %}
+    <tr><td>{{ loop.index }}</td><td>{{ item.name }}</td><td class="num">{{ item.quantity }}</td><td class="num">{{ item.weight }}</td></tr>
+  {% endfor %}
+  </tbody>
+</table>
+<table class="meta">
+  <tr><td>Total boxes</td><td>{{ doc.total_boxes }}</td></tr>
+  <tr><td>Total weight</td><td>{{ doc.total_weight }} kg</td></tr>
+</table>
+{% if doc.notes %}<p>{{ doc.notes }}</p>{% endif %}
+</body>
+</html>
+""")
+
+
+def content_key(doc: dict, fmt: str) -> str:
+    """Hash of everything that affects the rendered output."""
+    content = {k: v for k, v in doc.items() if k not in UNHASHED_FIELDS}
+    canonical = json.dumps(content, sort_keys=True, default=str)
+    return hashlib.sha256(f"{RENDERER_VERSION}:{fmt}:{canonical}".encode()).hexdigest()
+
+
+def _items(doc: dict) -> List[dict]:
+    return [
+        {
+            "name": item.get("name") or item.get("plant_name") or item.get("sku") or "",
+            "quantity": item.get("quantity", ""),
+            "weight": item.get("weight", ""),
+        }
+        for item in doc.get("items") or []
+    ]
+
+
+def _created(doc: dict) -> str:
+    created = doc.get("created_at")
+    return created.strftime("%Y-%m-%d") if isinstance(created, datetime) else str(created or "")[:10]
+
+
+def render_html(doc: dict) -> bytes:
+    title = DOC_TITLES.get(doc.get("doc_type"), str(doc.get("doc_type", "Export Document")).replace("_", " ").title())
+    return HTML_TEMPLATE.render(doc=doc, title=title, items=_items(doc), created=_created(doc)).encode("utf-8")
+
+
+def _pdf_text(value) -> str:
+    text = str(value).encode("latin-1", "replace").decode("latin-1")
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _pdf_lines(doc: dict) -> List[tuple]:
+    """(font size, text) pairs in reading order."""
+    title = DOC_TITLES.get(doc.get("doc_type"), str(doc.get("doc_type", "Export Document")).replace("_", " ").title())
+    lines = [(16, f"Green Arcadian - {title}"), (10, "")]
+    for label, value in [
+        ("Document No.", doc.get("doc_number")),
+        ("Date", _created(doc)),
+        ("Customer", doc.get("customer_name")),
+        ("Destination", doc.get("destination_country")),
+        ("Shipping method", doc.get("shipping_method")),
+        ("Status", doc.get("status")),
+        ("Order", doc.get("order_id")),
+    ]:
+        if value:
+            lines.append((10, f"{label:<18}{value}"))
+    lines += [(10, ""), (10, f"{'#':<5}{'Item':<50}{'Quantity':>10}{'Weight (kg)':>14}")]
+    for i, item in enumerate(_items(doc), start=1):
+        lines.append((10, f"{i:<5}{str(item['name'])[:48]:<50}{str(item['quantity']):>10}{str(item['weight']):>14}"))
+    lines += [
+        (10, ""),
+        (10, f"{'Total boxes':<18}{doc.get('total_boxes', '')}"),
+        (10, f"{'Total weight':<18}{doc.get('total_weight', '')} kg"),
+    ]
+    if doc.get("notes"):
+        lines += [(10, ""), (10, str(doc["notes"]))]
+    return lines
+
+
+def render_pdf(doc: dict) -> bytes:
+    page_height, margin, leading = 842, 50, 14
+    per_page = (page_height - 2 * margin) // leading
+    lines = _pdf_lines(doc)
+    pages = [lines[i:i + per_page] for i in range(0, len(lines), per_page)] or [[]]
+
+    # Objects: 1 catalog, 2 page tree, 3 font, then a (page, content) pair per page
+    objects = {1: None, 2: None, 3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Courier >>"}
+    page_ids = []
+    for n, page in enumerate(pages):
+        page_id, content_id = 4 + 2 * n, 5 + 2 * n
+        page_ids.append(page_id)
+        stream = ["BT"]
+        y = page_height - margin
+        for size, text in page:
+            stream.append(f"/F1 {size} Tf 1 0 0 1 {margin} {y} Tm ({_pdf_text(text)}) Tj")
+            y -= leading
+        stream.append("ET")
+        body = "\n".join(stream).encode("latin-1")
+        objects[content_id] = b"<< /Length %d >>\nstream\n%s\nendstream" % (len(body), body)
+        objects[page_id] = (
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+    objects[1] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids).encode()
+    objects[2] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for obj_id in sorted(objects):
+        offsets[obj_id] = len(out)
+        out += b"%d 0 obj\n%s\nendobj\n" % (obj_id, objects[obj_id])
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for obj_id in sorted(objects):
+        out += b"%010d 00000 n \n" % offsets[obj_id]
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def render_document(doc: dict, fmt: str) -> bytes:
+    if fmt == "html":
+        return render_html(doc)
+    if fmt == "pdf":
+        return render_pdf(doc)
+    raise ValueError(f"Unsupported format: {fmt}")
@@ -0,0 +1,187 @@
+"""Keeps per-process caches consistent when the app runs as several worker processes.
+
+Each worker holds its own in-memory state, such as the crew calendar. A cache
+registers under a topic with two callbacks: `refresh(keys)` re-reads the given
+keys from the database, and `reload()` rebuilds the whole cache.
+
+After writing, a worker publishes the keys it touched. With `MongoInvalidationBus`,
+every other worker receives them by tailing a capped collection. Each worker also
+publishes a heartbeat a few times per `max_staleness`. The collection is read in
+insertion order, so reading back its own heartbeat sent at T tells a worker it has
+applied everything published before T.
+
+A worker's caches are never more than `max_staleness` behind: `ensure_fresh()`
+rebuilds them whenever the tail has not been caught up for that long, for example
+while it is reconnecting. `LocalInvalidationBus` is the single-process stand-in,
+with nothing to tell.
+"""
+import asyncio
+import logging
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from bson import ObjectId
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid
+
+logger = logging.getLogger(__name__)
+
+Refresh = Callable[[List[str]], Awaitable[None]]
+Reload = Callable[[], Awaitable[None]]
+
+
+class LocalInvalidationBus:
+    """One process, so the worker that wrote is the only one caching and publishing is a no-op."""
+
+    def __init__(self):
+        self.worker_id = str(uuid.uuid4())
+        self._refreshers: Dict[str, Refresh] = {}
+        self._reloaders: Dict[str, Reload] = {}
+        # Applying events and rebuilding caches never interleave
+        self._lock = asyncio.Lock()
+
+    def topic(self, name: str, refresh: Refresh, reload: Reload) -> None:
+        self._refreshers[name] = refresh
+        self._reloaders[name] = reload
+
+    async def start(self, db) -> None:
+        await self.reload()
+
+    async def stop(self) -> None:
+        pass
+
+    async def publish(self, topic: str, keys: List[str]) -> None:
+        pass
+
+    async def ensure_fresh(self) -> None:
+        pass
+
+    def lag(self) -> float:
+        return 0.0
+
+    async def reload(self) -> None:
+        """Rebuild every cache from the database."""
+        async with self._lock:
+            for reload in self._reloaders.values():
+                await reload()
+
+
+class MongoInvalidationBus(LocalInvalidationBus):
+    """Invalidations published to a capped collection that every worker tails."""
+
+    def __init__(self, collection: str = "cache_invalidations", size_bytes: int = 4 * 1024 * 1024,
+                 max_staleness: float = 5.0, poll_interval: float = 0.5):
+        super().__init__()
+        self.collection_name = collection
+        self.size_bytes = size_bytes
+        self.max_staleness = max_staleness
+        self.poll_interval = poll_interval
+        self.collection = None
+        self.caught_up_at: Optional[float] = None
+        self._sent: Dict[ObjectId, float] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self, db) -> None:
+        try:
+            await db.create_collection(self.collection_name, capped=True, size=self.size_bytes)
+        except CollectionInvalid:
+            pass
+        self.collection = db[self.collection_name]
+        # A tailable cursor on an empty capped collection dies at once, so there is always a marker
+        if not await self.collection.find_one({}):
+            await self.publish(None, [])
+        position = await self._reload_from_latest()
+        self._tasks = [asyncio.create_task(self._tail(position)), asyncio.create_task(self._heartbeat())]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def publish(self, topic: Optional[str], keys: List[str]) -> None:
+        event_id = ObjectId()
+        self._sent[event_id] = time.monotonic()
+        await self.collection.insert_one({
+            "_id": event_id,
+            "topic": topic,
+            "keys": keys,
+            "origin": self.worker_id,
+            "published_at": datetime.now(timezone.utc),
+        })
+
+    def lag(self) -> float:
+        return float("inf") if self.caught_up_at is None else time.monotonic() - self.caught_up_at
+
+    async def ensure_fresh(self) -> None:
+        """Rebuild every cache if the tail has not been caught up within `max_staleness`."""
+        if self.lag() <= self.max_staleness:
+            return
+        started = time.monotonic()
+        async with self._lock:
+            # Another request may have rebuilt them while this one waited for the lock
+            if self.lag() <= self.max_staleness:
+                return
+            logger.warning(f"Cache invalidations are {self.lag():.1f}s behind; reloading caches")
+            for reload in self._reloaders.values():
+                await reload()
+            self.caught_up_at = max(self.caught_up_at or started, started)
+
+    async def _reload_from_latest(self):
+        """Rebuild the caches after noting the newest event, so anything published meanwhile is still applied."""
+        started = time.monotonic()
+        latest = await self.collection.find_one({}, {"_id": 1}, sort=[("$natural", -1)])
+        self._sent.clear()
+        await self.reload()
+        self.caught_up_at = started
+        return latest["_id"] if latest else None
+
+    async def _apply(self, event: dict) -> None:
+        if event.get("origin") == self.worker_id:
+            sent = self._sent.pop(event["_id"], None)
+            if sent is not None:
+                self.caught_up_at = max(self.caught_up_at or sent, sent)
+            return
+        refresh = self._refreshers.get(event.get("topic"))
+        if refresh is None or not event.get("keys"):
+            return
+        async with self._lock:
+            await refresh(event["keys"])
+
+    async def _tail(self, position) -> None:
+        while True:
+            try:
+                # _ids come from many processes and are not ordered, so a reopened cursor
+                # replays the collection in insertion order and skips up to `position`
+                cursor = self.collection.find({}, cursor_type=CursorType.TAILABLE_AWAIT)
+                cursor.max_await_time_ms(int(self.poll_interval * 1000))
+                found = position is None
+                while cursor.alive:
+                    async for event in cursor:
+                        if not found:
+                            found = event["_id"] == position
+                            continue
+                        position = event["_id"]
+                        await self._apply(event)
+                    if not found:
+                        raise LookupError("Missed invalidations: the capped collection wrapped past this worker")
+                await asyncio.sleep(self.poll_interval)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Cache invalidation tail failed ({e}); reloading caches")
+                await asyncio.sleep(self.poll_interval)
+                try:
+                    position = await self._reload_from_latest()
+                except Exception as e:
+                    logger.warning(f"Could not reload caches: {e}")
+
+    async def _heartbeat(self) -> None:
+        while True:
+            await asyncio.sleep(self.max_staleness / 4)
+            try:
+                await self.publish(None, [])
+            except Exception as e:
+                logger.warning(f"Could not publish cache heartbeat: {e}")
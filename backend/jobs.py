@@ -0,0 +1,239 @@
+"""A persistent job queue in the `jobs` collection, worked by asyncio tasks in every process.
+
+Long operations are enqueued as jobs instead of running inside a request, so a
+client that disconnects or a worker that restarts does not lose them. Each process
+runs `workers` tasks. A task claims the oldest due job with a single
+`find_one_and_update`. The claim takes a lease and a fresh lease token.
+
+While the handler runs, the lease is renewed every `lease_seconds / 3`, and
+`progress()` renews it too. Every write to the job is conditional on the token,
+so a worker that lost its lease, for example after a long pause, can no longer
+touch the job. Its handler is cancelled the next time a renewal fails.
+
+A job whose lease expires, because its process died, is claimed again by
+another worker. Handlers must therefore be safe to resume. Each attempt runs
+exactly once at a time, but a crash can make one attempt's work partly repeat.
+A failure is retried after an exponential backoff until `max_attempts` is
+reached. A job enqueued with a `key` exists at most once, whoever enqueues it.
+
+Job documents look like this:
+    {id, type, params, status: queued|running|completed|failed, attempts, max_attempts,
+     run_at, lease_until, lease_token, worker, progress, result, error, key,
+     created_by, created_at, updated_at, started_at, finished_at}
+"""
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+
+class LeaseLost(Exception):
+    """The job was claimed by another worker; this one must stop touching it."""
+
+
+class JobContext:
+    """What a handler sees of its job."""
+
+    def __init__(self, queue: "JobQueue", job: dict):
+        self._queue = queue
+        self.id = job["id"]
+        self.type = job["type"]
+        self.params = job.get("params") or {}
+        self.attempt = job["attempts"]
+        self.lease_token = job["lease_token"]
+
+    async def progress(self, **fields) -> None:
+        """Record progress fields and renew the lease."""
+        await self._queue._renew(self, {f"progress.{name}": value for name, value in fields.items()})
+
+
+Handler = Callable[[JobContext], Awaitable[Any]]
+
+
+class JobQueue:
+    def __init__(self, workers: int = 2, lease_seconds: float = 60.0, poll_seconds: float = 1.0,
+                 max_attempts: int = 5, backoff_seconds: float = 5.0, max_backoff_seconds: float = 600.0,
+                 clock: Callable[[], datetime] = partial(datetime.now, timezone.utc)):
+        self.workers = workers
+        self.lease = timedelta(seconds=lease_seconds)
+        self.poll_seconds = poll_seconds
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.clock = clock
+        self.worker_id = str(uuid.uuid4())
+        self._handlers: Dict[str, Handler] = {}
+        self._db = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._running: Set[str] = set()
+        self._wakeup = asyncio.Event()
+
+    def handler(self, job_type: str):
+        """Register the coroutine that runs jobs of `job_type`."""
+        def register(fn: Handler) -> Handler:
+            self._handlers[job_type] = fn
+            return fn
+        return register
+
+    @property
+    def busy(self) -> bool:
+        """Running a job here, or a job enqueued here has not been picked up yet."""
+        return bool(self._running) or self._wakeup.is_set()
+
+    async def create_indexes(self, db) -> None:
+        await db.jobs.create_index("id", unique=True)
+        await db.jobs.create_index([("status", 1), ("run_at", 1)])
+        await db.jobs.create_index([("status", 1), ("lease_until", 1)])
+        await db.jobs.create_index("key", unique=True, partialFilterExpression={"key": {"$exists": True}})
+        await db.jobs.create_index([("type", 1), ("created_at", -1)])
+
+    async def start(self, db) -> None:
+        self._db = db
+        self._wakeup = asyncio.Event()
+        self._tasks = {asyncio.create_task(self._work()) for _ in range(self.workers)}
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = set()
+
+    async def enqueue(self, job_type: str, params: Optional[dict] = None, key: Optional[str] = None,
+                      created_by: Optional[str] = None, run_at: Optional[datetime] = None,
+                      max_attempts: Optional[int] = None) -> dict:
+        """Store a job and wake this process's workers; with `key`, return the existing job instead."""
+        if job_type not in self._handlers:
+            raise ValueError(f"No handler for job type {job_type!r}")
+        now = self.clock()
+        job = {
+            "id": str(uuid.uuid4()), "type": job_type, "params": params or {}, "status": "queued",
+            "attempts": 0, "max_attempts": max_attempts or self.max_attempts, "run_at": run_at or now,
+            "progress": {}, "created_by": created_by, "created_at": now, "updated_at": now,
+            **({"key": key} if key else {}),
+        }
+        try:
+            await self._db.jobs.insert_one(job)
+        except DuplicateKeyError:
+            return await self._db.jobs.find_one({"key": key}, {"_id": 0, "lease_token": 0})
+        job.pop("_id", None)
+        self._wakeup.set()
+        return job
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        return await self._db.jobs.find_one({"id": job_id}, {"_id": 0, "lease_token": 0})
+
+    async def claim(self) -> Optional[dict]:
+        """Atomically take the oldest due job, or one whose lease has run out."""
+        now = self.clock()
+        return await self._db.jobs.find_one_and_update(
+            {"$or": [
+                {"status": "queued", "run_at": {"$lte": now}},
+                {"status": "running", "lease_until": {"$lt": now}},
+            ]},
+            {"$set": {
+                "status": "running", "worker": self.worker_id, "lease_token": str(uuid.uuid4()),
+                "lease_until": now + self.lease, "started_at": now, "updated_at": now,
+            }, "$inc": {"attempts": 1}},
+            sort=[("run_at", 1)],
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def _update(self, context: JobContext, update: dict) -> bool:
+        result = await self._db.jobs.update_one({"id": context.id, "lease_token": context.lease_token}, update)
+        return result.matched_count == 1
+
+    async def _renew(self, context: JobContext, fields: Optional[dict] = None) -> None:
+        now = self.clock()
+        if not await self._update(context, {"$set": {**(fields or {}), "lease_until": now + self.lease, "updated_at": now}}):
+            raise LeaseLost(context.id)
+
+    def backoff(self, attempt: int) -> timedelta:
+        return timedelta(seconds=min(self.max_backoff_seconds, self.backoff_seconds * 2 ** (attempt - 1)))
+
+    async def _work(self) -> None:
+        while True:
+            try:
+                job = await self.claim()
+            except Exception:
+                logger.exception("Could not claim a job")
+                job = None
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self.run(job)
+
+    async def run(self, job: dict) -> None:
+        """Run one claimed job to completion, retry or failure, renewing its lease meanwhile."""
+        context = JobContext(self, job)
+        handler = self._handlers.get(job["type"])
+        self._running.add(context.id)
+        try:
+            if handler is None:
+                await self._finish(context, job, error=f"No handler for job type {job['type']!r}")
+                return
+            if context.attempt > job["max_attempts"]:
+                # Its lease kept running out: the process running it died every time
+                await self._finish(context, job, error=job.get("error") or "Worker stopped during every attempt")
+                return
+            work = asyncio.create_task(handler(context))
+            heartbeat = asyncio.create_task(self._heartbeat(context, work))
+            try:
+                result = await work
+            except asyncio.CancelledError:
+                if heartbeat.done() and not heartbeat.cancelled() and isinstance(heartbeat.exception(), LeaseLost):
+                    logger.warning(f"Job {context.id} lost its lease; another worker has it")
+                    return
+                # Shutting down: hand the job back without spending an attempt
+                await asyncio.shield(self._update(context, {
+                    "$set": {"status": "queued", "run_at": self.clock(), "updated_at": self.clock()},
+                    "$unset": {"lease_until": "", "worker": ""}, "$inc": {"attempts": -1},
+                }))
+                raise
+            except LeaseLost:
+                logger.warning(f"Job {context.id} lost its lease; another worker has it")
+                return
+            except Exception as e:
+                logger.exception(f"Job {context.id} ({job['type']}) attempt {context.attempt} failed")
+                await self._finish(context, job, error=f"{type(e).__name__}: {e}", retry=True)
+                return
+            finally:
+                heartbeat.cancel()
+            await self._finish(context, job, result=result)
+        finally:
+            self._running.discard(context.id)
+
+    async def _heartbeat(self, context: JobContext, work: asyncio.Task) -> None:
+        while True:
+            await asyncio.sleep(self.lease.total_seconds() / 3)
+            try:
+                await self._renew(context)
+            except LeaseLost:
+                work.cancel()
+                raise
+            except Exception:
+                logger.exception(f"Could not renew the lease on job {context.id}")
+
+    async def _finish(self, context: JobContext, job: dict, result: Any = None, error: Optional[str] = None,
+                      retry: bool = False) -> None:
+        now = self.clock()
+        unset = {"lease_until": "", "worker": ""}
+        if error is None:
+            update = {"status": "completed", "result": result, "finished_at": now}
+            unset["error"] = ""
+        elif retry and context.attempt < job["max_attempts"]:
+            update = {"status": "queued", "error": error, "run_at": now + self.backoff(context.attempt)}
+        else:
+            update = {"status": "failed", "error": error, "finished_at": now}
+        await self._update(context, {"$set": {**update, "updated_at": now}, "$unset": unset})
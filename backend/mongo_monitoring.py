@@ -0,0 +1,160 @@
+"""PyMongo event listeners that feed the readiness probe and /metrics.
+
+PyMongo checks connections out on the executor thread that runs the operation,
+and the "checkout started" and "checked out" events fire on that same thread. A
+thread-local start time therefore gives the wait for each checkout. Recent waits
+are kept in a time-bounded window for percentile reporting.
+"""
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Tuple
+
+from pymongo import monitoring
+
+from metrics import DB_BUCKETS, Registry
+
+
+def percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    def __init__(self, window_seconds: float = 60.0, max_samples: int = 10000):
+        self.window_seconds = window_seconds
+        self._waits: Deque[Tuple[float, float]] = deque(maxlen=max_samples)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.connections_open = 0
+        self.connections_created = 0
+        self.checked_out = 0
+        self.checkout_failures = 0
+
+    # Checkouts
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+
+    def _finish_checkout(self) -> None:
+        started = getattr(self._local, "started", None)
+        if started is not None:
+            self._local.started = None
+            with self._lock:
+                self._waits.append((time.monotonic(), (time.perf_counter() - started) * 1000))
+
+    def connection_checked_out(self, event):
+        self._finish_checkout()
+        with self._lock:
+            self.checked_out += 1
+
+    def connection_check_out_failed(self, event):
+        self._finish_checkout()
+        with self._lock:
+            self.checkout_failures += 1
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+
+    # Connections
+
+    def connection_created(self, event):
+        with self._lock:
+            self.connections_open += 1
+            self.connections_created += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.connections_open -= 1
+
+    def connection_ready(self, event):
+        pass
+
+    # Pools
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def checkout_waits(self) -> list:
+        cutoff = time.monotonic() - self.window_seconds
+        with self._lock:
+            return [wait for at, wait in self._waits if at >= cutoff]
+
+    def stats(self) -> dict:
+        waits = self.checkout_waits()
+        with self._lock:
+            counters = {
+                "connections_open": self.connections_open,
+                "connections_created": self.connections_created,
+                "checked_out": self.checked_out,
+                "checkout_failures": self.checkout_failures,
+            }
+        return {
+            **counters,
+            "checkout_wait_ms": {
+                "window_seconds": self.window_seconds,
+                "samples": len(waits),
+                "p50": round(percentile(waits, 50), 3),
+                "p95": round(percentile(waits, 95), 3),
+                "max": round(max(waits, default=0.0), 3),
+            },
+        }
+
+
+def documents_in(command_name: str, reply: dict) -> int:
+    cursor = reply.get("cursor")
+    if cursor:
+        return len(cursor.get("firstBatch") or cursor.get("nextBatch") or [])
+    if command_name == "findAndModify":
+        return 1 if reply.get("value") else 0
+    if command_name in ("insert", "update", "delete", "count"):
+        return reply.get("n", 0)
+    return 0
+
+
+class CommandMonitor(monitoring.CommandListener):
+    """Per-collection, per-command latency and document counts.
+
+    Only "started" events carry the command body, so the collection name is kept
+    by request id until the matching "succeeded" or "failed" event arrives.
+    """
+
+    def __init__(self, registry: Registry):
+        labels = ["collection", "command"]
+        self.latency = registry.histogram(
+            "mongodb_command_duration_seconds", "Mongo command round trip time.", labels, buckets=DB_BUCKETS
+        )
+        self.documents = registry.counter(
+            "mongodb_command_documents_total", "Documents returned or written by Mongo commands.", labels
+        )
+        self.failures = registry.counter("mongodb_command_failures_total", "Mongo commands that failed.", labels)
+        self._collections: Dict[Tuple, str] = {}
+
+    def started(self, event):
+        name = event.command_name
+        target = event.command.get("collection") if name == "getMore" else event.command.get(name)
+        self._collections[(event.connection_id, event.request_id)] = target if isinstance(target, str) else "-"
+
+    def succeeded(self, event):
+        collection = self._collections.pop((event.connection_id, event.request_id), "-")
+        self.latency.observe(collection, event.command_name, value=event.duration_micros / 1e6)
+        count = documents_in(event.command_name, event.reply)
+        if count:
+            self.documents.inc(collection, event.command_name, amount=count)
+
+    def failed(self, event):
+        collection = self._collections.pop((event.connection_id, event.request_id), "-")
+        self.latency.observe(collection, event.command_name, value=event.duration_micros / 1e6)
+        self.failures.inc(collection, event.command_name)
@@ -0,0 +1,214 @@
+"""Carton packing for export shipments.
+
+Lines are packed first-fit decreasing by unit volume, with every unit checked
+against both the carton's usable volume and its gross weight limit. Identical
+units from one line go in as a block, so the work depends on lines and cartons
+rather than on unit counts. A max segment tree over the cartons' remaining volume
+and one over remaining weight find the first carton with room for a unit. A
+1,000-line shipment packs in well under a second (see benchmarks/bench_packing.py).
+"""
+from dataclasses import dataclass, field
+from math import ceil, floor, isfinite
+from typing import Dict, List, Optional, Tuple
+
+EPSILON = 1e-9
+
+# Used for lines whose plant has no recorded dimensions (cm, kg)
+DEFAULT_UNIT = {"length_cm": 15.0, "width_cm": 15.0, "height_cm": 20.0, "weight_kg": 0.6}
+
+
+def unit_dimensions(line: dict, plant: dict) -> Tuple[Dict[str, float], bool]:
+    """A line's unit size and weight, taken from the line, else its plant, else DEFAULT_UNIT.
+
+    Returns the values and whether any was defaulted. A missing or zero value is
+    defaulted; anything else must be a positive, finite number, or ValueError names it.
+    """
+    dims, estimated = {}, False
+    for name, default in DEFAULT_UNIT.items():
+        value = line.get(name) or plant.get(name)
+        if not value:
+            dims[name], estimated = default, True
+            continue
+        try:
+            dims[name] = float(value)
+        except (TypeError, ValueError, OverflowError):
+            raise ValueError(f"{name} must be a positive number")
+        if not (isfinite(dims[name]) and dims[name] > 0):
+            raise ValueError(f"{name} must be a positive number")
+    return dims, estimated
+
+
+@dataclass(frozen=True)
+class Carton:
+    name: str
+    length: float
+    width: float
+    height: float
+    max_weight: float
+    tare: float
+
+    @property
+    def volume(self) -> float:
+        return self.length * self.width * self.height
+
+    def fits(self, item: "PackItem") -> bool:
+        unit = sorted((item.length, item.width, item.height))
+        inner = sorted((self.length, self.width, self.height))
+        return all(u <= c + EPSILON for u, c in zip(unit, inner))
+
+
+@dataclass(frozen=True)
+class FreightRule:
+    carton: Carton
+    volumetric_divisor: float  # cm3 per chargeable kg
+
+
+FREIGHT_RULES: Dict[str, FreightRule] = {
+    "air": FreightRule(Carton("air-60x40x40", 60, 40, 40, max_weight=25, tare=1.2), volumetric_divisor=6000),
+    "sea": FreightRule(Carton("sea-80x60x60", 80, 60, 60, max_weight=40, tare=2.0), volumetric_divisor=1000),
+    "land": FreightRule(Carton("land-80x60x60", 80, 60, 60, max_weight=40, tare=2.0), volumetric_divisor=3000),
+}
+
+
+@dataclass(frozen=True)
+class PackItem:
+    line: int
+    name: str
+    quantity: int
+    length: float
+    width: float
+    height: float
+    weight: float
+    plant_id: Optional[str] = None
+    estimated: bool = False
+
+    @property
+    def volume(self) -> float:
+        return self.length * self.width * self.height
+
+
+@dataclass
+class _Box:
+    kind: str
+    volume: float
+    weight: float
+    dims: tuple
+    contents: List[dict] = field(default_factory=list)
+
+
+class _FirstFit:
+    """Max segment trees over remaining volume and weight; unopened cartons sit at full capacity.
+
+    A subtree is skipped when its largest free volume or its largest free weight is
+    too small. So cartons that are full by weight drop out of the search along with
+    those full by volume.
+    """
+
+    def __init__(self, size: int, volume: float, weight: float):
+        self.size = 1
+        while self.size < max(size, 1):
+            self.size *= 2
+        self.volume = [volume] * (2 * self.size)
+        self.weight = [weight] * (2 * self.size)
+
+    def set(self, index: int, volume: float, weight: float) -> None:
+        node = self.size + index
+        self.volume[node], self.weight[node] = volume, weight
+        node //= 2
+        while node:
+            left, right = 2 * node, 2 * node + 1
+            self.volume[node] = max(self.volume[left], self.volume[right])
+            self.weight[node] = max(self.weight[left], self.weight[right])
+            node //= 2
+
+    def find(self, volume: float, weight: float) -> int:
+        """Leftmost carton with room for one unit of this volume and weight, or -1."""
+        stack = [1]
+        while stack:
+            node = stack.pop()
+            if self.volume[node] + EPSILON < volume or self.weight[node] + EPSILON < weight:
+                continue
+            if node >= self.size:
+                return node - self.size
+            stack.append(2 * node + 1)
+            stack.append(2 * node)
+        return -1
+
+
+def units_per_carton(item: PackItem, volume: float, weight: float) -> int:
+    # Same tolerance as _FirstFit.find, so a carton it returns always takes at least one unit
+    by_volume = floor((volume + EPSILON) / item.volume) if item.volume > 0 else item.quantity
+    by_weight = floor((weight + EPSILON) / item.weight) if item.weight > 0 else item.quantity
+    return min(by_volume, by_weight)
+
+
+def pack(items: List[PackItem], rule: FreightRule, fill_factor: float = 0.85) -> dict:
+    carton = rule.carton
+    capacity = carton.volume * fill_factor
+    payload = carton.max_weight - carton.tare
+
+    lines = [item for item in items if item.quantity > 0]
+    regular = [i for i in lines if carton.fits(i) and units_per_carton(i, capacity, payload) > 0]
+    oversize = [i for i in lines if not (carton.fits(i) and units_per_carton(i, capacity, payload) > 0)]
+    regular.sort(key=lambda i: (i.volume, i.weight), reverse=True)
+
+    # Packing each line on its own never needs more cartons than this
+    bound = sum(ceil(i.quantity / units_per_carton(i, capacity, payload)) for i in regular)
+    first_fit = _FirstFit(bound, capacity, payload)
+    boxes: List[_Box] = []
+    remaining_volume: List[float] = []
+    remaining_weight: List[float] = []
+
+    for item in regular:
+        left = item.quantity
+        while left:
+            index = first_fit.find(item.volume, item.weight)
+            if index == len(boxes):
+                boxes.append(_Box(carton.name, carton.volume, carton.tare, (carton.length, carton.width, carton.height)))
+                remaining_volume.append(capacity)
+                remaining_weight.append(payload)
+            count = min(left, units_per_carton(item, remaining_volume[index], remaining_weight[index]))
+            box = boxes[index]
+            box.contents.append({"line": item.line, "name": item.name, "plant_id": item.plant_id, "quantity": count})
+            box.weight += count * item.weight
+            remaining_volume[index] -= count * item.volume
+            remaining_weight[index] -= count * item.weight
+            left -= count
+            first_fit.set(index, remaining_volume[index], remaining_weight[index])
+
+    for item in oversize:
+        dims = (item.length, item.width, item.height)
+        for _ in range(item.quantity):
+            boxes.append(_Box("oversize", item.volume, item.weight, dims, [
+                {"line": item.line, "name": item.name, "plant_id": item.plant_id, "quantity": 1}
+            ]))
+
+    cartons = []
+    total_weight = total_volumetric = 0.0
+    for number, box in enumerate(boxes, start=1):
+        volumetric = box.volume / rule.volumetric_divisor
+        total_weight += box.weight
+        total_volumetric += volumetric
+        cartons.append({
+            "number": number,
+            "carton": box.kind,
+            "dimensions_cm": list(box.dims),
+            "gross_weight": round(box.weight, 2),
+            "volumetric_weight": round(volumetric, 2),
+            "contents": box.contents,
+        })
+
+    return {
+        "carton": {
+            "name": carton.name,
+            "dimensions_cm": [carton.length, carton.width, carton.height],
+            "max_weight": carton.max_weight,
+        },
+        "total_boxes": len(cartons),
+        "total_weight": round(total_weight, 2),
+        "volumetric_weight": round(total_volumetric, 2),
+        "chargeable_weight": round(max(total_weight, total_volumetric), 2),
+        "oversize_lines": sorted({i.line for i in oversize}),
+        "estimated_lines": sorted(i.line for i in lines if i.estimated),
+        "cartons": cartons,
+    }
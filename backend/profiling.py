@@ -0,0 +1,235 @@
+"""Per-request profiling, on demand or for a sampled fraction of traffic.
+
+A profiled request gets:
+- a pyinstrument call tree of its own task, with awaits shown as [await] frames
+- the time it spent waiting on each Mongo command
+- a split into dependencies (auth, body parsing), endpoint and serialisation
+
+The split goes back in a Server-Timing header, and the whole profile goes to a sink
+for download. Requests that are not profiled pay for one header lookup, plus one
+random draw when sampling is on. The Mongo listener checks a context variable,
+which Motor carries into its executor threads.
+"""
+import asyncio
+import contextvars
+import functools
+import logging
+import random
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from fastapi.exceptions import RequestValidationError
+from pymongo import monitoring
+from pyinstrument import Profiler
+from pyinstrument.renderers import ConsoleRenderer, HTMLRenderer
+from pyinstrument.session import Session
+from starlette.exceptions import HTTPException
+from starlette.requests import Request
+
+PROFILE_HEADER = "x-profile"
+
+logger = logging.getLogger(__name__)
+
+
+class RequestProfile:
+    def __init__(self, method: str, path: str, requested: bool, interval: float):
+        self.id = str(uuid.uuid4())
+        self.method = method
+        self.path = path
+        self.requested = requested
+        self.status = 500
+        self.raised = False
+        self.started = time.perf_counter()
+        self.endpoint_started: Optional[float] = None
+        self.endpoint_finished: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.commands: List[dict] = []
+        self._pending: Dict[Tuple, Tuple[str, str]] = {}
+        self.profiler = Profiler(interval=interval, async_mode="enabled")
+
+    def command_started(self, event) -> None:
+        name = event.command_name
+        target = event.command.get("collection") if name == "getMore" else event.command.get(name)
+        self._pending[(event.connection_id, event.request_id)] = (name, target if isinstance(target, str) else "-")
+
+    def command_finished(self, event, failed: bool = False) -> None:
+        name, collection = self._pending.pop((event.connection_id, event.request_id), (event.command_name, "-"))
+        self.commands.append({
+            "command": name,
+            "collection": collection,
+            "duration_ms": round(event.duration_micros / 1000, 3),
+            "failed": failed,
+        })
+
+    def timings(self) -> dict:
+        """Wall-clock phases in milliseconds; phases a failed request never reached are left out."""
+        def span(start, end):
+            return round((end - start) * 1000, 3)
+
+        timings = {"total": span(self.started, self.finished)}
+        if self.endpoint_started is not None:
+            timings["dependencies"] = span(self.started, self.endpoint_started)
+            if self.endpoint_finished is not None:
+                timings["endpoint"] = span(self.endpoint_started, self.endpoint_finished)
+                if not self.raised:
+                    timings["serialize"] = span(self.endpoint_finished, self.finished)
+        timings["mongo"] = round(sum(c["duration_ms"] for c in self.commands), 3)
+        return timings
+
+    def server_timing(self) -> str:
+        timings = self.timings()
+        entries = [
+            f"{name};dur={timings[key]}" + (f';desc="{len(self.commands)} commands"' if key == "mongo" else "")
+            for name, key in [("total", "total"), ("deps", "dependencies"), ("endpoint", "endpoint"),
+                              ("db", "mongo"), ("serialize", "serialize")]
+            if key in timings
+        ]
+        return ", ".join(entries + [f'profile;desc="{self.id}"'])
+
+    def to_dict(self, session: Session) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "route": self.path,
+            "status": self.status,
+            "requested": self.requested,
+            "timings_ms": self.timings(),
+            "mongo_commands": self.commands,
+            "session": session.to_json(),
+        }
+
+
+current_profile: contextvars.ContextVar[Optional[RequestProfile]] = contextvars.ContextVar("current_profile", default=None)
+
+
+def render_session(session: dict, fmt: str) -> str:
+    """Render a stored pyinstrument session as the interactive HTML page or a plain-text tree."""
+    loaded = Session.from_json(session)
+    if fmt == "html":
+        return HTMLRenderer().render(loaded)
+    return ConsoleRenderer(unicode=True, color=False).render(loaded)
+
+
+class ProfileCommandListener(monitoring.CommandListener):
+    """Times the Mongo commands of whichever request is being profiled."""
+
+    def started(self, event):
+        profile = current_profile.get()
+        if profile is not None:
+            profile.command_started(event)
+
+    def succeeded(self, event):
+        profile = current_profile.get()
+        if profile is not None:
+            profile.command_finished(event)
+
+    def failed(self, event):
+        profile = current_profile.get()
+        if profile is not None:
+            profile.command_finished(event, failed=True)
+
+
+class RequestProfiler:
+    """Profiling settings plus two hooks the app registers.
+
+    The `authorizer` decides who may ask for a profile with the header. The `sink`
+    stores each finished profile.
+    """
+
+    def __init__(self, sample_rate: float = 0.0, interval: float = 0.001):
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self._authorize: Optional[Callable[[Request], Awaitable[bool]]] = None
+        self._save: Optional[Callable[[dict], Awaitable[None]]] = None
+
+    def authorizer(self, fn):
+        self._authorize = fn
+        return fn
+
+    def sink(self, fn):
+        self._save = fn
+        return fn
+
+    async def authorized(self, request: Request) -> bool:
+        return self._authorize is not None and await self._authorize(request)
+
+    def sampled(self) -> bool:
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def save(self, profile: dict) -> None:
+        # A profile that cannot be stored must never fail the request it describes
+        if self._save is None:
+            return
+        try:
+            await self._save(profile)
+        except Exception:
+            logger.exception(f"Could not store request profile {profile['id']}")
+
+
+def profiled_route_class(route_class: type, profiler: RequestProfiler) -> type:
+    """Subclass `route_class` so its requests can be profiled on demand or by sampling."""
+
+    class ProfiledRoute(route_class):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            # The request handler looks the endpoint up on each call, so wrapping it
+            # here marks where dependencies end and serialisation begins
+            endpoint = self.dependant.call
+            if not asyncio.iscoroutinefunction(endpoint):
+                return
+
+            @functools.wraps(endpoint)
+            async def timed_endpoint(*args, **kwargs):
+                profile = current_profile.get()
+                if profile is None:
+                    return await endpoint(*args, **kwargs)
+                profile.endpoint_started = time.perf_counter()
+                try:
+                    return await endpoint(*args, **kwargs)
+                finally:
+                    profile.endpoint_finished = time.perf_counter()
+
+            self.dependant.call = timed_endpoint
+
+        def get_route_handler(self):
+            handler = super().get_route_handler()
+            path = self.path
+
+            async def profiled_handler(request):
+                requested = PROFILE_HEADER in request.headers and await profiler.authorized(request)
+                if not requested and not profiler.sampled():
+                    return await handler(request)
+
+                profile = RequestProfile(request.method, path, requested, profiler.interval)
+                token = current_profile.set(profile)
+                profile.profiler.start()
+                response = None
+                try:
+                    response = await handler(request)
+                    profile.status = response.status_code
+                    return response
+                except HTTPException as e:
+                    profile.status = e.status_code
+                    profile.raised = True
+                    raise
+                except RequestValidationError:
+                    profile.status = 422
+                    profile.raised = True
+                    raise
+                except Exception:
+                    profile.raised = True
+                    raise
+                finally:
+                    session = profile.profiler.stop()
+                    profile.finished = time.perf_counter()
+                    current_profile.reset(token)
+                    await profiler.save(profile.to_dict(session))
+                    # Sampled requests are profiled silently; only the asker sees the timings
+                    if requested and response is not None:
+                        response.headers["Server-Timing"] = profile.server_timing()
+                        response.headers["X-Profile-Id"] = profile.id
+
+            return profiled_handler
+
+    return ProfiledRoute
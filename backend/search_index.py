@@ -0,0 +1,187 @@
+"""One ranked search over several collections, answered from a token index.
+
+Every searchable record has one entry in the `search_index` collection:
+    {_id: "<type>:<id>", type, entity_id, title, subtitle, terms, words, title_words, keys,
+     created_at, indexed_at}
+
+`words` holds the normalised words of the record's searchable fields, and `terms`
+holds every prefix of those words from `min_prefix` to `max_prefix` characters.
+`keys` holds identifiers that are also matched whole: emails, phone numbers
+reduced to their digits, and reference numbers.
+
+A search matches entries whose `terms` contain every query word, read through a
+multikey index on `terms`. At most `candidates` of the newest of those matches are
+ranked, so a search costs the same however large the indexed collections grow.
+Entries whose `keys` hold the whole query are looked up separately through their
+own index, so an exact email or reference number is never crowded out by newer
+prefix matches. Ranking puts exact identifier matches first, then whole words in
+the title, then whole words elsewhere. Prefix-only matches come last.
+
+The application updates an entry whenever it writes a searchable record.
+`rebuild` recreates every entry of one type from its collections, and it also
+removes entries whose record no longer exists.
+"""
+import re
+import unicodedata
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence
+
+from pymongo import ReplaceOne
+
+WORD = re.compile(r"[^\W_]+")
+PHONE = re.compile(r"\+?[\d\s().-]+")
+KEY_WEIGHT = 8
+TITLE_WEIGHT = 2
+MAX_QUERY_WORDS = 8
+
+
+@dataclass(frozen=True)
+class SearchEntity:
+    type: str
+    collection: str
+    title: str
+    subtitle: Sequence[str] = ()
+    fields: Sequence[str] = ()  # matched by word and prefix
+    keys: Sequence[str] = ()  # matched by word and prefix, and whole
+
+
+def normalise(text) -> str:
+    """Lower-case and strip accents, so "Émile" and "emile" are the same word."""
+    decomposed = unicodedata.normalize("NFKD", str(text))
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+def words(text) -> List[str]:
+    return WORD.findall(normalise(text))
+
+
+def key(value) -> str:
+    """The whole-value form of an identifier; phone numbers keep only their digits."""
+    text = normalise(value).strip()
+    digits = re.sub(r"\D", "", text)
+    if PHONE.fullmatch(text) and len(digits) >= 6:
+        return digits
+    return text
+
+
+def overlap(field: str, values: List[str]) -> dict:
+    """How many of `values` the entry's array `field` contains."""
+    return {"$size": {"$setIntersection": [f"${field}", values]}}
+
+
+class SearchIndex:
+    def __init__(self, entities: List[SearchEntity], collection: str = "search_index",
+                 min_prefix: int = 2, max_prefix: int = 16, candidates: int = 500):
+        self.entities: Dict[str, SearchEntity] = {entity.type: entity for entity in entities}
+        self.collection = collection
+        self.min_prefix = min_prefix
+        self.max_prefix = max_prefix
+        self.candidates = candidates
+
+    async def create_indexes(self, database) -> None:
+        await database[self.collection].create_index([("terms", 1), ("created_at", -1)])
+        await database[self.collection].create_index("keys")
+        await database[self.collection].create_index([("type", 1), ("indexed_at", 1)])
+
+    def entry(self, entity_type: str, doc: dict) -> dict:
+        """The index entry for one record."""
+        entity = self.entities[entity_type]
+        keys = {key(doc[field]) for field in entity.keys if doc.get(field)}
+        found = {word for field in [*entity.fields, *entity.keys] for word in words(doc.get(field) or "")}
+        found.update(k for k in keys if k.isdigit())  # a phone number is also one word
+        terms = {
+            word[:length] for word in found
+            for length in range(self.min_prefix, min(len(word), self.max_prefix) + 1)
+        }
+        return {
+            "_id": f"{entity_type}:{doc['id']}",
+            "type": entity_type,
+            "entity_id": doc["id"],
+            "title": str(doc.get(entity.title) or ""),
+            "subtitle": " · ".join(str(doc[field]) for field in entity.subtitle if doc.get(field)),
+            "terms": sorted(terms),
+            "words": sorted(found),
+            "title_words": sorted(set(words(doc.get(entity.title) or ""))),
+            "keys": sorted(keys),
+            "created_at": doc.get("created_at"),
+            "indexed_at": datetime.now(timezone.utc),
+        }
+
+    async def index(self, database, entity_type: str, doc: dict) -> None:
+        entry = self.entry(entity_type, doc)
+        await database[self.collection].replace_one({"_id": entry["_id"]}, entry, upsert=True)
+
+    async def remove(self, database, entity_type: str, entity_id: str) -> None:
+        await database[self.collection].delete_one({"_id": f"{entity_type}:{entity_id}"})
+
+    async def reindex(self, database, entity_type: str, entity_id: str) -> None:
+        """Index the record as it is stored now, or drop its entry if it is gone."""
+        doc = await database[self.entities[entity_type].collection].find_one({"id": entity_id}, {"_id": 0})
+        if doc:
+            await self.index(database, entity_type, doc)
+        else:
+            await self.remove(database, entity_type, entity_id)
+
+    def query_words(self, query: str) -> List[str]:
+        found = [word for word in dict.fromkeys(words(query)) if len(word) >= self.min_prefix]
+        return found[:MAX_QUERY_WORDS]
+
+    def pipeline(self, query: str, types: Optional[List[str]] = None, limit: int = 20) -> Optional[list]:
+        """The aggregation that ranks matches for `query` among `types`, or None when it has no usable word."""
+        found = self.query_words(query)
+        if not found:
+            return None
+        scope = {"type": {"$in": types}} if types is not None else {}
+        prefixed = [
+            {"$match": {"terms": {"$all": [word[:self.max_prefix] for word in found]}, **scope}},
+            {"$sort": {"created_at": -1}},
+            {"$limit": self.candidates},
+        ]
+        return [
+            {"$match": {"keys": key(query), **scope}},
+            {"$limit": limit},
+            {"$unionWith": {"coll": self.collection, "pipeline": prefixed}},
+            # An exact match is usually a prefix match too
+            {"$group": {"_id": "$_id", "entry": {"$first": "$$ROOT"}}},
+            {"$replaceRoot": {"newRoot": "$entry"}},
+            {"$addFields": {"score": {"$add": [
+                {"$multiply": [KEY_WEIGHT, overlap("keys", [key(query)])]},
+                {"$multiply": [TITLE_WEIGHT, overlap("title_words", found)]},
+                overlap("words", found),
+            ]}}},
+            {"$sort": {"score": -1, "created_at": -1}},
+            {"$limit": limit},
+            {"$project": {"_id": 0, "type": 1, "id": "$entity_id", "title": 1, "subtitle": 1, "score": 1}},
+        ]
+
+    async def search(self, database, query: str, types: Optional[List[str]] = None, limit: int = 20) -> List[dict]:
+        pipeline = self.pipeline(query, types, limit)
+        if pipeline is None:
+            return []
+        return await database[self.collection].aggregate(pipeline).to_list(limit)
+
+    async def rebuild(self, database, entity_type: str, sources: list, batch_size: int = 500,
+                      progress: Optional[Callable[[int], Awaitable[None]]] = None) -> int:
+        """Re-index every record of `entity_type` in `sources` and drop entries for records that are gone."""
+        started = datetime.now(timezone.utc)
+        indexed = 0
+        for source in sources:
+            last_id = None
+            while True:
+                query = {"_id": {"$gt": last_id}} if last_id is not None else {}
+                docs = await source.find(query).sort("_id", 1).limit(batch_size).to_list(batch_size)
+                if not docs:
+                    break
+                last_id = docs[-1]["_id"]
+                entries = [self.entry(entity_type, doc) for doc in docs if doc.get("id")]
+                if entries:
+                    await database[self.collection].bulk_write(
+                        [ReplaceOne({"_id": entry["_id"]}, entry, upsert=True) for entry in entries], ordered=False
+                    )
+                indexed += len(entries)
+                if progress:
+                    await progress(indexed)
+        # Entries written since `started`, by this rebuild or by live writes, are current
+        await database[self.collection].delete_many({"type": entity_type, "indexed_at": {"$lt": started}})
+        return indexed
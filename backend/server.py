@@ -1,24 +1,229 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, Query
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, PlainTextResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument, UpdateOne, WriteConcern
+from pymongo.read_concern import ReadConcern
+from pymongo.read_preferences import Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
+from pymongo.errors import BulkWriteError, OperationFailure, PyMongoError
 import os
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field, EmailStr
-from typing import List, Optional, Dict, Any
+from contextlib import asynccontextmanager
+from pydantic import AfterValidator, BaseModel, Field, EmailStr, ValidationError
+from typing import Annotated, Callable, List, Optional, Dict, Any
 import uuid
-from datetime import datetime, timezone, timedelta
+import heapq
+import asyncio
+import base64
+import json
+import multiprocessing
+from math import ceil
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date, datetime, time, timezone, timedelta
+from functools import partial
 import bcrypt
 import jwt
 
+from admission import AdmissionClass, AdmissionController, admitted_route_class
+from archive import ArchivedCollection, archive_batch, archive_name, create_archive_collections
+from coalescing import SingleFlight
+from crew_calendar import Booking, CrewCalendar, day_inclusive_end
+from metrics import Registry, instrumented_route_class
+from mongo_monitoring import CommandMonitor, PoolMonitor
+from export_render import content_key, render_document
+from jobs import JobContext, JobQueue
+from invalidation import LocalInvalidationBus, MongoInvalidationBus
+from packing import FREIGHT_RULES, PackItem, pack, unit_dimensions
+from profiling import ProfileCommandListener, RequestProfiler, profiled_route_class, render_session
+from pricing import InvalidLine, PriceCatalog, QuoteRules, parse_tiers, quote
+from search_index import SearchEntity, SearchIndex
+from write_concerns import TieredDatabase
+
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+
+# Pool settings; unset values fall back to the driver defaults
+MONGO_POOL_OPTIONS = {
+    option: cast(os.environ[env])
+    for option, env, cast in [
+        ("maxPoolSize", "MONGO_MAX_POOL_SIZE", int),
+        ("minPoolSize", "MONGO_MIN_POOL_SIZE", int),
+        ("maxIdleTimeMS", "MONGO_MAX_IDLE_TIME_MS", int),
+        ("maxConnecting", "MONGO_MAX_CONNECTING", int),
+        ("waitQueueTimeoutMS", "MONGO_WAIT_QUEUE_TIMEOUT_MS", int),
+        ("connectTimeoutMS", "MONGO_CONNECT_TIMEOUT_MS", int),
+        ("socketTimeoutMS", "MONGO_SOCKET_TIMEOUT_MS", int),
+        ("serverSelectionTimeoutMS", "MONGO_SERVER_SELECTION_TIMEOUT_MS", int),
+        ("compressors", "MONGO_COMPRESSORS", str),
+    ]
+    if os.environ.get(env)
+}
+READY_PING_TIMEOUT = float(os.environ.get('READY_PING_TIMEOUT_SECONDS', 2))
+READY_MAX_CHECKOUT_WAIT_MS = float(os.environ.get('READY_MAX_CHECKOUT_WAIT_MS', 250))
+
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# Admins can profile any request with an X-Profile header; this fraction of traffic is profiled as well
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+PROFILE_INTERVAL_MS = float(os.environ.get('PROFILE_INTERVAL_MS', 1))
+PROFILE_TTL = timedelta(days=int(os.environ.get('PROFILE_TTL_DAYS', 7)))
+
+# Several worker processes need CACHE_INVALIDATION=mongo so their in-memory caches follow each other's writes
+CACHE_INVALIDATION = os.environ.get('CACHE_INVALIDATION', 'local')
+CACHE_MAX_STALENESS = float(os.environ.get('CACHE_MAX_STALENESS_SECONDS', 5))
+
+# Reporting and list routes read from secondaries no more than this far behind (MongoDB's minimum is 90)
+READ_MAX_STALENESS_SECONDS = int(os.environ.get('READ_MAX_STALENESS_SECONDS', 90))
+READ_PREFERENCE_MODES = {
+    "primary": Primary(),
+    "primaryPreferred": PrimaryPreferred(max_staleness=READ_MAX_STALENESS_SECONDS),
+    "secondary": Secondary(max_staleness=READ_MAX_STALENESS_SECONDS),
+    "secondaryPreferred": SecondaryPreferred(max_staleness=READ_MAX_STALENESS_SECONDS),
+    "nearest": Nearest(max_staleness=READ_MAX_STALENESS_SECONDS),
+}
+# Read preference by route for routes that read through `route_reads`; READ_PREFERENCES (JSON) overrides
+# entries. Everything else, including every read that must see the request's own writes, uses the primary
+ROUTE_READ_PREFERENCES = {
+    "GET /api/admin/dashboard": "secondaryPreferred",
+    "GET /api/partners": "secondaryPreferred",
+    "GET /api/partners/{partner_id}/deals": "secondaryPreferred",
+    "GET /api/orders": "secondaryPreferred",
+    "GET /api/amc": "secondaryPreferred",
+    "GET /api/amc/invoices/all": "secondaryPreferred",
+    "GET /api/exports": "secondaryPreferred",
+    "GET /api/inquiries": "secondaryPreferred",
+    **json.loads(os.environ.get('READ_PREFERENCES', '{}'))
+}
+for _route, _mode in ROUTE_READ_PREFERENCES.items():
+    if _mode not in READ_PREFERENCE_MODES:
+        raise ValueError(f"Unknown read preference {_mode!r} for {_route}; use one of {', '.join(READ_PREFERENCE_MODES)}")
+
+# Identical concurrent requests to coalesced routes share one computation; results are reused this long
+COALESCE_CACHE_SECONDS = float(os.environ.get('COALESCE_CACHE_SECONDS', 0))
+
+# Concurrency per class of route, with a bounded queue and wait; more than that is refused with 503.
+# ADMISSION_LIMITS (JSON) overrides fields, e.g. {"reports": {"limit": 4}}
+_admission_overrides = json.loads(os.environ.get('ADMISSION_LIMITS', '{}'))
+ADMISSION_LIMITS = {
+    name: {**limits, **_admission_overrides.get(name, {})}
+    for name, limits in {
+        "checkout": {"limit": 32, "queue": 128, "wait": 2.0},
+        "catalog": {"limit": 64, "queue": 128, "wait": 0.5},
+        "reports": {"limit": 8, "queue": 16, "wait": 1.0},
+        "auth": {"limit": os.cpu_count() or 4, "queue": 32, "wait": 2.0},
+    }.items()
+}
+# Other classes shrink while checkout's p95 is above this, and grow back once it is below
+CHECKOUT_TARGET_LATENCY_MS = float(os.environ.get('CHECKOUT_TARGET_LATENCY_MS', 250))
+ROUTE_ADMISSION_CLASSES = {
+    "POST /api/orders": "checkout",
+    "POST /api/orders/public": "checkout",
+    "GET /api/products": "catalog",
+    "GET /api/products/{product_id}": "catalog",
+    **dict.fromkeys([
+        "GET /api/admin/dashboard", "GET /api/orders", "GET /api/amc", "GET /api/amc/invoices/all", "GET /api/partners",
+        "GET /api/partners/{partner_id}/deals", "GET /api/exports", "GET /api/exports/{doc_id}/render", "GET /api/inquiries",
+    ], "reports"),
+    **dict.fromkeys(["POST /api/auth/login", "POST /api/auth/register", "PUT /api/auth/change-password"], "auth"),
+}
+for _route, _class in ROUTE_ADMISSION_CLASSES.items():
+    if _class not in ADMISSION_LIMITS:
+        raise ValueError(f"Unknown admission class {_class!r} for {_route}")
+
+# Background jobs: asyncio workers per process, and how long a claimed job stays leased without a renewal
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+JOB_LEASE_SECONDS = float(os.environ.get('JOB_LEASE_SECONDS', 60))
+JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', 5))
+JOB_BACKOFF_SECONDS = float(os.environ.get('JOB_BACKOFF_SECONDS', 5))
+
+# Money and commitments wait for a journaled majority; high-volume logs are acknowledged by the
+# primary alone. Collections not listed use the client default
+COLLECTION_WRITE_CONCERNS = {
+    **dict.fromkeys(["orders", "invoices", "partner_deals"], WriteConcern(w="majority", j=True)),
+    **dict.fromkeys(["crew_logs", "stock_movements", "inquiries", "search_index"], WriteConcern(w=1)),
+}
+
+metrics_registry = Registry()
+pool_monitor = PoolMonitor()
+command_monitor = CommandMonitor(metrics_registry)
+single_flight = SingleFlight(cache_seconds=COALESCE_CACHE_SECONDS, registry=metrics_registry)
+admission = AdmissionController(
+    [
+        AdmissionClass(name, limits["limit"], limits["queue"], limits["wait"], adaptive=name != "checkout")
+        for name, limits in ADMISSION_LIMITS.items()
+    ],
+    protected="checkout", target_latency=CHECKOUT_TARGET_LATENCY_MS / 1000, registry=metrics_registry
+)
+job_queue = JobQueue(
+    workers=JOB_WORKERS, lease_seconds=JOB_LEASE_SECONDS, max_attempts=JOB_MAX_ATTEMPTS, backoff_seconds=JOB_BACKOFF_SECONDS,
+    clock=lambda: utc_now()  # defined with the datetime helpers below
+)
+request_profiler = RequestProfiler(sample_rate=PROFILE_SAMPLE_RATE, interval=PROFILE_INTERVAL_MS / 1000)
+invalidation_bus = (
+    MongoInvalidationBus(max_staleness=CACHE_MAX_STALENESS) if CACHE_INVALIDATION == "mongo" else LocalInvalidationBus()
+)
+pool_connections = metrics_registry.gauge("mongodb_pool_connections", "Mongo pool connections by state.", ["state"])
+pool_checkout_wait = metrics_registry.gauge(
+    "mongodb_pool_checkout_wait_seconds", "Mongo pool checkout wait over the last minute.", ["quantile"]
+)
+
+# Created per worker process in the lifespan handler, never at import time
+client: Optional[AsyncIOMotorClient] = None
+db = None
+read_dbs: Dict[str, Any] = {}
+
+def create_client() -> AsyncIOMotorClient:
+    return AsyncIOMotorClient(mongo_url, tz_aware=True, event_listeners=[pool_monitor, command_monitor, ProfileCommandListener()], **MONGO_POOL_OPTIONS)
+
+TRANSACTIONS_REQUIRED = (
+    "MongoDB is not running as a replica set, so it cannot run transactions. "
+    "Start it with --replSet (a single-node set is enough) and add ?replicaSet=<name> to MONGO_URL."
+)
+
+async def supports_transactions() -> bool:
+    # Replica set members report their set's name; mongos reports "isdbgrid"
+    hello = await db.command("hello")
+    return bool(hello.get("setName")) or hello.get("msg") == "isdbgrid"
+
+async def warm_pool():
+    # Concurrent pings force the pool up to its minimum size before traffic arrives
+    connections = max(MONGO_POOL_OPTIONS.get("minPoolSize", 0), 1)
+    await asyncio.gather(*(db.command("ping") for _ in range(connections)))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global client, db, read_dbs
+    client = create_client()
+    db = TieredDatabase(client[os.environ['DB_NAME']], COLLECTION_WRITE_CONCERNS)
+    read_dbs = {mode: db.with_options(read_preference=pref) for mode, pref in READ_PREFERENCE_MODES.items()}
+    app.state.ready = False
+    await warm_pool()
+    app.state.transactions = await supports_transactions()
+    if not app.state.transactions:
+        logger.error(f"{TRANSACTIONS_REQUIRED} Production completion will answer 503 until it is.")
+    await create_indexes()
+    await invalidation_bus.start(db)
+    await job_queue.start(db)
+    await ensure_search_index()
+    if os.environ.get('DATETIME_MIGRATION_ON_STARTUP', 'true').lower() == 'true':
+        start_datetime_migration()
+    archive_schedule = asyncio.create_task(archive_periodically()) if ARCHIVE_INTERVAL else None
+    app.state.ready = True
+    yield
+    app.state.ready = False
+    if archive_schedule:
+        archive_schedule.cancel()
+    await job_queue.stop()
+    await invalidation_bus.stop()
+    reset_render_pool()
+    client.close()
 
 JWT_SECRET = os.environ.get('JWT_SECRET', 'green-arcadian-secret-2026')
 JWT_ALGORITHM = "HS256"
@@ -26,12 +231,116 @@ JWT_EXPIRATION_HOURS = 24
 
 security = HTTPBearer()
 
-app = FastAPI(title="Green Arcadian API", version="2.0.0")
-api_router = APIRouter(prefix="/api")
+app = FastAPI(title="Green Arcadian API", version="2.0.0", lifespan=lifespan)
+api_router = APIRouter(
+    prefix="/api",
+    route_class=profiled_route_class(
+        admitted_route_class(instrumented_route_class(metrics_registry), admission, ROUTE_ADMISSION_CLASSES), request_profiler
+    )
+)
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# ============= DATETIME HELPERS =============
+
+def utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
+def as_utc(value) -> datetime:
+    """Coerce a stored or submitted timestamp to an aware UTC datetime.
+
+    Naive values are taken to be UTC, which is how Mongo stores them; ISO strings
+    are accepted so documents not yet migrated still parse.
+    """
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    elif isinstance(value, date) and not isinstance(value, datetime):
+        value = datetime(value.year, value.month, value.day)
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+UTCDateTime = Annotated[datetime, AfterValidator(as_utc)]
+
+def date_range(start: Optional[datetime] = None, end: Optional[datetime] = None) -> Dict[str, datetime]:
+    """Half-open [start, end) filter on a datetime field."""
+    bounds = {}
+    if start:
+        bounds["$gte"] = as_utc(start)
+    if end:
+        bounds["$lt"] = as_utc(end)
+    return bounds
+
+# ============= PAGINATION HELPERS =============
+
+CHILD_PAGE_SIZE = 20
+
+def encode_cursor(doc: dict) -> str:
+    position = {"created_at": as_utc(doc["created_at"]).isoformat(), "id": doc["id"]}
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return {"created_at": as_utc(position["created_at"]), "id": position["id"]}
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+async def fetch_page(collection, query: dict, limit: int, cursor: Optional[str] = None):
+    """Newest-first keyset page over (created_at, id); returns (items, next_cursor)."""
+    page_query = dict(query)
+    if cursor:
+        position = decode_cursor(cursor)
+        page_query["$or"] = [
+            {"created_at": {"$lt": position["created_at"]}},
+            {"created_at": position["created_at"], "id": {"$lt": position["id"]}}
+        ]
+    items = await collection.find(page_query, {"_id": 0}).sort([("created_at", -1), ("id", -1)]).limit(limit + 1).to_list(limit + 1)
+    next_cursor = encode_cursor(items[limit - 1]) if len(items) > limit else None
+    return items[:limit], next_cursor
+
+def page_link(href: str, limit: int, cursor: Optional[str] = None) -> str:
+    return f"{href}?limit={limit}" + (f"&cursor={cursor}" if cursor else "")
+
+def parse_expand(expand: Optional[str], allowed: List[str]) -> List[str]:
+    if expand is None:
+        return allowed
+    names = [name.strip() for name in expand.split(",") if name.strip()]
+    unknown = sorted(set(names) - set(allowed))
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown expand value(s): {', '.join(unknown)}")
+    return names
+
+async def load_with_children(parent, children: Dict[str, tuple], expand: List[str], limit: int) -> Optional[dict]:
+    """Fetch a parent document and its children in one concurrent round trip.
+
+    `children` maps a name to (collection, query, href). Every child gets a count and
+    a first-page link; the ones named in `expand` are embedded with a next cursor.
+    """
+    names = list(children)
+    counts = [children[name][0].count_documents(children[name][1]) for name in names]
+    pages = [fetch_page(children[name][0], children[name][1], limit) for name in expand]
+    results = await asyncio.gather(parent, *counts, *pages)
+
+    doc = results[0]
+    if not doc:
+        return None
+    doc["children"] = {}
+    for name, count in zip(names, results[1:1 + len(names)]):
+        doc["children"][name] = {"count": count, "first": page_link(children[name][2], limit)}
+    for name, (items, next_cursor) in zip(expand, results[1 + len(names):]):
+        doc[name] = items
+        doc["children"][name]["next_cursor"] = next_cursor
+        doc["children"][name]["next"] = page_link(children[name][2], limit, next_cursor) if next_cursor else None
+    return doc
+
+async def list_children(collection, query: dict, href: str, limit: int, cursor: Optional[str], response: Response) -> List[dict]:
+    items, next_cursor = await fetch_page(collection, query, limit, cursor)
+    if next_cursor:
+        response.headers["Link"] = f'<{page_link(href, limit, next_cursor)}>; rel="next"'
+    return items
+
 # ============= MODELS =============
 
 ROLES = ["admin", "partner", "vendor", "customer", "crew", "manager"]
@@ -60,6 +369,7 @@ class UserUpdate(BaseModel):
 class AdminUserUpdate(BaseModel):
     status: Optional[str] = None
     role: Optional[str] = None
+    hourly_rate: Optional[float] = None
 
 # Inventory Models
 class PlantCreate(BaseModel):
@@ -77,6 +387,10 @@ class PlantCreate(BaseModel):
     description: Optional[str] = None
     care_info: Optional[str] = None
     image_url: Optional[str] = None
+    length_cm: Optional[float] = None
+    width_cm: Optional[float] = None
+    height_cm: Optional[float] = None
+    weight_kg: Optional[float] = None
 
 class PlantUpdate(BaseModel):
     name: Optional[str] = None
@@ -93,6 +407,10 @@ class PlantUpdate(BaseModel):
     description: Optional[str] = None
     care_info: Optional[str] = None
     image_url: Optional[str] = None
+    length_cm: Optional[float] = None
+    width_cm: Optional[float] = None
+    height_cm: Optional[float] = None
+    weight_kg: Optional[float] = None
 
 # Project Models
 class ProjectCreate(BaseModel):
@@ -104,8 +422,8 @@ class ProjectCreate(BaseModel):
     project_type: str = "landscaping"
     description: Optional[str] = None
     site_address: str
-    start_date: str
-    end_date: str
+    start_date: UTCDateTime
+    end_date: UTCDateTime
     budget: float = 0
     boq_items: List[Dict[str, Any]] = []
 
@@ -113,8 +431,8 @@ class ProjectUpdate(BaseModel):
     name: Optional[str] = None
     description: Optional[str] = None
     status: Optional[str] = None
-    start_date: Optional[str] = None
-    end_date: Optional[str] = None
+    start_date: Optional[UTCDateTime] = None
+    end_date: Optional[UTCDateTime] = None
     budget: Optional[float] = None
     boq_items: Optional[List[Dict[str, Any]]] = None
 
@@ -123,18 +441,25 @@ class TaskCreate(BaseModel):
     title: str
     description: Optional[str] = None
     assigned_to: Optional[str] = None
-    start_date: str
-    end_date: str
+    start_date: UTCDateTime
+    end_date: UTCDateTime
     priority: str = "medium"
 
 class CrewLogCreate(BaseModel):
     project_id: str
     crew_member_id: str
-    date: str
+    date: UTCDateTime
     hours_worked: float
     tasks_completed: str
     notes: Optional[str] = None
 
+class CrewLogBatchItem(CrewLogCreate):
+    client_id: str = Field(..., min_length=1)
+
+class CrewLogBatch(BaseModel):
+    # Entries are validated one by one so each gets its own status
+    logs: List[Any]
+
 # AMC Models
 class AMCCreate(BaseModel):
     client_name: str
@@ -143,14 +468,14 @@ class AMCCreate(BaseModel):
     service_type: str
     frequency: str = "monthly"
     amount: float
-    start_date: str
+    start_date: UTCDateTime
     property_address: str
     services_included: List[str] = []
     notes: Optional[str] = None
 
 class AMCVisitCreate(BaseModel):
     subscription_id: str
-    scheduled_date: str
+    scheduled_date: UTCDateTime
     crew_assigned: Optional[str] = None
     notes: Optional[str] = None
 
@@ -184,7 +509,7 @@ class RFQCreate(BaseModel):
     email: str
     phone: Optional[str] = None
     items: List[Dict[str, Any]]
-    delivery_date: str
+    delivery_date: UTCDateTime
     delivery_address: str
     notes: Optional[str] = None
 
@@ -195,9 +520,24 @@ class ExportDocCreate(BaseModel):
     customer_name: str
     destination_country: str
     items: List[Dict[str, Any]]
-    total_weight: float
-    total_boxes: int
+    total_weight: Optional[float] = None
+    total_boxes: Optional[int] = None
+    shipping_method: str = "air"
+    notes: Optional[str] = None
+
+class PackingRequest(BaseModel):
+    items: List[Dict[str, Any]]
     shipping_method: str = "air"
+
+class ExportDocUpdate(BaseModel):
+    order_id: Optional[str] = None
+    doc_type: Optional[str] = None
+    customer_name: Optional[str] = None
+    destination_country: Optional[str] = None
+    items: Optional[List[Dict[str, Any]]] = None
+    total_weight: Optional[float] = None
+    total_boxes: Optional[int] = None
+    shipping_method: Optional[str] = None
     notes: Optional[str] = None
 
 # Production Models
@@ -256,6 +596,11 @@ def require_roles(allowed_roles: List[str]):
         return user
     return role_checker
 
+def route_reads(request: Request):
+    """The database as this route should read it, with its configured read preference."""
+    mode = ROUTE_READ_PREFERENCES.get(f"{request.method} {request.scope['route'].path}", "primary")
+    return read_dbs[mode]
+
 # ============= AUTH ROUTES =============
 
 @api_router.post("/auth/register")
@@ -272,7 +617,7 @@ async def register(data: UserRegister):
     user = {
         "id": user_id,
         "email": data.email,
-        "password": hash_password(data.password),
+        "password": await asyncio.to_thread(hash_password, data.password),
         "full_name": data.full_name,
         "phone": data.phone,
         "company": data.company,
@@ -280,9 +625,10 @@ async def register(data: UserRegister):
         "role": data.role if data.role in ROLES else "customer",
         "status": status,
         "avatar_url": None,
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": utc_now()
     }
     await db.users.insert_one(user)
+    await index_for_search("user", user_id, user)
     
     if status == "active":
         token = create_token(user_id, user["role"])
@@ -293,7 +639,7 @@ async def register(data: UserRegister):
 @api_router.post("/auth/login")
 async def login(credentials: UserLogin):
     user = await db.users.find_one({"email": credentials.email})
-    if not user or not verify_password(credentials.password, user["password"]):
+    if not user or not await asyncio.to_thread(verify_password, credentials.password, user["password"]):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
     if user.get("status") == "pending":
@@ -314,16 +660,17 @@ async def get_me(user: dict = Depends(get_current_user)):
 @api_router.put("/auth/profile")
 async def update_profile(update: UserUpdate, user: dict = Depends(get_current_user)):
     update_data = {k: v for k, v in update.model_dump().items() if v is not None}
-    update_data["updated_at"] = datetime.now(timezone.utc).isoformat()
+    update_data["updated_at"] = utc_now()
     await db.users.update_one({"id": user["id"]}, {"$set": update_data})
+    await index_for_search("user", user["id"])
     return await db.users.find_one({"id": user["id"]}, {"_id": 0, "password": 0})
 
 @api_router.put("/auth/change-password")
 async def change_password(old_password: str, new_password: str, user: dict = Depends(get_current_user)):
     full_user = await db.users.find_one({"id": user["id"]})
-    if not verify_password(old_password, full_user["password"]):
+    if not await asyncio.to_thread(verify_password, old_password, full_user["password"]):
         raise HTTPException(status_code=400, detail="Current password incorrect")
-    await db.users.update_one({"id": user["id"]}, {"$set": {"password": hash_password(new_password)}})
+    await db.users.update_one({"id": user["id"]}, {"$set": {"password": await asyncio.to_thread(hash_password, new_password)}})
     return {"message": "Password changed successfully"}
 
 # ============= ADMIN USER MANAGEMENT =============
@@ -350,19 +697,20 @@ async def get_pending_users(user: dict = Depends(require_roles(["admin"]))):
 @api_router.put("/admin/users/{user_id}")
 async def update_user_admin(user_id: str, update: AdminUserUpdate, user: dict = Depends(require_roles(["admin"]))):
     update_data = {k: v for k, v in update.model_dump().items() if v is not None}
-    update_data["updated_at"] = datetime.now(timezone.utc).isoformat()
+    update_data["updated_at"] = utc_now()
     update_data["updated_by"] = user["id"]
     
     result = await db.users.update_one({"id": user_id}, {"$set": update_data})
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="User not found")
+    await index_for_search("user", user_id)
     return await db.users.find_one({"id": user_id}, {"_id": 0, "password": 0})
 
 @api_router.post("/admin/users/{user_id}/approve")
 async def approve_user(user_id: str, user: dict = Depends(require_roles(["admin"]))):
     result = await db.users.update_one(
         {"id": user_id, "status": "pending"},
-        {"$set": {"status": "active", "approved_at": datetime.now(timezone.utc).isoformat(), "approved_by": user["id"]}}
+        {"$set": {"status": "active", "approved_at": utc_now(), "approved_by": user["id"]}}
     )
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="User not found or not pending")
@@ -372,7 +720,7 @@ async def approve_user(user_id: str, user: dict = Depends(require_roles(["admin"
 async def reject_user(user_id: str, user: dict = Depends(require_roles(["admin"]))):
     result = await db.users.update_one(
         {"id": user_id},
-        {"$set": {"status": "rejected", "rejected_at": datetime.now(timezone.utc).isoformat(), "rejected_by": user["id"]}}
+        {"$set": {"status": "rejected", "rejected_at": utc_now(), "rejected_by": user["id"]}}
     )
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="User not found")
@@ -382,7 +730,7 @@ async def reject_user(user_id: str, user: dict = Depends(require_roles(["admin"]
 async def suspend_user(user_id: str, user: dict = Depends(require_roles(["admin"]))):
     result = await db.users.update_one(
         {"id": user_id},
-        {"$set": {"status": "suspended", "suspended_at": datetime.now(timezone.utc).isoformat(), "suspended_by": user["id"]}}
+        {"$set": {"status": "suspended", "suspended_at": utc_now(), "suspended_by": user["id"]}}
     )
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="User not found")
@@ -395,40 +743,42 @@ async def delete_user(user_id: str, user: dict = Depends(require_roles(["admin"]
     result = await db.users.delete_one({"id": user_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="User not found")
+    await index_for_search("user", user_id)
     return {"message": "User deleted"}
 
 # ============= ADMIN DASHBOARD =============
 
 @api_router.get("/admin/dashboard")
-async def get_admin_dashboard(user: dict = Depends(require_roles(["admin", "manager"]))):
+@single_flight.coalesce
+async def get_admin_dashboard(user: dict = Depends(require_roles(["admin", "manager"])), reads=Depends(route_reads)):
     stats = {
         "users": {
-            "total": await db.users.count_documents({}),
-            "pending": await db.users.count_documents({"status": "pending"}),
-            "active": await db.users.count_documents({"status": "active"}),
+            "total": await reads.users.count_documents({}),
+            "pending": await reads.users.count_documents({"status": "pending"}),
+            "active": await reads.users.count_documents({"status": "active"}),
             "by_role": {}
         },
         "inventory": {
-            "total_plants": await db.plants.count_documents({}),
-            "low_stock": await db.plants.count_documents({"$expr": {"$lte": ["$quantity", "$min_stock"]}}),
+            "total_plants": await reads.plants.count_documents({}),
+            "low_stock": await reads.plants.count_documents({"$expr": {"$lte": ["$quantity", "$min_stock"]}}),
             "total_value": 0
         },
         "projects": {
-            "total": await db.projects.count_documents({}),
-            "active": await db.projects.count_documents({"status": {"$in": ["planning", "in_progress"]}}),
-            "completed": await db.projects.count_documents({"status": "completed"})
+            "total": await reads.projects.count_documents({}),
+            "active": await reads.projects.count_documents({"status": {"$in": ["planning", "in_progress"]}}),
+            "completed": await reads.projects.count_documents({"status": "completed"})
         },
         "orders": {
-            "total": await db.orders.count_documents({}),
-            "pending": await db.orders.count_documents({"status": "pending"}),
+            "total": await with_archive("orders", reads).count_documents({}),
+            "pending": await reads.orders.count_documents({"status": "pending"}),
             "total_revenue": 0
         },
         "amc": {
-            "active": await db.amc_subscriptions.count_documents({"status": "active"}),
+            "active": await reads.amc_subscriptions.count_documents({"status": "active"}),
             "mrr": 0
         },
         "partners": {
-            "active": await db.users.count_documents({"role": "partner", "status": "active"}),
+            "active": await reads.users.count_documents({"role": "partner", "status": "active"}),
             "pending_commissions": 0
         },
         "recent_orders": [],
@@ -436,15 +786,15 @@ async def get_admin_dashboard(user: dict = Depends(require_roles(["admin", "mana
     }
     
     # Calculate inventory value
-    async for plant in db.plants.find({}, {"quantity": 1, "price": 1}):
+    async for plant in reads.plants.find({}, {"quantity": 1, "price": 1}):
         stats["inventory"]["total_value"] += plant.get("quantity", 0) * plant.get("price", 0)
     
     # Calculate revenue
-    async for order in db.orders.find({"status": {"$in": ["completed", "shipped"]}}, {"total": 1}):
+    async for order in with_archive("orders", reads).find({"status": {"$in": ["completed", "shipped"]}}, {"total": 1}):
         stats["orders"]["total_revenue"] += order.get("total", 0)
     
     # Calculate MRR
-    async for amc in db.amc_subscriptions.find({"status": "active"}, {"amount": 1, "frequency": 1}):
+    async for amc in reads.amc_subscriptions.find({"status": "active"}, {"amount": 1, "frequency": 1}):
         amount = amc.get("amount", 0)
         freq = amc.get("frequency", "monthly")
         if freq == "monthly":
@@ -455,16 +805,16 @@ async def get_admin_dashboard(user: dict = Depends(require_roles(["admin", "mana
             stats["amc"]["mrr"] += amount / 12
     
     # Calculate pending commissions
-    async for deal in db.partner_deals.find({"status": "pending"}, {"commission": 1}):
+    async for deal in reads.partner_deals.find({"status": "pending"}, {"commission": 1}):
         stats["partners"]["pending_commissions"] += deal.get("commission", 0)
     
     # User counts by role
     for role in ROLES:
-        stats["users"]["by_role"][role] = await db.users.count_documents({"role": role})
+        stats["users"]["by_role"][role] = await reads.users.count_documents({"role": role})
     
     # Recent data
-    stats["recent_orders"] = await db.orders.find({}, {"_id": 0}).sort("created_at", -1).limit(5).to_list(5)
-    stats["recent_users"] = await db.users.find({}, {"_id": 0, "password": 0}).sort("created_at", -1).limit(5).to_list(5)
+    stats["recent_orders"] = await reads.orders.find({}, {"_id": 0}).sort("created_at", -1).limit(5).to_list(5)
+    stats["recent_users"] = await reads.users.find({}, {"_id": 0, "password": 0}).sort("created_at", -1).limit(5).to_list(5)
     
     return stats
 
@@ -512,8 +862,8 @@ async def create_plant(plant: PlantCreate, user: dict = Depends(require_roles(["
         "batch_number": batch,
         **plant.model_dump(),
         "created_by": user["id"],
-        "created_at": datetime.now(timezone.utc).isoformat(),
-        "updated_at": datetime.now(timezone.utc).isoformat()
+        "created_at": utc_now(),
+        "updated_at": utc_now()
     }
     await db.plants.insert_one(plant_doc)
     plant_doc.pop("_id", None)
@@ -529,7 +879,7 @@ async def get_plant(plant_id: str, user: dict = Depends(require_roles(["admin",
 @api_router.put("/inventory/{plant_id}")
 async def update_plant(plant_id: str, update: PlantUpdate, user: dict = Depends(require_roles(["admin", "manager"]))):
     update_data = {k: v for k, v in update.model_dump().items() if v is not None}
-    update_data["updated_at"] = datetime.now(timezone.utc).isoformat()
+    update_data["updated_at"] = utc_now()
     update_data["updated_by"] = user["id"]
     
     result = await db.plants.update_one({"id": plant_id}, {"$set": update_data})
@@ -557,11 +907,11 @@ async def update_stock(plant_id: str, quantity_change: int, reason: str, user: d
         "reason": reason,
         "user_id": user["id"],
         "user_name": user["full_name"],
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": utc_now()
     }
     await db.stock_movements.insert_one(movement)
     
-    await db.plants.update_one({"id": plant_id}, {"$set": {"quantity": new_qty, "updated_at": datetime.now(timezone.utc).isoformat()}})
+    await db.plants.update_one({"id": plant_id}, {"$set": {"quantity": new_qty, "updated_at": utc_now()}})
     return {"message": "Stock updated", "new_quantity": new_qty}
 
 @api_router.delete("/inventory/{plant_id}")
@@ -579,21 +929,175 @@ async def get_categories(user: dict = Depends(require_roles(["admin", "manager",
 async def get_locations(user: dict = Depends(require_roles(["admin", "manager", "crew"]))):
     return await db.plants.distinct("location")
 
+# ============= CREW SCHEDULING =============
+
+AMC_VISIT_HOURS = float(os.environ.get('AMC_VISIT_HOURS', '3'))
+
+crew_calendar = CrewCalendar()
+
+def task_booking(task: dict) -> Optional[Booking]:
+    if not task.get("assigned_to") or task.get("status") == "completed":
+        return None
+    start = as_utc(task["start_date"])
+    end = max(day_inclusive_end(as_utc(task["end_date"])), start)
+    return Booking(f"task:{task['id']}", task["assigned_to"], "task", task["id"], start, end, task.get("title"))
+
+def visit_booking(visit: dict) -> Optional[Booking]:
+    if not visit.get("crew_assigned") or visit.get("status") != "scheduled":
+        return None
+    start = as_utc(visit["scheduled_date"])
+    # A visit booked for a date with no time holds the crew member for that whole day
+    end = day_inclusive_end(start) if start.time() == time(0) else start + timedelta(hours=AMC_VISIT_HOURS)
+    return Booking(f"visit:{visit['id']}", visit["crew_assigned"], "visit", visit["id"], start, end, visit.get("subscription_id"))
+
+def book_crew(booking: Optional[Booking]) -> List[dict]:
+    """Record a booking and return whatever it double-books, so callers can report it."""
+    if not booking:
+        return []
+    clashes = crew_calendar.conflicts(booking.crew_id, booking.start, booking.end, exclude_key=booking.key)
+    crew_calendar.book(booking)
+    return [clash.to_dict() for clash in clashes]
+
+TASK_BOOKING_FIELDS = {"_id": 0, "id": 1, "assigned_to": 1, "status": 1, "start_date": 1, "end_date": 1, "title": 1}
+VISIT_BOOKING_FIELDS = {"_id": 0, "id": 1, "crew_assigned": 1, "status": 1, "scheduled_date": 1, "subscription_id": 1}
+
+async def load_crew_calendar():
+    # Built aside and swapped in, so requests never see a half-loaded calendar
+    global crew_calendar
+    calendar = CrewCalendar()
+    tasks = db.project_tasks.find({"assigned_to": {"$ne": None}, "status": {"$ne": "completed"}}, TASK_BOOKING_FIELDS)
+    async for task in tasks:
+        booking = task_booking(task)
+        if booking:
+            calendar.book(booking)
+    visits = db.amc_visits.find({"crew_assigned": {"$ne": None}, "status": "scheduled"}, VISIT_BOOKING_FIELDS)
+    async for visit in visits:
+        booking = visit_booking(visit)
+        if booking:
+            calendar.book(booking)
+    crew_calendar = calendar
+
+async def refresh_crew_bookings(keys: List[str]):
+    """Re-read bookings another worker changed, by key ("task:<id>" or "visit:<id>")."""
+    ids = {"task": [], "visit": []}
+    for key in keys:
+        kind, _, ref_id = key.partition(":")
+        ids.setdefault(kind, []).append(ref_id)
+    tasks, visits = await asyncio.gather(
+        db.project_tasks.find({"id": {"$in": ids["task"]}}, TASK_BOOKING_FIELDS).to_list(None),
+        db.amc_visits.find({"id": {"$in": ids["visit"]}}, VISIT_BOOKING_FIELDS).to_list(None)
+    )
+    for key in keys:
+        crew_calendar.release(key)
+    for booking in [*map(task_booking, tasks), *map(visit_booking, visits)]:
+        if booking:
+            crew_calendar.book(booking)
+
+async def publish_bookings(keys: List[str]):
+    await invalidation_bus.publish("crew_calendar", keys)
+
+invalidation_bus.topic("crew_calendar", refresh_crew_bookings, load_crew_calendar)
+
+async def get_active_crew() -> List[dict]:
+    return await db.users.find(
+        {"role": "crew", "status": "active"},
+        {"_id": 0, "id": 1, "full_name": 1, "email": 1, "phone": 1}
+    ).to_list(1000)
+
+def check_window(start: datetime, end: datetime):
+    if as_utc(end) <= as_utc(start):
+        raise HTTPException(status_code=400, detail="end must be after start")
+    return as_utc(start), as_utc(end)
+
+@api_router.get("/crew/availability")
+async def get_crew_availability(start: datetime, end: datetime, user: dict = Depends(require_roles(["admin", "manager"]))):
+    start, end = check_window(start, end)
+    await invalidation_bus.ensure_fresh()
+    crew = await get_active_crew()
+    free_ids = set(crew_calendar.free_crew([c["id"] for c in crew], start, end))
+    return {
+        "start": start,
+        "end": end,
+        "free": [c for c in crew if c["id"] in free_ids],
+        "busy": [c for c in crew if c["id"] not in free_ids]
+    }
+
+@api_router.get("/crew/conflicts")
+async def get_crew_conflicts(crew_id: str, start: datetime, end: datetime, user: dict = Depends(require_roles(["admin", "manager"]))):
+    start, end = check_window(start, end)
+    await invalidation_bus.ensure_fresh()
+    clashes = crew_calendar.conflicts(crew_id, start, end)
+    return {"crew_id": crew_id, "available": not clashes, "conflicts": [c.to_dict() for c in clashes]}
+
+@api_router.get("/crew/calendar")
+async def get_crew_calendar(
+    start: datetime,
+    end: datetime,
+    crew_id: Optional[str] = None,
+    user: dict = Depends(require_roles(["admin", "manager", "crew"]))
+):
+    start, end = check_window(start, end)
+    await invalidation_bus.ensure_fresh()
+    if user["role"] == "crew":
+        crew_ids = [user["id"]]
+    elif crew_id:
+        crew_ids = [crew_id]
+    else:
+        crew_ids = [c["id"] for c in await get_active_crew()]
+    calendar = crew_calendar.calendar(crew_ids, start, end)
+    return {crew: [b.to_dict() for b in bookings] for crew, bookings in calendar.items()}
+
 # ============= PROJECTS (Landscaping) =============
 
+CREW_DEFAULT_HOURLY_RATE = float(os.environ.get('CREW_DEFAULT_HOURLY_RATE', '0'))
+PROJECT_SORT_FIELDS = ["created_at", "budget_variance", "actual_cost", "progress", "labour_hours"]
+
+def crew_hourly_rate(member: Optional[dict]) -> float:
+    rate = (member or {}).get("hourly_rate")
+    return float(rate) if rate is not None else CREW_DEFAULT_HOURLY_RATE
+
+async def apply_labour_rollup(project_id: str, hours: float, cost: float):
+    """Fold one crew log into the project's running totals without rescanning logs."""
+    await db.projects.update_one(
+        {"id": project_id},
+        {"$inc": {"labour_hours": hours, "actual_cost": cost, "budget_variance": -cost}}
+    )
+
+async def apply_task_rollup(project_id: str, total_delta: int, completed_delta: int):
+    """Adjust task counters and re-derive progress in the same single-document update."""
+    await db.projects.update_one({"id": project_id}, [
+        {"$set": {
+            "tasks_total": {"$add": [{"$ifNull": ["$tasks_total", 0]}, total_delta]},
+            "tasks_completed": {"$add": [{"$ifNull": ["$tasks_completed", 0]}, completed_delta]}
+        }},
+        {"$set": {"progress": {"$cond": [
+            {"$gt": ["$tasks_total", 0]},
+            {"$round": [{"$multiply": [{"$divide": ["$tasks_completed", "$tasks_total"]}, 100]}, 0]},
+            0
+        ]}}}
+    ])
+
 @api_router.get("/projects")
 async def get_projects(
     status: Optional[str] = None,
     project_type: Optional[str] = None,
+    over_budget: Optional[bool] = None,
+    sort_by: str = "created_at",
     user: dict = Depends(require_roles(["admin", "manager", "crew"]))
 ):
+    if sort_by not in PROJECT_SORT_FIELDS:
+        raise HTTPException(status_code=400, detail=f"sort_by must be one of: {', '.join(PROJECT_SORT_FIELDS)}")
     query = {}
     if status:
         query["status"] = status
     if project_type:
         query["project_type"] = project_type
-    
-    projects = await db.projects.find(query, {"_id": 0}).sort("created_at", -1).to_list(1000)
+    if over_budget is not None:
+        query["budget_variance"] = {"$lt": 0} if over_budget else {"$gte": 0}
+
+    # Variance sorts ascending so the most over-budget projects come first
+    direction = 1 if sort_by == "budget_variance" else -1
+    projects = await db.projects.find(query, {"_id": 0}).sort(sort_by, direction).to_list(1000)
     return projects
 
 @api_router.post("/projects")
@@ -608,34 +1112,50 @@ async def create_project(project: ProjectCreate, user: dict = Depends(require_ro
         "status": "planning",
         "progress": 0,
         "actual_cost": 0,
+        "labour_hours": 0,
+        "budget_variance": project.budget,
+        "tasks_total": 0,
+        "tasks_completed": 0,
         "created_by": user["id"],
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": utc_now()
     }
     await db.projects.insert_one(project_doc)
+    await index_for_search("project", project_id, project_doc)
     project_doc.pop("_id", None)
     return project_doc
 
 @api_router.get("/projects/{project_id}")
-async def get_project(project_id: str, user: dict = Depends(require_roles(["admin", "manager", "crew"]))):
-    project = await db.projects.find_one({"id": project_id}, {"_id": 0})
+async def get_project(
+    project_id: str,
+    expand: Optional[str] = None,
+    limit: int = Query(CHILD_PAGE_SIZE, ge=1, le=100),
+    user: dict = Depends(require_roles(["admin", "manager", "crew"]))
+):
+    children = {
+        "tasks": (db.project_tasks, {"project_id": project_id}, f"/api/projects/{project_id}/tasks"),
+        "crew_logs": (with_archive("crew_logs"), {"project_id": project_id}, f"/api/projects/{project_id}/crew-logs")
+    }
+    expanded = parse_expand(expand, list(children))
+    project = await load_with_children(db.projects.find_one({"id": project_id}, {"_id": 0}), children, expanded, limit)
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
-    
-    # Get tasks
-    project["tasks"] = await db.project_tasks.find({"project_id": project_id}, {"_id": 0}).to_list(100)
-    # Get crew logs
-    project["crew_logs"] = await db.crew_logs.find({"project_id": project_id}, {"_id": 0}).to_list(100)
-    
     return project
 
 @api_router.put("/projects/{project_id}")
 async def update_project(project_id: str, update: ProjectUpdate, user: dict = Depends(require_roles(["admin", "manager"]))):
     update_data = {k: v for k, v in update.model_dump().items() if v is not None}
-    update_data["updated_at"] = datetime.now(timezone.utc).isoformat()
-    
-    result = await db.projects.update_one({"id": project_id}, {"$set": update_data})
+    update_data["updated_at"] = utc_now()
+
+    if "budget" in update_data:
+        # Re-derive variance against the stored cost in the same atomic update
+        stage = {k: {"$literal": v} for k, v in update_data.items()}
+        stage["budget_variance"] = {"$subtract": [update_data["budget"], {"$ifNull": ["$actual_cost", 0]}]}
+        result = await db.projects.update_one({"id": project_id}, [{"$set": stage}])
+    else:
+        result = await db.projects.update_one({"id": project_id}, {"$set": update_data})
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Project not found")
+    await index_for_search("project", project_id)
     return await db.projects.find_one({"id": project_id}, {"_id": 0})
 
 @api_router.post("/projects/{project_id}/signoff")
@@ -647,7 +1167,7 @@ async def client_signoff(project_id: str, signature: str, notes: Optional[str] =
             "client_signoff": True,
             "signoff_signature": signature,
             "signoff_notes": notes,
-            "signoff_date": datetime.now(timezone.utc).isoformat(),
+            "signoff_date": utc_now(),
             "signoff_by": user["id"]
         }}
     )
@@ -655,59 +1175,181 @@ async def client_signoff(project_id: str, signature: str, notes: Optional[str] =
         raise HTTPException(status_code=404, detail="Project not found")
     return {"message": "Project signed off"}
 
+@api_router.post("/projects/{project_id}/rollups/rebuild")
+async def rebuild_project_rollups(project_id: str, user: dict = Depends(require_roles(["admin"]))):
+    """Recompute rollups from scratch, for projects created before they were tracked."""
+    project = await db.projects.find_one({"id": project_id}, {"_id": 0, "budget": 1})
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    labour = await db.crew_logs.aggregate([
+        {"$match": {"project_id": project_id}},
+        {"$unionWith": {"coll": archive_name("crew_logs"), "pipeline": [{"$match": {"project_id": project_id}}]}},
+        {"$group": {"_id": None, "hours": {"$sum": "$hours_worked"}, "cost": {"$sum": {"$ifNull": ["$labour_cost", 0]}}}}
+    ]).to_list(1)
+    tasks_total, tasks_completed = await asyncio.gather(
+        db.project_tasks.count_documents({"project_id": project_id}),
+        db.project_tasks.count_documents({"project_id": project_id, "status": "completed"})
+    )
+    hours = labour[0]["hours"] if labour else 0
+    cost = labour[0]["cost"] if labour else 0
+    rollups = {
+        "labour_hours": hours,
+        "actual_cost": cost,
+        "budget_variance": project.get("budget", 0) - cost,
+        "tasks_total": tasks_total,
+        "tasks_completed": tasks_completed,
+        "progress": round(100 * tasks_completed / tasks_total) if tasks_total else 0
+    }
+    await db.projects.update_one({"id": project_id}, {"$set": rollups})
+    return rollups
+
 @api_router.post("/projects/tasks")
 async def create_task(task: TaskCreate, user: dict = Depends(require_roles(["admin", "manager"]))):
     task_id = str(uuid.uuid4())
+    now = utc_now()
     task_doc = {
         "id": task_id,
         **task.model_dump(),
         "status": "pending",
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": now,
+        "updated_at": now
     }
     await db.project_tasks.insert_one(task_doc)
+    await apply_task_rollup(task.project_id, 1, 0)
     task_doc.pop("_id", None)
-    return task_doc
+    await invalidation_bus.ensure_fresh()
+    conflicts = book_crew(task_booking(task_doc))
+    await publish_bookings([f"task:{task_id}"])
+    return {**task_doc, "conflicts": conflicts}
 
 @api_router.put("/projects/tasks/{task_id}")
 async def update_task(task_id: str, status: str = Query(...), user: dict = Depends(require_roles(["admin", "manager", "crew"]))):
-    result = await db.project_tasks.update_one(
-        {"id": task_id},
-        {"$set": {"status": status, "updated_at": datetime.now(timezone.utc).isoformat()}}
+    update_data = {"status": status, "updated_at": utc_now()}
+    previous = await db.project_tasks.find_one_and_update(
+        {"id": task_id}, {"$set": update_data}, projection={"_id": 0}, return_document=ReturnDocument.BEFORE
     )
-    if result.matched_count == 0:
+    if not previous:
         raise HTTPException(status_code=404, detail="Task not found")
-    return await db.project_tasks.find_one({"id": task_id}, {"_id": 0})
+
+    was_completed = previous.get("status") == "completed"
+    if was_completed != (status == "completed"):
+        await apply_task_rollup(previous["project_id"], 0, -1 if was_completed else 1)
+
+    task = {**previous, **update_data}
+    await track_sync_view("task", previous, task, "assigned_to", task_synced)
+    await invalidation_bus.ensure_fresh()
+    crew_calendar.release(f"task:{task_id}")
+    conflicts = book_crew(task_booking(task))
+    await publish_bookings([f"task:{task_id}"])
+    return {**task, "conflicts": conflicts}
 
 @api_router.post("/projects/crew-logs")
 async def create_crew_log(log: CrewLogCreate, user: dict = Depends(require_roles(["admin", "manager", "crew"]))):
     log_id = str(uuid.uuid4())
+    member = await db.users.find_one({"id": log.crew_member_id}, {"_id": 0, "hourly_rate": 1})
+    rate = crew_hourly_rate(member)
+    now = utc_now()
     log_doc = {
         "id": log_id,
         **log.model_dump(),
+        "hourly_rate": rate,
+        "labour_cost": log.hours_worked * rate,
         "created_by": user["id"],
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": now,
+        "updated_at": now
     }
     await db.crew_logs.insert_one(log_doc)
+    await apply_labour_rollup(log.project_id, log.hours_worked, log_doc["labour_cost"])
     log_doc.pop("_id", None)
     return log_doc
 
 @api_router.get("/projects/{project_id}/crew-logs")
-async def get_crew_logs(project_id: str, user: dict = Depends(require_roles(["admin", "manager", "crew"]))):
-    logs = await db.crew_logs.find({"project_id": project_id}, {"_id": 0}).to_list(1000)
-    return logs
+async def get_crew_logs(
+    project_id: str,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    user: dict = Depends(require_roles(["admin", "manager", "crew"]))
+):
+    return await list_children(
+        with_archive("crew_logs"), {"project_id": project_id}, f"/api/projects/{project_id}/crew-logs", limit, cursor, response
+    )
+
+@api_router.get("/projects/{project_id}/tasks")
+async def get_project_tasks(
+    project_id: str,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    user: dict = Depends(require_roles(["admin", "manager", "crew"]))
+):
+    return await list_children(
+        db.project_tasks, {"project_id": project_id}, f"/api/projects/{project_id}/tasks", limit, cursor, response
+    )
 
 # ============= AMC (Maintenance Subscriptions) =============
 
+AMC_FREQUENCY_DAYS = {"monthly": 30, "quarterly": 90, "yearly": 365}
+
+def expand_visit_dates(start: date, frequency: str, window_start: date, window_end: date) -> List[date]:
+    """Visit dates falling in [window_start, window_end), anchored on the subscription start."""
+    step = AMC_FREQUENCY_DAYS.get(frequency)
+    if not step:
+        return []
+    first = start
+    if first < window_start:
+        periods = -(-(window_start - start).days // step)
+        first = start + timedelta(days=periods * step)
+    dates = []
+    current = first
+    while current < window_end:
+        dates.append(current)
+        current += timedelta(days=step)
+    return dates
+
+def visit_slot(start: date, frequency: str, day: date) -> int:
+    """Which of the subscription's visits `day` stands for: the nearest slot of expand_visit_dates.
+
+    A visit booked by hand a few days either side of its slot still fills that slot.
+    """
+    step = AMC_FREQUENCY_DAYS[frequency]
+    return ((day - start).days + step // 2) // step
+
+async def get_crew_loads() -> Dict[str, int]:
+    """Open work per active crew member: scheduled visits plus unfinished project tasks."""
+    crew_ids = [u["id"] async for u in db.users.find({"role": "crew", "status": "active"}, {"_id": 0, "id": 1})]
+    loads = dict.fromkeys(crew_ids, 0)
+    if not crew_ids:
+        return loads
+
+    visit_counts = db.amc_visits.aggregate([
+        {"$match": {"status": "scheduled", "crew_assigned": {"$in": crew_ids}}},
+        {"$group": {"_id": "$crew_assigned", "count": {"$sum": 1}}}
+    ])
+    async for row in visit_counts:
+        loads[row["_id"]] += row["count"]
+
+    task_counts = db.project_tasks.aggregate([
+        {"$match": {"status": {"$ne": "completed"}, "assigned_to": {"$in": crew_ids}}},
+        {"$group": {"_id": "$assigned_to", "count": {"$sum": 1}}}
+    ])
+    async for row in task_counts:
+        loads[row["_id"]] += row["count"]
+
+    return loads
+
 @api_router.get("/amc")
 async def get_amc_subscriptions(
     status: Optional[str] = None,
-    user: dict = Depends(require_roles(["admin", "manager"]))
+    user: dict = Depends(require_roles(["admin", "manager"])),
+    reads=Depends(route_reads)
 ):
     query = {}
     if status:
         query["status"] = status
     
-    subs = await db.amc_subscriptions.find(query, {"_id": 0}).sort("created_at", -1).to_list(1000)
+    subs = await reads.amc_subscriptions.find(query, {"_id": 0}).sort("created_at", -1).to_list(1000)
     return subs
 
 @api_router.post("/amc")
@@ -716,68 +1358,233 @@ async def create_amc(amc: AMCCreate, user: dict = Depends(require_roles(["admin"
     contract_number = f"AMC-{datetime.now().strftime('%Y%m%d')}-{str(uuid.uuid4())[:4].upper()}"
     
     # Calculate next billing date
-    next_billing = datetime.fromisoformat(amc.start_date)
-    if amc.frequency == "monthly":
-        next_billing += timedelta(days=30)
-    elif amc.frequency == "quarterly":
-        next_billing += timedelta(days=90)
-    elif amc.frequency == "yearly":
-        next_billing += timedelta(days=365)
+    next_billing = amc.start_date + timedelta(days=AMC_FREQUENCY_DAYS.get(amc.frequency, 0))
     
     sub_doc = {
         "id": sub_id,
         "contract_number": contract_number,
         **amc.model_dump(),
         "status": "active",
-        "next_billing_date": next_billing.isoformat(),
+        "next_billing_date": next_billing,
         "total_visits": 0,
         "created_by": user["id"],
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": utc_now()
     }
     await db.amc_subscriptions.insert_one(sub_doc)
+    await index_for_search("amc", sub_id, sub_doc)
     sub_doc.pop("_id", None)
     return sub_doc
 
 @api_router.get("/amc/{sub_id}")
-async def get_amc(sub_id: str, user: dict = Depends(require_roles(["admin", "manager"]))):
-    sub = await db.amc_subscriptions.find_one({"id": sub_id}, {"_id": 0})
+async def get_amc(
+    sub_id: str,
+    expand: Optional[str] = None,
+    limit: int = Query(CHILD_PAGE_SIZE, ge=1, le=100),
+    user: dict = Depends(require_roles(["admin", "manager"]))
+):
+    children = {
+        "visits": (with_archive("amc_visits"), {"subscription_id": sub_id}, f"/api/amc/{sub_id}/visits"),
+        "invoices": (with_archive("invoices"), {"subscription_id": sub_id}, f"/api/amc/{sub_id}/invoices")
+    }
+    expanded = parse_expand(expand, list(children))
+    sub = await load_with_children(db.amc_subscriptions.find_one({"id": sub_id}, {"_id": 0}), children, expanded, limit)
     if not sub:
         raise HTTPException(status_code=404, detail="Subscription not found")
-    
-    sub["visits"] = await db.amc_visits.find({"subscription_id": sub_id}, {"_id": 0}).to_list(100)
-    sub["invoices"] = await db.invoices.find({"subscription_id": sub_id}, {"_id": 0}).to_list(100)
-    
     return sub
 
+@api_router.get("/amc/{sub_id}/visits")
+async def get_amc_visits(
+    sub_id: str,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    user: dict = Depends(require_roles(["admin", "manager"]))
+):
+    return await list_children(
+        with_archive("amc_visits"), {"subscription_id": sub_id}, f"/api/amc/{sub_id}/visits", limit, cursor, response
+    )
+
+@api_router.get("/amc/{sub_id}/invoices")
+async def get_amc_invoices(
+    sub_id: str,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    user: dict = Depends(require_roles(["admin", "manager"]))
+):
+    return await list_children(
+        with_archive("invoices"), {"subscription_id": sub_id}, f"/api/amc/{sub_id}/invoices", limit, cursor, response
+    )
+
+@api_router.post("/amc/schedule/generate")
+async def generate_visit_schedule(
+    horizon_days: int = Query(90, ge=1, le=366),
+    start_date: Optional[date] = None,
+    background: bool = False,
+    user: dict = Depends(require_roles(["admin", "manager"]))
+):
+    if background:
+        params = {"horizon_days": horizon_days, "start_date": start_date.isoformat() if start_date else None, "created_by": user["id"]}
+        job = await job_queue.enqueue("amc_schedule", params, created_by=user["id"])
+        return JSONResponse({"job_id": job["id"], "status_url": f"/api/jobs/{job['id']}"}, status_code=202)
+    return await plan_visit_schedule(horizon_days, start_date, user["id"])
+
+@job_queue.handler("amc_schedule")
+async def run_visit_schedule_job(job: JobContext) -> dict:
+    start_date = job.params.get("start_date")
+    summary = await plan_visit_schedule(
+        job.params["horizon_days"], date.fromisoformat(start_date) if start_date else None, job.params["created_by"]
+    )
+    return jsonable_encoder(summary)
+
+async def plan_visit_schedule(horizon_days: int, start_date: Optional[date], created_by: str) -> dict:
+    """Create the window's missing visits, each assigned to the least-loaded free crew member.
+
+    Safe to repeat: slots that already have a visit are skipped and `schedule_key` is unique.
+    """
+    window_start = start_date or utc_now().date()
+    window_end = window_start + timedelta(days=horizon_days)
+
+    subs = await db.amc_subscriptions.find(
+        {"status": "active"},
+        {"_id": 0, "id": 1, "frequency": 1, "start_date": 1}
+    ).to_list(None)
+
+    schedules = {}
+    for sub in subs:
+        try:
+            sub_start = as_utc(sub["start_date"]).date()
+        except (KeyError, TypeError, ValueError):
+            continue
+        if sub.get("frequency", "monthly") in AMC_FREQUENCY_DAYS:
+            schedules[sub["id"]] = (sub_start, sub.get("frequency", "monthly"))
+
+    # A slot is filled by any visit nearer to it than to its neighbours, generated or booked
+    # by hand, so the edge slots can be filled from up to half a period outside the window
+    reach = timedelta(days=max(AMC_FREQUENCY_DAYS.values()) // 2)
+    existing = set()
+    async for visit in db.amc_visits.find(
+        {"scheduled_date": {"$gte": as_utc(window_start - reach), "$lt": as_utc(window_end + reach)}},
+        {"_id": 0, "subscription_id": 1, "scheduled_date": 1}
+    ):
+        schedule = schedules.get(visit["subscription_id"])
+        if schedule:
+            existing.add((visit["subscription_id"], visit_slot(*schedule, as_utc(visit["scheduled_date"]).date())))
+
+    planned = []
+    already_scheduled = 0
+    for sub_id, (sub_start, frequency) in schedules.items():
+        for visit_date in expand_visit_dates(sub_start, frequency, window_start, window_end):
+            if (sub_id, visit_slot(sub_start, frequency, visit_date)) in existing:
+                already_scheduled += 1
+            else:
+                planned.append((visit_date, sub_id))
+    planned.sort()
+
+    # Least-loaded crew member who is free that day takes each visit, in date order
+    await invalidation_bus.ensure_fresh()
+    loads = await get_crew_loads()
+    heap = [(load, crew_id) for crew_id, load in loads.items()]
+    heapq.heapify(heap)
+    assignments: Dict[str, int] = {}
+
+    now = utc_now()
+    visit_docs = []
+    for visit_date, sub_id in planned:
+        crew_id = None
+        if heap:
+            day_start = as_utc(visit_date)
+            day_end = day_start + timedelta(days=1)
+            skipped = []
+            while heap:
+                load, crew_id = heapq.heappop(heap)
+                if crew_calendar.is_free(crew_id, day_start, day_end):
+                    break
+                skipped.append((load, crew_id))
+            else:
+                # Everyone is booked that day; fall back to the least loaded
+                load, crew_id = skipped.pop(0)
+            for entry in skipped:
+                heapq.heappush(heap, entry)
+            heapq.heappush(heap, (load + 1, crew_id))
+            assignments[crew_id] = assignments.get(crew_id, 0) + 1
+        visit_docs.append({
+            "id": str(uuid.uuid4()),
+            "subscription_id": sub_id,
+            "scheduled_date": as_utc(visit_date),
+            "crew_assigned": crew_id,
+            "notes": None,
+            "status": "scheduled",
+            "schedule_key": f"{sub_id}:{visit_date.isoformat()}",
+            "auto_generated": True,
+            "created_by": created_by,
+            "created_at": now,
+            "updated_at": now
+        })
+        book_crew(visit_booking(visit_docs[-1]))
+
+    created = 0
+    if visit_docs:
+        try:
+            result = await db.amc_visits.insert_many(visit_docs, ordered=False)
+            created = len(result.inserted_ids)
+        except BulkWriteError as e:
+            # A concurrent run may have written some of the same visits first;
+            # rebuild the calendar so it only holds visits that were stored
+            await invalidation_bus.reload()
+            if any(err.get("code") != 11000 for err in e.details.get("writeErrors", [])):
+                raise
+            created = e.details.get("nInserted", 0)
+        finally:
+            await publish_bookings([f"visit:{doc['id']}" for doc in visit_docs])
+
+    return {
+        "window_start": window_start,
+        "window_end": window_end,
+        "subscriptions": len(subs),
+        "visits_created": created,
+        "visits_skipped": already_scheduled + len(visit_docs) - created,
+        "crew_assignments": assignments
+    }
+
 @api_router.post("/amc/{sub_id}/visit")
 async def schedule_visit(sub_id: str, visit: AMCVisitCreate, user: dict = Depends(require_roles(["admin", "manager"]))):
     visit_id = str(uuid.uuid4())
+    now = utc_now()
     visit_doc = {
         "id": visit_id,
         **visit.model_dump(),
         "status": "scheduled",
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": now,
+        "updated_at": now
     }
     await db.amc_visits.insert_one(visit_doc)
     visit_doc.pop("_id", None)
-    return visit_doc
+    await invalidation_bus.ensure_fresh()
+    conflicts = book_crew(visit_booking(visit_doc))
+    await publish_bookings([f"visit:{visit_id}"])
+    return {**visit_doc, "conflicts": conflicts}
 
 @api_router.put("/amc/visits/{visit_id}/complete")
 async def complete_visit(visit_id: str, notes: Optional[str] = None, user: dict = Depends(require_roles(["admin", "manager", "crew"]))):
-    result = await db.amc_visits.update_one(
-        {"id": visit_id},
-        {"$set": {
-            "status": "completed",
-            "completed_at": datetime.now(timezone.utc).isoformat(),
-            "completed_by": user["id"],
-            "completion_notes": notes
-        }}
+    now = utc_now()
+    update_data = {
+        "status": "completed",
+        "completed_at": now,
+        "completed_by": user["id"],
+        "completion_notes": notes,
+        "updated_at": now
+    }
+    visit = await db.amc_visits.find_one_and_update(
+        {"id": visit_id}, {"$set": update_data}, projection={"_id": 0}, return_document=ReturnDocument.BEFORE
     )
-    if result.matched_count == 0:
+    if not visit:
         raise HTTPException(status_code=404, detail="Visit not found")
-    
+    await track_sync_view("visit", visit, {**visit, **update_data}, "crew_assigned", visit_synced)
+    crew_calendar.release(f"visit:{visit_id}")
+    await publish_bookings([f"visit:{visit_id}"])
+
     # Update subscription visit count
-    visit = await db.amc_visits.find_one({"id": visit_id})
     await db.amc_subscriptions.update_one(
         {"id": visit["subscription_id"]},
         {"$inc": {"total_visits": 1}}
@@ -803,45 +1610,48 @@ async def generate_invoice(sub_id: str, user: dict = Depends(require_roles(["adm
         "amount": sub["amount"],
         "service_type": sub["service_type"],
         "status": "pending",
-        "due_date": (datetime.now(timezone.utc) + timedelta(days=15)).isoformat(),
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "due_date": utc_now() + timedelta(days=15),
+        "created_at": utc_now()
     }
     await db.invoices.insert_one(invoice)
     
     # Update next billing date
-    next_billing = datetime.fromisoformat(sub["next_billing_date"])
-    if sub["frequency"] == "monthly":
-        next_billing += timedelta(days=30)
-    elif sub["frequency"] == "quarterly":
-        next_billing += timedelta(days=90)
-    elif sub["frequency"] == "yearly":
-        next_billing += timedelta(days=365)
+    next_billing = as_utc(sub["next_billing_date"]) + timedelta(days=AMC_FREQUENCY_DAYS.get(sub["frequency"], 0))
     
     await db.amc_subscriptions.update_one(
         {"id": sub_id},
-        {"$set": {"next_billing_date": next_billing.isoformat()}}
+        {"$set": {"next_billing_date": next_billing}}
     )
     
     invoice.pop("_id", None)
     return invoice
 
 @api_router.get("/amc/invoices/all")
-async def get_all_invoices(status: Optional[str] = None, user: dict = Depends(require_roles(["admin", "manager"]))):
+async def get_all_invoices(
+    status: Optional[str] = None,
+    due_from: Optional[datetime] = None,
+    due_to: Optional[datetime] = None,
+    user: dict = Depends(require_roles(["admin", "manager"])),
+    reads=Depends(route_reads)
+):
     query = {}
     if status:
         query["status"] = status
-    invoices = await db.invoices.find(query, {"_id": 0}).sort("created_at", -1).to_list(1000)
+    if due_from or due_to:
+        query["due_date"] = date_range(due_from, due_to)
+        return await reads.invoices.find(query, {"_id": 0}).sort("due_date", 1).to_list(1000)
+    invoices = await reads.invoices.find(query, {"_id": 0}).sort("created_at", -1).to_list(1000)
     return invoices
 
 # ============= PARTNERS (Sales Commission) =============
 
 @api_router.get("/partners")
-async def get_partners(user: dict = Depends(require_roles(["admin", "manager"]))):
-    partners = await db.users.find({"role": "partner"}, {"_id": 0, "password": 0}).to_list(1000)
+async def get_partners(user: dict = Depends(require_roles(["admin", "manager"])), reads=Depends(route_reads)):
+    partners = await reads.users.find({"role": "partner"}, {"_id": 0, "password": 0}).to_list(1000)
     
     # Enrich with deal stats
     for partner in partners:
-        deals = await db.partner_deals.find({"partner_id": partner["id"]}, {"_id": 0}).to_list(1000)
+        deals = await reads.partner_deals.find({"partner_id": partner["id"]}, {"_id": 0}).to_list(1000)
         partner["total_deals"] = len(deals)
         partner["total_sales"] = sum(d.get("deal_value", 0) for d in deals)
         partner["total_commission"] = sum(d.get("commission", 0) for d in deals if d.get("status") == "paid")
@@ -880,23 +1690,23 @@ async def create_deal(deal: PartnerDealCreate, user: dict = Depends(require_role
         "commission": deal.deal_value * (commission_rate / 100),
         "status": "pending",
         "locked": True,
-        "locked_at": datetime.now(timezone.utc).isoformat(),
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "locked_at": utc_now(),
+        "created_at": utc_now()
     }
     await db.partner_deals.insert_one(deal_doc)
     deal_doc.pop("_id", None)
     return deal_doc
 
 @api_router.get("/partners/{partner_id}/deals")
-async def get_partner_deals(partner_id: str, user: dict = Depends(require_roles(["admin", "manager"]))):
-    deals = await db.partner_deals.find({"partner_id": partner_id}, {"_id": 0}).to_list(1000)
+async def get_partner_deals(partner_id: str, user: dict = Depends(require_roles(["admin", "manager"])), reads=Depends(route_reads)):
+    deals = await reads.partner_deals.find({"partner_id": partner_id}, {"_id": 0}).to_list(1000)
     return deals
 
 @api_router.post("/partners/deals/{deal_id}/approve")
 async def approve_deal(deal_id: str, user: dict = Depends(require_roles(["admin"]))):
     result = await db.partner_deals.update_one(
         {"id": deal_id, "status": "pending"},
-        {"$set": {"status": "approved", "approved_at": datetime.now(timezone.utc).isoformat(), "approved_by": user["id"]}}
+        {"$set": {"status": "approved", "approved_at": utc_now(), "approved_by": user["id"]}}
     )
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Deal not found or not pending")
@@ -910,7 +1720,7 @@ async def pay_commission(deal_id: str, user: dict = Depends(require_roles(["admi
     
     await db.partner_deals.update_one(
         {"id": deal_id},
-        {"$set": {"status": "paid", "paid_at": datetime.now(timezone.utc).isoformat(), "paid_by": user["id"]}}
+        {"$set": {"status": "paid", "paid_at": utc_now(), "paid_by": user["id"]}}
     )
     return {"message": "Commission paid", "amount": deal["commission"]}
 
@@ -920,15 +1730,20 @@ async def pay_commission(deal_id: str, user: dict = Depends(require_roles(["admi
 async def get_orders(
     status: Optional[str] = None,
     order_type: Optional[str] = None,
-    user: dict = Depends(require_roles(["admin", "manager"]))
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    user: dict = Depends(require_roles(["admin", "manager"])),
+    reads=Depends(route_reads)
 ):
     query = {}
     if status:
         query["status"] = status
     if order_type:
         query["order_type"] = order_type
+    if created_from or created_to:
+        query["created_at"] = date_range(created_from, created_to)
     
-    orders = await db.orders.find(query, {"_id": 0}).sort("created_at", -1).to_list(1000)
+    orders = await reads.orders.find(query, {"_id": 0}).sort("created_at", -1).to_list(1000)
     return orders
 
 @api_router.post("/orders")
@@ -942,9 +1757,10 @@ async def create_order(order: OrderCreate, user: dict = Depends(get_current_user
         "user_id": user["id"],
         **order.model_dump(),
         "status": "pending",
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": utc_now()
     }
     await db.orders.insert_one(order_doc)
+    await index_for_search("order", order_id, order_doc)
     order_doc.pop("_id", None)
     return order_doc
 
@@ -958,9 +1774,10 @@ async def create_public_order(order: OrderCreate):
         "order_number": order_number,
         **order.model_dump(),
         "status": "pending",
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": utc_now()
     }
     await db.orders.insert_one(order_doc)
+    await index_for_search("order", order_id, order_doc)
     order_doc.pop("_id", None)
     return order_doc
 
@@ -970,7 +1787,7 @@ async def get_order(order_id: str, user: dict = Depends(get_current_user)):
     if user["role"] == "customer":
         query["user_id"] = user["id"]
     
-    order = await db.orders.find_one(query, {"_id": 0})
+    order = await with_archive("orders").find_one(query, {"_id": 0})
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     return order
@@ -979,7 +1796,7 @@ async def get_order(order_id: str, user: dict = Depends(get_current_user)):
 async def update_order_status(order_id: str, status: str = Query(...), user: dict = Depends(require_roles(["admin", "manager"]))):
     result = await db.orders.update_one(
         {"id": order_id},
-        {"$set": {"status": status, "updated_at": datetime.now(timezone.utc).isoformat()}}
+        {"$set": {"status": status, "updated_at": utc_now()}}
     )
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Order not found")
@@ -987,11 +1804,32 @@ async def update_order_status(order_id: str, status: str = Query(...), user: dic
 
 @api_router.get("/orders/my/all")
 async def get_my_orders(user: dict = Depends(get_current_user)):
-    orders = await db.orders.find({"user_id": user["id"]}, {"_id": 0}).sort("created_at", -1).to_list(100)
+    orders = await with_archive("orders").find({"user_id": user["id"]}, {"_id": 0}).sort("created_at", -1).to_list(100)
     return orders
 
 # ============= RFQ (Bulk Quotes) =============
 
+RFQ_QUOTE_RULES = QuoteRules(
+    tiers=parse_tiers(os.environ.get('RFQ_PRICE_TIERS', '50:0.05,200:0.10,1000:0.15')),
+    min_margin=float(os.environ.get('RFQ_MIN_MARGIN', 0.15)),
+    cost_markup=float(os.environ.get('RFQ_COST_MARKUP', 0.6))
+)
+RFQ_QUOTE_VALID_DAYS = int(os.environ.get('RFQ_QUOTE_VALID_DAYS', 14))
+
+PRICE_CATALOG_FIELDS = {"_id": 0, "id": 1, "name": 1, "price": 1, "cost": 1, "quantity": 1, "reserved": 1}
+# Lines name plants however the buyer typed them; PriceCatalog ignores case, and so does this lookup
+PLANT_NAME_COLLATION = {"locale": "en", "strength": 2}
+
+async def load_price_catalog(items: List[dict]) -> PriceCatalog:
+    """The plants the RFQ's lines refer to, by id or by name."""
+    ids = list({item["plant_id"] for item in items if item.get("plant_id")})
+    names = list({" ".join(str(item["name"]).split()) for item in items if item.get("name")})
+    by_id, by_name = await asyncio.gather(
+        db.plants.find({"id": {"$in": ids}}, PRICE_CATALOG_FIELDS).to_list(None),
+        db.plants.find({"name": {"$in": names}}, PRICE_CATALOG_FIELDS, collation=PLANT_NAME_COLLATION).to_list(None)
+    )
+    return PriceCatalog(list({plant["id"]: plant for plant in [*by_id, *by_name]}.values()))
+
 @api_router.get("/rfq")
 async def get_rfqs(status: Optional[str] = None, user: dict = Depends(require_roles(["admin", "manager"]))):
     query = {}
@@ -1010,56 +1848,182 @@ async def create_rfq(rfq: RFQCreate):
         "rfq_number": rfq_number,
         **rfq.model_dump(),
         "status": "pending",
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": utc_now()
     }
     await db.rfqs.insert_one(rfq_doc)
+    await index_for_search("rfq", rfq_id, rfq_doc)
     rfq_doc.pop("_id", None)
     return rfq_doc
 
 @api_router.put("/rfq/{rfq_id}/quote")
-async def respond_to_rfq(rfq_id: str, quote_amount: float, valid_until: str, notes: Optional[str] = None, user: dict = Depends(require_roles(["admin", "manager"]))):
+async def respond_to_rfq(rfq_id: str, quote_amount: float, valid_until: datetime, notes: Optional[str] = None, user: dict = Depends(require_roles(["admin", "manager"]))):
     result = await db.rfqs.update_one(
         {"id": rfq_id},
         {"$set": {
             "status": "quoted",
             "quote_amount": quote_amount,
-            "quote_valid_until": valid_until,
+            "quote_valid_until": as_utc(valid_until),
             "quote_notes": notes,
             "quoted_by": user["id"],
-            "quoted_at": datetime.now(timezone.utc).isoformat()
+            "quoted_at": utc_now()
         }}
     )
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="RFQ not found")
     return await db.rfqs.find_one({"id": rfq_id}, {"_id": 0})
 
+@api_router.post("/rfq/{rfq_id}/auto-quote")
+async def auto_quote_rfq(rfq_id: str, apply: bool = False, notes: Optional[str] = None, user: dict = Depends(require_roles(["admin", "manager"]))):
+    rfq = await db.rfqs.find_one({"id": rfq_id}, {"_id": 0, "items": 1})
+    if not rfq:
+        raise HTTPException(status_code=404, detail="RFQ not found")
+    items = rfq.get("items") or []
+    catalog = await load_price_catalog(items)
+
+    try:
+        priced = quote(items, catalog, RFQ_QUOTE_RULES)
+    except InvalidLine as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    now = utc_now()
+    auto_quote = {**priced, "generated_at": now, "generated_by": user["id"]}
+    update = {"auto_quote": auto_quote}
+    if apply:
+        update.update({
+            "status": "quoted",
+            "quote_amount": auto_quote["subtotal"],
+            "quote_valid_until": now + timedelta(days=RFQ_QUOTE_VALID_DAYS),
+            "quote_notes": notes,
+            "quoted_by": user["id"],
+            "quoted_at": now
+        })
+    await db.rfqs.update_one({"id": rfq_id}, {"$set": update})
+    return await db.rfqs.find_one({"id": rfq_id}, {"_id": 0})
+
 # ============= EXPORT DOCS =============
 
+EXPORT_CACHE_DIR = Path(os.environ.get('EXPORT_CACHE_DIR', ROOT_DIR / 'export_cache'))
+EXPORT_RENDER_WORKERS = int(os.environ.get('EXPORT_RENDER_WORKERS', 2))
+EXPORT_MEDIA_TYPES = {"pdf": "application/pdf", "html": "text/html; charset=utf-8"}
+PACKING_FILL_FACTOR = float(os.environ.get('PACKING_FILL_FACTOR', 0.85))
+PLANT_DIMENSION_FIELDS = ["length_cm", "width_cm", "height_cm", "weight_kg"]
+
+_render_pool: Optional[ProcessPoolExecutor] = None
+
+def get_render_pool() -> ProcessPoolExecutor:
+    # Spawned lazily so API-only workers never pay for idle renderer processes
+    global _render_pool
+    if _render_pool is None:
+        _render_pool = ProcessPoolExecutor(
+            max_workers=EXPORT_RENDER_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _render_pool
+
+def reset_render_pool():
+    global _render_pool
+    if _render_pool is not None:
+        _render_pool.shutdown(wait=False, cancel_futures=True)
+        _render_pool = None
+
+def export_cache_path(key: str, fmt: str) -> Path:
+    return EXPORT_CACHE_DIR / key[:2] / f"{key}.{fmt}"
+
+def write_export_cache(path: Path, content: bytes):
+    # Write then rename so a concurrent download never sees a partial file
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+    tmp.write_bytes(content)
+    os.replace(tmp, path)
+
+def drop_export_cache(render_cache: Optional[dict]):
+    for fmt, key in (render_cache or {}).items():
+        export_cache_path(key, fmt).unlink(missing_ok=True)
+
+async def plan_packing(items: List[dict], shipping_method: str) -> dict:
+    rule = FREIGHT_RULES.get(shipping_method)
+    if not rule:
+        raise HTTPException(status_code=400, detail=f"Unknown shipping method: {shipping_method}")
+
+    # One lookup for every referenced plant, matched by id first and then by name
+    ids = {item["plant_id"] for item in items if item.get("plant_id")}
+    names = {item["name"] for item in items if item.get("name") and not item.get("plant_id")}
+    plants = await db.plants.find(
+        {"$or": [{"id": {"$in": list(ids)}}, {"name": {"$in": list(names)}}]},
+        {"_id": 0, "id": 1, "name": 1, **{f: 1 for f in PLANT_DIMENSION_FIELDS}}
+    ).to_list(None) if ids or names else []
+    by_id = {p["id"]: p for p in plants}
+    by_name = {p["name"]: p for p in plants}
+
+    pack_items = []
+    for line, item in enumerate(items):
+        plant = by_id.get(item.get("plant_id")) or by_name.get(item.get("name")) or {}
+        try:
+            dims, estimated = unit_dimensions(item, plant)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid dimensions on line {line + 1}: {e}")
+        try:
+            quantity = int(item.get("quantity") or 0)
+        except (TypeError, ValueError, OverflowError):
+            raise HTTPException(status_code=400, detail=f"Invalid quantity on line {line + 1}")
+        if quantity < 0:
+            raise HTTPException(status_code=400, detail=f"Invalid quantity on line {line + 1}")
+        pack_items.append(PackItem(
+            line=line, name=item.get("name") or plant.get("name") or "", quantity=quantity,
+            length=dims["length_cm"], width=dims["width_cm"], height=dims["height_cm"],
+            weight=dims["weight_kg"], plant_id=item.get("plant_id") or plant.get("id"), estimated=estimated
+        ))
+    return {"shipping_method": shipping_method, **pack(pack_items, rule, PACKING_FILL_FACTOR)}
+
+async def update_export_fields(doc_id: str, update_data: dict) -> dict:
+    update_data["updated_at"] = utc_now()
+    doc = await db.export_docs.find_one_and_update(
+        {"id": doc_id},
+        {"$set": update_data, "$unset": {"render_cache": ""}},
+        projection={"_id": 0},
+        return_document=ReturnDocument.BEFORE
+    )
+    if not doc:
+        raise HTTPException(status_code=404, detail="Document not found")
+    await asyncio.to_thread(drop_export_cache, doc.get("render_cache"))
+    return await db.export_docs.find_one({"id": doc_id}, {"_id": 0})
+
 @api_router.get("/exports")
-async def get_exports(status: Optional[str] = None, user: dict = Depends(require_roles(["admin", "manager"]))):
+async def get_exports(status: Optional[str] = None, user: dict = Depends(require_roles(["admin", "manager"])), reads=Depends(route_reads)):
     query = {}
     if status:
         query["status"] = status
-    docs = await db.export_docs.find(query, {"_id": 0}).sort("created_at", -1).to_list(1000)
+    docs = await reads.export_docs.find(query, {"_id": 0}).sort("created_at", -1).to_list(1000)
     return docs
 
 @api_router.post("/exports")
 async def create_export_doc(doc: ExportDocCreate, user: dict = Depends(require_roles(["admin", "manager"]))):
     doc_id = str(uuid.uuid4())
     doc_number = f"EXP-{datetime.now().strftime('%Y%m%d')}-{str(uuid.uuid4())[:4].upper()}"
+    doc_data = doc.model_dump()
+    if doc.total_weight is None or doc.total_boxes is None:
+        packing = await plan_packing(doc.items, doc.shipping_method)
+        doc_data["packing"] = packing
+        if doc.total_weight is None:
+            doc_data["total_weight"] = packing["total_weight"]
+        if doc.total_boxes is None:
+            doc_data["total_boxes"] = packing["total_boxes"]
     
     doc_dict = {
         "id": doc_id,
         "doc_number": doc_number,
-        **doc.model_dump(),
+        **doc_data,
         "status": "draft",
         "created_by": user["id"],
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": utc_now()
     }
     await db.export_docs.insert_one(doc_dict)
     doc_dict.pop("_id", None)
     return doc_dict
 
+@api_router.post("/exports/pack")
+async def preview_packing(request: PackingRequest, user: dict = Depends(require_roles(["admin", "manager"]))):
+    return await plan_packing(request.items, request.shipping_method)
+
 @api_router.get("/exports/{doc_id}")
 async def get_export_doc(doc_id: str, user: dict = Depends(require_roles(["admin", "manager"]))):
     doc = await db.export_docs.find_one({"id": doc_id}, {"_id": 0})
@@ -1067,15 +2031,57 @@ async def get_export_doc(doc_id: str, user: dict = Depends(require_roles(["admin
         raise HTTPException(status_code=404, detail="Document not found")
     return doc
 
+@api_router.put("/exports/{doc_id}")
+async def update_export_doc(doc_id: str, updates: ExportDocUpdate, user: dict = Depends(require_roles(["admin", "manager"]))):
+    update_data = {k: v for k, v in updates.model_dump().items() if v is not None}
+    if not update_data:
+        raise HTTPException(status_code=400, detail="No updates provided")
+    if ("items" in update_data or "shipping_method" in update_data) and not {"total_weight", "total_boxes"} <= update_data.keys():
+        current = await db.export_docs.find_one({"id": doc_id}, {"_id": 0, "items": 1, "shipping_method": 1, "packing": 1})
+        if not current:
+            raise HTTPException(status_code=404, detail="Document not found")
+        # Only documents whose totals came from the packer are repacked
+        if current.get("packing"):
+            packing = await plan_packing(
+                update_data.get("items", current["items"]),
+                update_data.get("shipping_method", current.get("shipping_method", "air"))
+            )
+            update_data["packing"] = packing
+            update_data.setdefault("total_weight", packing["total_weight"])
+            update_data.setdefault("total_boxes", packing["total_boxes"])
+    return await update_export_fields(doc_id, update_data)
+
 @api_router.put("/exports/{doc_id}/status")
 async def update_export_status(doc_id: str, status: str = Query(...), user: dict = Depends(require_roles(["admin", "manager"]))):
-    result = await db.export_docs.update_one(
-        {"id": doc_id},
-        {"$set": {"status": status, "updated_at": datetime.now(timezone.utc).isoformat()}}
-    )
-    if result.matched_count == 0:
+    return await update_export_fields(doc_id, {"status": status})
+
+@api_router.get("/exports/{doc_id}/render")
+async def render_export_doc(
+    doc_id: str,
+    format: str = Query("pdf", pattern="^(pdf|html)$"),
+    user: dict = Depends(require_roles(["admin", "manager"]))
+):
+    doc = await db.export_docs.find_one({"id": doc_id}, {"_id": 0})
+    if not doc:
         raise HTTPException(status_code=404, detail="Document not found")
-    return await db.export_docs.find_one({"id": doc_id}, {"_id": 0})
+
+    key = content_key(doc, format)
+    path = export_cache_path(key, format)
+    if not path.exists():
+        try:
+            rendered = await asyncio.get_running_loop().run_in_executor(get_render_pool(), render_document, doc, format)
+        except BrokenProcessPool:
+            reset_render_pool()
+            raise HTTPException(status_code=503, detail="Renderer unavailable, please retry")
+        await asyncio.to_thread(write_export_cache, path, rendered)
+        await db.export_docs.update_one({"id": doc_id}, {"$set": {f"render_cache.{format}": key}})
+
+    return FileResponse(
+        path,
+        media_type=EXPORT_MEDIA_TYPES[format],
+        filename=f"{doc['doc_number']}.{format}",
+        content_disposition_type="inline",
+    )
 
 # ============= PRODUCTION (Value-Added) =============
 
@@ -1095,30 +2101,162 @@ async def create_production(prod: ProductionCreate, user: dict = Depends(require
         **prod.model_dump(),
         "status": "in_progress",
         "created_by": user["id"],
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": utc_now()
     }
     await db.productions.insert_one(prod_doc)
     prod_doc.pop("_id", None)
     return prod_doc
 
-@api_router.put("/production/{prod_id}/complete")
-async def complete_production(prod_id: str, actual_quantity: int, user: dict = Depends(require_roles(["admin", "manager"]))):
-    result = await db.productions.update_one(
-        {"id": prod_id},
+async def complete_production_batch(session, prod_id: str, actual_quantity: int, user: dict):
+    """Consume components, stock the finished product and log movements, all inside `session`'s transaction."""
+    now = utc_now()
+    prod = await db.productions.find_one_and_update(
+        {"id": prod_id, "status": {"$ne": "completed"}},
         {"$set": {
             "status": "completed",
             "actual_quantity": actual_quantity,
-            "completed_at": datetime.now(timezone.utc).isoformat(),
+            "completed_at": now,
             "completed_by": user["id"]
-        }}
+        }},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER,
+        session=session
     )
-    if result.matched_count == 0:
+    if not prod:
+        if await db.productions.count_documents({"id": prod_id}, session=session):
+            raise HTTPException(status_code=400, detail="Production already completed")
         raise HTTPException(status_code=404, detail="Production not found")
+
+    # Component quantities are per finished unit; anything not in the plant catalog
+    # (jars, soil, ...) is recorded but not stock-tracked
+    components = prod.get("components") or []
+    ids = {c["plant_id"] for c in components if c.get("plant_id")}
+    names = {c["name"] for c in components if c.get("name") and not c.get("plant_id")}
+    plants = await db.plants.find(
+        {"$or": [{"id": {"$in": list(ids)}}, {"name": {"$in": list(names)}}]},
+        {"_id": 0, "id": 1, "name": 1, "quantity": 1},
+        session=session
+    ).to_list(None) if ids or names else []
+    by_id = {p["id"]: p for p in plants}
+    by_name = {p["name"]: p for p in plants}
+
+    needed: Dict[str, int] = {}
+    untracked = []
+    for component in components:
+        plant = by_id.get(component.get("plant_id")) or by_name.get(component.get("name"))
+        if not plant:
+            untracked.append(component)
+            continue
+        needed[plant["id"]] = needed.get(plant["id"], 0) + ceil(float(component.get("quantity") or 0) * actual_quantity)
+    needed = {plant_id: qty for plant_id, qty in needed.items() if qty > 0}
+
+    if needed:
+        result = await db.plants.bulk_write([
+            UpdateOne(
+                {"id": plant_id, "quantity": {"$gte": qty}},
+                {"$inc": {"quantity": -qty}, "$set": {"updated_at": now}}
+            )
+            for plant_id, qty in needed.items()
+        ], session=session)
+        if result.matched_count < len(needed):
+            shortages = [
+                f"{by_id[plant_id]['name']} (need {qty}, have {by_id[plant_id].get('quantity', 0)})"
+                for plant_id, qty in needed.items() if by_id[plant_id].get("quantity", 0) < qty
+            ]
+            raise HTTPException(status_code=400, detail=f"Insufficient stock: {', '.join(shortages)}")
+
+    movement = {
+        "production_id": prod_id,
+        "reason": f"Production {prod['batch_number']}",
+        "user_id": user["id"],
+        "user_name": user["full_name"],
+        "created_at": now
+    }
+    movements = [
+        {
+            "id": str(uuid.uuid4()),
+            "plant_id": plant_id,
+            "plant_name": by_id[plant_id]["name"],
+            "quantity_change": -qty,
+            "new_quantity": by_id[plant_id].get("quantity", 0) - qty,
+            **movement
+        }
+        for plant_id, qty in needed.items()
+    ]
+
+    product = None
+    if actual_quantity > 0:
+        listed = {"price": prod.get("sell_price") or 0, "cost": prod.get("cost_per_unit") or 0}
+        product = await db.plants.find_one_and_update(
+            {"name": prod["name"], "category": prod["product_type"]},
+            {
+                "$inc": {"quantity": actual_quantity},
+                "$set": {**{k: v for k, v in listed.items() if v}, "updated_at": now},
+                "$setOnInsert": {
+                    **{k: v for k, v in listed.items() if not v},
+                    "id": str(uuid.uuid4()),
+                    "sku": f"GA-{prod['product_type'][:3].upper()}-{str(uuid.uuid4())[:6].upper()}",
+                    "batch_number": prod["batch_number"],
+                    "description": prod.get("description"),
+                    "reserved": 0,
+                    "min_stock": 10,
+                    "location": "main",
+                    "created_by": user["id"],
+                    "created_at": now
+                }
+            },
+            projection={"_id": 0, "id": 1, "name": 1, "quantity": 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+            session=session
+        )
+        movements.append({
+            "id": str(uuid.uuid4()),
+            "plant_id": product["id"],
+            "plant_name": product["name"],
+            "quantity_change": actual_quantity,
+            "new_quantity": product["quantity"],
+            **movement
+        })
+
+    if movements:
+        await db.stock_movements.insert_many(movements, session=session)
+    await db.productions.update_one(
+        {"id": prod_id},
+        {"$set": {
+            "product_id": product["id"] if product else None,
+            "consumed": [
+                {"plant_id": plant_id, "name": by_id[plant_id]["name"], "quantity": qty}
+                for plant_id, qty in needed.items()
+            ],
+            "untracked_components": untracked
+        }},
+        session=session
+    )
+
+@api_router.put("/production/{prod_id}/complete")
+async def complete_production(prod_id: str, actual_quantity: int = Query(..., ge=0), user: dict = Depends(require_roles(["admin", "manager"]))):
+    # Needs a replica set (a single-node one is enough) for multi-document transactions
+    if not getattr(app.state, "transactions", True):
+        raise HTTPException(status_code=503, detail=TRANSACTIONS_REQUIRED)
+    try:
+        async with await client.start_session() as session:
+            await session.with_transaction(
+                lambda s: complete_production_batch(s, prod_id, actual_quantity, user),
+                read_concern=ReadConcern("snapshot"),
+                write_concern=WriteConcern("majority")
+            )
+    except OperationFailure as e:
+        # IllegalOperation: the deployment stopped being a replica set after startup
+        if e.code == 20:
+            raise HTTPException(status_code=503, detail=TRANSACTIONS_REQUIRED)
+        raise
     return await db.productions.find_one({"id": prod_id}, {"_id": 0})
 
 # ============= PUBLIC ROUTES =============
 
 @api_router.get("/products")
+@single_flight.coalesce
 async def get_public_products(category: Optional[str] = None, featured: Optional[bool] = None):
     query = {"quantity": {"$gt": 0}}
     if category:
@@ -1130,6 +2268,7 @@ async def get_public_products(category: Optional[str] = None, featured: Optional
     return products
 
 @api_router.get("/products/{product_id}")
+@single_flight.coalesce
 async def get_public_product(product_id: str):
     product = await db.plants.find_one({"id": product_id}, {"_id": 0})
     if not product:
@@ -1143,25 +2282,26 @@ async def create_inquiry(inquiry: InquiryCreate):
         "id": inquiry_id,
         **inquiry.model_dump(),
         "status": "new",
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": utc_now()
     }
     await db.inquiries.insert_one(inquiry_doc)
+    await index_for_search("inquiry", inquiry_id, inquiry_doc)
     inquiry_doc.pop("_id", None)
     return inquiry_doc
 
 @api_router.get("/inquiries")
-async def get_inquiries(status: Optional[str] = None, user: dict = Depends(require_roles(["admin", "manager"]))):
+async def get_inquiries(status: Optional[str] = None, user: dict = Depends(require_roles(["admin", "manager"])), reads=Depends(route_reads)):
     query = {}
     if status:
         query["status"] = status
-    inquiries = await db.inquiries.find(query, {"_id": 0}).sort("created_at", -1).to_list(1000)
+    inquiries = await reads.inquiries.find(query, {"_id": 0}).sort("created_at", -1).to_list(1000)
     return inquiries
 
 @api_router.put("/inquiries/{inquiry_id}/status")
 async def update_inquiry_status(inquiry_id: str, status: str = Query(...), user: dict = Depends(require_roles(["admin", "manager"]))):
     result = await db.inquiries.update_one(
         {"id": inquiry_id},
-        {"$set": {"status": status, "updated_at": datetime.now(timezone.utc).isoformat()}}
+        {"$set": {"status": status, "updated_at": utc_now()}}
     )
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Inquiry not found")
@@ -1183,36 +2323,559 @@ async def get_vendor_orders(user: dict = Depends(require_roles(["vendor"]))):
 
 @api_router.get("/customer/me")
 async def get_customer_profile(user: dict = Depends(require_roles(["customer"]))):
-    orders = await db.orders.find({"user_id": user["id"]}, {"_id": 0}).sort("created_at", -1).limit(10).to_list(10)
+    orders = await with_archive("orders").find({"user_id": user["id"]}, {"_id": 0}).sort("created_at", -1).limit(10).to_list(10)
     return {"user": user, "recent_orders": orders}
 
 # ============= CREW PORTAL =============
 
 @api_router.get("/crew/me")
 async def get_crew_profile(user: dict = Depends(require_roles(["crew"]))):
-    # Get assigned tasks
-    tasks = await db.project_tasks.find({"assigned_to": user["id"], "status": {"$ne": "completed"}}, {"_id": 0}).to_list(100)
-    # Get recent logs
-    logs = await db.crew_logs.find({"crew_member_id": user["id"]}, {"_id": 0}).sort("created_at", -1).limit(20).to_list(20)
-    # Get scheduled visits
-    visits = await db.amc_visits.find({"crew_assigned": user["id"], "status": "scheduled"}, {"_id": 0}).to_list(100)
-    
+    # Assigned tasks, recent logs and scheduled visits, fetched together
+    tasks, logs, visits = await asyncio.gather(
+        db.project_tasks.find({"assigned_to": user["id"], "status": {"$ne": "completed"}}, {"_id": 0}).to_list(100),
+        db.crew_logs.find({"crew_member_id": user["id"]}, {"_id": 0}).sort("created_at", -1).limit(20).to_list(20),
+        db.amc_visits.find({"crew_assigned": user["id"], "status": "scheduled"}, {"_id": 0}).to_list(100)
+    )
+
     return {"user": user, "assigned_tasks": tasks, "recent_logs": logs, "scheduled_visits": visits}
 
+SYNC_PAGE_LIMIT = int(os.environ.get('SYNC_PAGE_LIMIT', '500'))
+SYNC_CLOCK_SKEW = timedelta(seconds=int(os.environ.get('SYNC_CLOCK_SKEW_SECONDS', '5')))
+SYNC_TOMBSTONE_TTL = timedelta(days=int(os.environ.get('SYNC_TOMBSTONE_TTL_DAYS', '30')))
+SYNC_STREAMS = ["tasks", "visits", "logs", "deleted"]
+
+def encode_sync_token(positions: Dict[str, tuple]) -> str:
+    payload = {stream: [moment.isoformat(), last_id] for stream, (moment, last_id) in positions.items()}
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+def decode_sync_token(token: str) -> Dict[str, tuple]:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        return {stream: (as_utc(payload[stream][0]), payload[stream][1]) for stream in SYNC_STREAMS}
+    except (ValueError, KeyError, TypeError, IndexError):
+        raise HTTPException(status_code=400, detail="Invalid sync token")
+
+# What a crew member's device holds besides their logs: open tasks and scheduled visits
+SYNC_TASK_FILTER = {"status": {"$ne": "completed"}}
+SYNC_VISIT_FILTER = {"status": "scheduled"}
+
+def task_synced(task: dict) -> bool:
+    return bool(task.get("assigned_to")) and task.get("status") != "completed"
+
+def visit_synced(visit: dict) -> bool:
+    return bool(visit.get("crew_assigned")) and visit.get("status") == "scheduled"
+
+async def record_tombstones(kind: str, docs: List[dict], crew_field: str):
+    """Remember removed crew-visible documents so delta sync can tell devices to drop them."""
+    tombstones = [
+        {"kind": kind, "id": doc["id"], "crew_id": doc[crew_field], "deleted_at": utc_now()}
+        for doc in docs if doc.get(crew_field)
+    ]
+    if tombstones:
+        await db.sync_tombstones.insert_many(tombstones)
+
+async def track_sync_view(kind: str, before: dict, after: dict, crew_field: str, synced: Callable[[dict], bool]):
+    """Tombstone a document that left its crew member's synced set, by status or reassignment.
+
+    A document that comes back loses its tombstones, so a device that has not synced
+    in between only sees the update and never drops it.
+    """
+    stayed = synced(before) and synced(after) and before.get(crew_field) == after.get(crew_field)
+    if stayed:
+        return
+    if synced(before):
+        await record_tombstones(kind, [before], crew_field)
+    if synced(after):
+        await db.sync_tombstones.delete_many({"id": after["id"], "crew_id": after[crew_field], "kind": kind})
+
+async def fetch_changes(collection, query: dict, position: tuple, field: str = "updated_at", projection: Optional[dict] = None):
+    """Documents changed after `position` (a (timestamp, id) pair), oldest first.
+
+    Ties on the timestamp are broken by id so bulk writes sharing one timestamp
+    page cleanly. Returns (items, truncated).
+    """
+    moment, last_id = position
+    page_query = {**query, "$or": [{field: {"$gt": moment}}, {field: moment, "id": {"$gt": last_id}}]}
+    items = await collection.find(page_query, projection or {"_id": 0}).sort([(field, 1), ("id", 1)]).limit(SYNC_PAGE_LIMIT + 1).to_list(SYNC_PAGE_LIMIT + 1)
+    return items[:SYNC_PAGE_LIMIT], len(items) > SYNC_PAGE_LIMIT
+
+@api_router.get("/crew/sync")
+async def crew_sync(since: Optional[str] = None, user: dict = Depends(require_roles(["crew"]))):
+    # Writes stamped just before this moment may commit after we read, so the next
+    # token starts slightly earlier; devices upsert by id, so repeats are harmless
+    started = utc_now()
+    caught_up = (started - SYNC_CLOCK_SKEW, "")
+    positions = decode_sync_token(since) if since else None
+
+    if positions is None or min(moment for moment, _ in positions.values()) < started - SYNC_TOMBSTONE_TTL:
+        tasks, visits, logs = await asyncio.gather(
+            db.project_tasks.find({"assigned_to": user["id"], **SYNC_TASK_FILTER}, {"_id": 0}).to_list(None),
+            db.amc_visits.find({"crew_assigned": user["id"], **SYNC_VISIT_FILTER}, {"_id": 0}).to_list(None),
+            db.crew_logs.find({"crew_member_id": user["id"]}, {"_id": 0}).sort("created_at", -1).limit(20).to_list(20)
+        )
+        return {
+            "token": encode_sync_token({stream: caught_up for stream in SYNC_STREAMS}),
+            "full": True,
+            "has_more": False,
+            "tasks": tasks,
+            "visits": visits,
+            "logs": logs,
+            "deleted": []
+        }
+
+    results = await asyncio.gather(
+        # Documents that left the synced set arrive as tombstones, not updates
+        fetch_changes(db.project_tasks, {"assigned_to": user["id"], **SYNC_TASK_FILTER}, positions["tasks"]),
+        fetch_changes(db.amc_visits, {"crew_assigned": user["id"], **SYNC_VISIT_FILTER}, positions["visits"]),
+        fetch_changes(db.crew_logs, {"crew_member_id": user["id"]}, positions["logs"]),
+        fetch_changes(db.sync_tombstones, {"crew_id": user["id"]}, positions["deleted"], field="deleted_at",
+                      projection={"_id": 0, "kind": 1, "id": 1, "deleted_at": 1})
+    )
+
+    # A stream cut short resumes after its last delivered item; the rest are caught up
+    changes, next_positions = {}, {}
+    for stream, (items, truncated) in zip(SYNC_STREAMS, results):
+        changes[stream] = items
+        field = "deleted_at" if stream == "deleted" else "updated_at"
+        next_positions[stream] = (as_utc(items[-1][field]), items[-1]["id"]) if truncated else caught_up
+
+    return {
+        "token": encode_sync_token(next_positions),
+        "full": False,
+        "has_more": any(truncated for _, truncated in results),
+        "tasks": changes["tasks"],
+        "visits": changes["visits"],
+        "logs": changes["logs"],
+        "deleted": [{"kind": d["kind"], "id": d["id"]} for d in changes["deleted"]]
+    }
+
 @api_router.post("/crew/log")
 async def submit_crew_log(log: CrewLogCreate, user: dict = Depends(require_roles(["crew"]))):
     log_id = str(uuid.uuid4())
+    rate = crew_hourly_rate(user)
+    now = utc_now()
     log_doc = {
         "id": log_id,
         **log.model_dump(),
         "crew_member_id": user["id"],
         "crew_member_name": user["full_name"],
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "hourly_rate": rate,
+        "labour_cost": log.hours_worked * rate,
+        "created_at": now,
+        "updated_at": now
     }
     await db.crew_logs.insert_one(log_doc)
+    await apply_labour_rollup(log.project_id, log.hours_worked, log_doc["labour_cost"])
     log_doc.pop("_id", None)
     return log_doc
 
+CREW_LOG_BATCH_LIMIT = 500
+
+@api_router.post("/crew/logs/batch")
+async def submit_crew_log_batch(batch: CrewLogBatch, user: dict = Depends(require_roles(["crew"]))):
+    if len(batch.logs) > CREW_LOG_BATCH_LIMIT:
+        raise HTTPException(status_code=413, detail=f"At most {CREW_LOG_BATCH_LIMIT} logs per batch")
+
+    # Validate each entry on its own so one bad log doesn't reject the whole upload
+    results: List[Dict[str, Any]] = []
+    valid: Dict[int, CrewLogBatchItem] = {}
+    seen_client_ids = set()
+    for position, raw in enumerate(batch.logs):
+        client_id = raw.get("client_id") if isinstance(raw, dict) else None
+        results.append({"client_id": client_id})
+        try:
+            item = CrewLogBatchItem.model_validate(raw)
+        except ValidationError as e:
+            error = e.errors(include_url=False)[0]
+            location = ".".join(str(part) for part in error["loc"])
+            results[position].update(status="invalid", error=f"{location}: {error['msg']}" if location else error["msg"])
+            continue
+        if item.client_id in seen_client_ids:
+            results[position].update(status="duplicate")
+            continue
+        seen_client_ids.add(item.client_id)
+        valid[position] = item
+
+    project_ids = {item.project_id for item in valid.values()}
+    known_projects, already_uploaded = await asyncio.gather(
+        db.projects.distinct("id", {"id": {"$in": list(project_ids)}}),
+        db.crew_logs.find(
+            {"crew_member_id": user["id"], "client_id": {"$in": list(seen_client_ids)}},
+            {"_id": 0, "client_id": 1, "id": 1}
+        ).to_list(None)
+    )
+    known_projects = set(known_projects)
+    uploaded = {log["client_id"]: log["id"] for log in already_uploaded}
+
+    rate = crew_hourly_rate(user)
+    now = utc_now()
+    pending = []
+    for position, item in valid.items():
+        if item.client_id in uploaded:
+            results[position].update(status="duplicate", id=uploaded[item.client_id])
+        elif item.project_id not in known_projects:
+            results[position].update(status="invalid", error="Project not found")
+        else:
+            pending.append((position, {
+                "id": str(uuid.uuid4()),
+                **item.model_dump(),
+                "crew_member_id": user["id"],
+                "crew_member_name": user["full_name"],
+                "hourly_rate": rate,
+                "labour_cost": item.hours_worked * rate,
+                "created_at": now,
+                "updated_at": now
+            }))
+
+    failed = set()
+    if pending:
+        try:
+            await db.crew_logs.insert_many([doc for _, doc in pending], ordered=False)
+        except BulkWriteError as e:
+            # Only a replay racing this one can collide on (crew_member_id, client_id)
+            if any(err.get("code") != 11000 for err in e.details.get("writeErrors", [])):
+                raise
+            failed = {err["index"] for err in e.details["writeErrors"]}
+
+    totals: Dict[str, List[float]] = {}
+    for index, (position, doc) in enumerate(pending):
+        if index in failed:
+            results[position].update(status="duplicate")
+            continue
+        results[position].update(status="created", id=doc["id"])
+        project_totals = totals.setdefault(doc["project_id"], [0, 0])
+        project_totals[0] += doc["hours_worked"]
+        project_totals[1] += doc["labour_cost"]
+    if totals:
+        await db.projects.bulk_write([
+            UpdateOne({"id": project_id}, {"$inc": {"labour_hours": hours, "actual_cost": cost, "budget_variance": -cost}})
+            for project_id, (hours, cost) in totals.items()
+        ], ordered=False)
+
+    counts = {state: sum(1 for r in results if r["status"] == state) for state in ["created", "duplicate", "invalid"]}
+    return {**counts, "results": results}
+
+# ============= MIGRATIONS =============
+
+# Timestamp fields that older releases wrote as ISO strings
+DATETIME_FIELDS = {
+    "users": ["created_at", "updated_at", "approved_at", "rejected_at", "suspended_at"],
+    "plants": ["created_at", "updated_at"],
+    "stock_movements": ["created_at"],
+    "projects": ["start_date", "end_date", "signoff_date", "created_at", "updated_at"],
+    "project_tasks": ["start_date", "end_date", "created_at", "updated_at"],
+    "crew_logs": ["date", "created_at"],
+    "amc_subscriptions": ["start_date", "next_billing_date", "created_at"],
+    "amc_visits": ["scheduled_date", "completed_at", "created_at"],
+    "invoices": ["due_date", "created_at"],
+    "partner_deals": ["locked_at", "approved_at", "paid_at", "created_at"],
+    "orders": ["created_at", "updated_at"],
+    "rfqs": ["delivery_date", "quote_valid_until", "quoted_at", "created_at"],
+    "export_docs": ["created_at", "updated_at"],
+    "productions": ["completed_at", "created_at"],
+    "inquiries": ["created_at", "updated_at"],
+}
+
+DATETIME_MIGRATION_ID = "datetime_fields"
+DATETIME_MIGRATION_BATCH = int(os.environ.get('DATETIME_MIGRATION_BATCH', '500'))
+DATETIME_MIGRATION_PAUSE = float(os.environ.get('DATETIME_MIGRATION_PAUSE_SECONDS', '0.05'))
+
+_migration_task: Optional[asyncio.Task] = None
+
+async def migrate_collection_datetimes(name: str, fields: List[str], state: dict) -> None:
+    """Convert one collection in _id order, checkpointing after every batch.
+
+    Each update is conditional on the string still being there, so a request that
+    rewrites the field in the meantime wins and re-runs are harmless.
+    """
+    collection = db[name]
+    string_fields = {"$or": [{field: {"$type": "string"}} for field in fields]}
+    projection = {field: 1 for field in fields}
+
+    while True:
+        query = dict(string_fields)
+        if state.get("last_id") is not None:
+            query["_id"] = {"$gt": state["last_id"]}
+        batch = await collection.find(query, projection).sort("_id", 1).limit(DATETIME_MIGRATION_BATCH).to_list(DATETIME_MIGRATION_BATCH)
+        if not batch:
+            break
+
+        ops = []
+        for doc in batch:
+            match = {"_id": doc["_id"]}
+            converted = {}
+            for field in fields:
+                value = doc.get(field)
+                if not isinstance(value, str):
+                    continue
+                try:
+                    converted[field] = as_utc(value)
+                    match[field] = value
+                except ValueError:
+                    state["failed"] = state.get("failed", 0) + 1
+            if converted:
+                ops.append(UpdateOne(match, {"$set": converted}))
+        if ops:
+            result = await collection.bulk_write(ops, ordered=False)
+            state["converted"] = state.get("converted", 0) + result.modified_count
+
+        state["last_id"] = batch[-1]["_id"]
+        await db.migrations.update_one(
+            {"_id": DATETIME_MIGRATION_ID},
+            {"$set": {f"collections.{name}": state, "updated_at": utc_now()}}
+        )
+        await asyncio.sleep(DATETIME_MIGRATION_PAUSE)
+
+async def run_datetime_migration() -> None:
+    progress = await db.migrations.find_one({"_id": DATETIME_MIGRATION_ID}) or {}
+    if progress.get("status") == "completed":
+        return
+    await db.migrations.update_one(
+        {"_id": DATETIME_MIGRATION_ID},
+        {"$set": {"status": "running", "updated_at": utc_now()}, "$setOnInsert": {"started_at": utc_now()}},
+        upsert=True
+    )
+    collections = progress.get("collections", {})
+    try:
+        for name, fields in DATETIME_FIELDS.items():
+            state = collections.get(name, {})
+            if state.get("done"):
+                continue
+            await migrate_collection_datetimes(name, fields, state)
+            state["done"] = True
+            await db.migrations.update_one({"_id": DATETIME_MIGRATION_ID}, {"$set": {f"collections.{name}": state}})
+    except Exception:
+        logger.exception("Datetime migration stopped; it will resume from the last checkpoint")
+        await db.migrations.update_one({"_id": DATETIME_MIGRATION_ID}, {"$set": {"status": "interrupted"}})
+        return
+    await db.migrations.update_one(
+        {"_id": DATETIME_MIGRATION_ID},
+        {"$set": {"status": "completed", "completed_at": utc_now()}}
+    )
+    logger.info("Datetime migration completed")
+
+def start_datetime_migration() -> None:
+    global _migration_task
+    if _migration_task is None or _migration_task.done():
+        _migration_task = asyncio.create_task(run_datetime_migration())
+
+@api_router.get("/admin/migrations/datetime")
+async def get_datetime_migration(user: dict = Depends(require_roles(["admin"]))):
+    progress = await db.migrations.find_one({"_id": DATETIME_MIGRATION_ID}, {"_id": 0})
+    if not progress:
+        return {"status": "not_started"}
+    for state in progress.get("collections", {}).values():
+        if state.get("last_id") is not None:
+            state["last_id"] = str(state["last_id"])
+    return progress
+
+@api_router.post("/admin/migrations/datetime/run")
+async def run_datetime_migration_now(restart: bool = False, user: dict = Depends(require_roles(["admin"]))):
+    if restart:
+        await db.migrations.delete_one({"_id": DATETIME_MIGRATION_ID})
+    start_datetime_migration()
+    return {"message": "Datetime migration started"}
+
+# ============= ARCHIVAL =============
+
+# Finished records move to <name>_archive once `field` is older than ARCHIVE_AFTER_DAYS: (field, finished)
+ARCHIVE_POLICIES = {
+    "orders": ("created_at", {"status": {"$in": ["completed", "cancelled"]}}),
+    "invoices": ("created_at", {"status": "paid"}),
+    "amc_visits": ("scheduled_date", {"status": "completed"}),
+    "crew_logs": ("created_at", {}),
+    "stock_movements": ("created_at", {}),
+}
+# Archived visits and logs leave their crew member's synced view: (tombstone kind, crew field)
+ARCHIVE_TOMBSTONES = {"amc_visits": ("visit", "crew_assigned"), "crew_logs": ("log", "crew_member_id")}
+ARCHIVE_AFTER = timedelta(days=int(os.environ.get('ARCHIVE_AFTER_DAYS', '365')))
+ARCHIVE_BATCH = int(os.environ.get('ARCHIVE_BATCH', '500'))
+ARCHIVE_PAUSE = float(os.environ.get('ARCHIVE_PAUSE_SECONDS', '0.05'))
+# 0 leaves archival to POST /api/admin/archive/run
+ARCHIVE_INTERVAL = timedelta(hours=float(os.environ.get('ARCHIVE_INTERVAL_HOURS', '0')))
+
+def with_archive(name: str, database=None) -> ArchivedCollection:
+    """Read a collection together with its archive; `database` defaults to the primary handle."""
+    database = db if database is None else database
+    return ArchivedCollection(database[name], database[archive_name(name)])
+
+@job_queue.handler("archive")
+async def run_archival(job: JobContext) -> dict:
+    """Move everything past the cutoff, one collection at a time, reporting progress as it goes.
+
+    Moved documents no longer match the query, so a retried or resumed run needs no checkpoint.
+    """
+    cutoff = utc_now() - ARCHIVE_AFTER
+    moved: Dict[str, int] = {}
+    for name, (field, finished) in ARCHIVE_POLICIES.items():
+        query = {**finished, field: {"$lt": cutoff}}
+        on_moved = None
+        if name in ARCHIVE_TOMBSTONES:
+            kind, crew_field = ARCHIVE_TOMBSTONES[name]
+            on_moved = partial(record_tombstones, kind, crew_field=crew_field)
+        while count := await archive_batch(db[name], db[archive_name(name)], query, ARCHIVE_BATCH, on_moved):
+            moved[name] = moved.get(name, 0) + count
+            await job.progress(moved=moved)
+            await asyncio.sleep(ARCHIVE_PAUSE)
+    logger.info("Archival completed")
+    return {"cutoff": cutoff, "moved": moved}
+
+async def archive_periodically():
+    # Every worker enqueues the same key for each period, so the period gets one run
+    interval = ARCHIVE_INTERVAL.total_seconds()
+    while True:
+        period = int(utc_now().timestamp() // interval)
+        await job_queue.enqueue("archive", key=f"archive:{period}")
+        await asyncio.sleep((period + 1) * interval - utc_now().timestamp())
+
+@api_router.get("/admin/archive")
+async def get_archive_status(user: dict = Depends(require_roles(["admin"]))):
+    collections = {}
+    for name in ARCHIVE_POLICIES:
+        hot, archived = await asyncio.gather(
+            db[name].estimated_document_count(), db[archive_name(name)].estimated_document_count()
+        )
+        collections[name] = {"hot": hot, "archive": archived}
+    runs = await db.jobs.find({"type": "archive"}, {"_id": 0, "lease_token": 0}).sort("created_at", -1).limit(10).to_list(10)
+    return {"archive_after_days": ARCHIVE_AFTER.days, "collections": collections, "runs": runs}
+
+@api_router.post("/admin/archive/run")
+async def run_archival_now(user: dict = Depends(require_roles(["admin"]))):
+    job = await job_queue.enqueue("archive", created_by=user["id"])
+    return {"message": "Archival queued", "job_id": job["id"]}
+
+# ============= ADMIN SEARCH =============
+
+# What /api/admin/search finds. `fields` are matched by word and prefix; `keys` (emails, phone
+# numbers, reference numbers) are matched that way too, and rank first when the query is the whole value
+SEARCH_ENTITIES = [
+    SearchEntity("user", "users", title="full_name", subtitle=["email", "role"],
+                 fields=["full_name", "company"], keys=["email", "phone"]),
+    SearchEntity("order", "orders", title="customer_name", subtitle=["order_number", "customer_email"],
+                 fields=["customer_name"], keys=["order_number", "customer_email", "customer_phone"]),
+    SearchEntity("rfq", "rfqs", title="company_name", subtitle=["rfq_number", "contact_name", "email"],
+                 fields=["company_name", "contact_name"], keys=["rfq_number", "email", "phone"]),
+    SearchEntity("inquiry", "inquiries", title="name", subtitle=["email", "inquiry_type"],
+                 fields=["name", "company"], keys=["email", "phone"]),
+    SearchEntity("amc", "amc_subscriptions", title="client_name", subtitle=["contract_number", "service_type"],
+                 fields=["client_name"], keys=["contract_number", "client_email", "client_phone"]),
+    SearchEntity("project", "projects", title="name", subtitle=["project_number", "client_name"],
+                 fields=["name", "client_name"], keys=["project_number", "client_email", "client_phone"]),
+]
+# Types managers may search; user accounts are admin-only, like /api/admin/users
+SEARCH_MANAGER_TYPES = ["order", "rfq", "inquiry", "amc", "project"]
+SEARCH_REINDEX_BATCH = int(os.environ.get('SEARCH_REINDEX_BATCH', '500'))
+
+search_index = SearchIndex(SEARCH_ENTITIES)
+
+async def index_for_search(entity_type: str, entity_id: str, doc: Optional[dict] = None):
+    """Bring one record's search entry up to date, from `doc` or from the stored record.
+
+    The write it follows has already succeeded, so a failure here is logged rather than raised;
+    POST /api/admin/search/reindex repairs the entry.
+    """
+    try:
+        if doc is not None:
+            await search_index.index(db, entity_type, doc)
+        else:
+            await search_index.reindex(db, entity_type, entity_id)
+    except PyMongoError:
+        logger.exception(f"Could not update the search entry for {entity_type} {entity_id}")
+
+async def ensure_search_index():
+    # A database that predates the index gets it built once, by whichever worker enqueues first
+    if not await db.search_index.find_one({}, {"_id": 1}):
+        await job_queue.enqueue("search_reindex", key="search_reindex:initial")
+
+@job_queue.handler("search_reindex")
+async def rebuild_search_index(job: JobContext) -> dict:
+    """Re-index every searchable record, archived orders included, one type at a time."""
+    indexed: Dict[str, int] = {}
+    for entity in SEARCH_ENTITIES:
+        names = [entity.collection] + ([archive_name(entity.collection)] if entity.collection in ARCHIVE_POLICIES else [])
+
+        async def progress(count: int, entity_type: str = entity.type):
+            indexed[entity_type] = count
+            await job.progress(indexed=indexed)
+
+        indexed[entity.type] = await search_index.rebuild(
+            db, entity.type, [db[name] for name in names], SEARCH_REINDEX_BATCH, progress
+        )
+    return {"indexed": indexed}
+
+@api_router.get("/admin/search")
+async def admin_search(
+    q: str = Query(..., min_length=1, max_length=200),
+    entity_type: Optional[str] = Query(None, alias="type"),
+    limit: int = Query(20, ge=1, le=100),
+    user: dict = Depends(require_roles(["admin", "manager"]))
+):
+    allowed = list(search_index.entities) if user["role"] == "admin" else SEARCH_MANAGER_TYPES
+    if entity_type and entity_type not in allowed:
+        raise HTTPException(status_code=400, detail=f"type must be one of: {', '.join(allowed)}")
+    hits = await search_index.search(db, q, [entity_type] if entity_type else allowed, limit)
+    return {"query": q, "hits": hits}
+
+@api_router.post("/admin/search/reindex")
+async def reindex_search(user: dict = Depends(require_roles(["admin"]))):
+    job = await job_queue.enqueue("search_reindex", created_by=user["id"])
+    return {"message": "Search reindex queued", "job_id": job["id"]}
+
+# ============= REQUEST PROFILING =============
+
+PROFILE_FORMATS = {"html": HTMLResponse, "text": PlainTextResponse}
+
+@request_profiler.authorizer
+async def can_request_profile(request) -> bool:
+    # Only reached when the header is sent, so other requests never pay for this lookup
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer":
+        return False
+    try:
+        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+    except jwt.InvalidTokenError:
+        return False
+    user = await db.users.find_one({"id": payload.get("user_id")}, {"_id": 0, "role": 1, "status": 1})
+    return bool(user) and user["role"] == "admin" and user.get("status") == "active"
+
+@request_profiler.sink
+async def save_request_profile(profile: dict):
+    await db.request_profiles.insert_one({**profile, "created_at": utc_now()})
+
+@api_router.get("/admin/profiles")
+async def list_request_profiles(
+    route: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    user: dict = Depends(require_roles(["admin"]))
+):
+    query = {"route": route} if route else {}
+    return await db.request_profiles.find(query, {"_id": 0, "session": 0}).sort("created_at", -1).limit(limit).to_list(limit)
+
+@api_router.get("/admin/profiles/{profile_id}")
+async def download_request_profile(
+    profile_id: str,
+    format: str = Query("html", pattern="^(html|text|json)$"),
+    user: dict = Depends(require_roles(["admin"]))
+):
+    profile = await db.request_profiles.find_one({"id": profile_id}, {"_id": 0})
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "json":
+        return profile
+    content = await asyncio.to_thread(render_session, profile["session"], format)
+    filename = f"profile-{profile_id}.{'txt' if format == 'text' else 'html'}"
+    return PROFILE_FORMATS[format](content, headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+# ============= JOBS =============
+
+@api_router.get("/jobs/{job_id}")
+async def get_job(job_id: str, user: dict = Depends(get_current_user)):
+    job = await job_queue.get(job_id)
+    # Other people's jobs are not found rather than forbidden
+    if not job or (user["role"] not in ["admin", "manager"] and job.get("created_by") != user["id"]):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
 # ============= ROOT =============
 
 @api_router.get("/")
@@ -1223,6 +2886,45 @@ async def root():
 async def health():
     return {"status": "healthy"}
 
+@api_router.get("/ready")
+async def ready():
+    """Readiness for the load balancer: Mongo answers a ping and pool checkouts are not queueing."""
+    checks = {"warmed_up": getattr(app.state, "ready", False)}
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    try:
+        await asyncio.wait_for(db.command("ping"), READY_PING_TIMEOUT)
+        checks["mongo"] = True
+    except Exception as e:
+        logger.warning(f"Readiness ping failed: {e}")
+        checks["mongo"] = False
+    ping_ms = round((loop.time() - started) * 1000, 3)
+
+    pool = pool_monitor.stats()
+    checks["checkout_wait"] = pool["checkout_wait_ms"]["p95"] <= READY_MAX_CHECKOUT_WAIT_MS
+    is_ready = all(checks.values())
+    # Only production completion needs transactions, so a standalone server is reported but still ready
+    transactions = getattr(app.state, "transactions", None)
+    # Past the bound requests still get fresh answers, by reloading caches, so this is reported but not checked
+    cache_lag = invalidation_bus.lag()
+    body = {
+        "status": "ready" if is_ready else "not_ready", "checks": checks, "ping_ms": ping_ms, "pool": pool,
+        "cache_lag_seconds": round(cache_lag, 3) if cache_lag != float("inf") else None,
+        "admission": admission.stats(), "transactions": transactions
+    }
+    return JSONResponse(body, status_code=200 if is_ready else 503)
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics(credentials: Optional[HTTPAuthorizationCredentials] = Depends(HTTPBearer(auto_error=False))):
+    if METRICS_TOKEN and (not credentials or credentials.credentials != METRICS_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    pool = pool_monitor.stats()
+    pool_connections.set("open", value=pool["connections_open"])
+    pool_connections.set("checked_out", value=pool["checked_out"])
+    for quantile, key in [("0.5", "p50"), ("0.95", "p95"), ("1", "max")]:
+        pool_checkout_wait.set(quantile, value=pool["checkout_wait_ms"][key] / 1000)
+    return Response(metrics_registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 app.include_router(api_router)
 
 app.add_middleware(
@@ -1231,8 +2933,74 @@ app.add_middleware(
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Profile-Id"],
 )
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
+async def create_indexes():
+    await db.amc_visits.create_index(
+        "schedule_key", unique=True, partialFilterExpression={"schedule_key": {"$exists": True}}
+    )
+    await db.amc_visits.create_index("scheduled_date")
+    await db.amc_visits.create_index([("crew_assigned", 1), ("status", 1)])
+    await db.project_tasks.create_index([("assigned_to", 1), ("status", 1)])
+    await db.invoices.create_index("due_date")
+    await db.invoices.create_index([("status", 1), ("due_date", 1)])
+    await db.orders.create_index("created_at")
+    await db.projects.create_index("budget_variance")
+    await db.project_tasks.create_index([("assigned_to", 1), ("updated_at", 1), ("id", 1)])
+    await db.amc_visits.create_index([("crew_assigned", 1), ("updated_at", 1), ("id", 1)])
+    await db.crew_logs.create_index([("crew_member_id", 1), ("updated_at", 1), ("id", 1)])
+    await db.crew_logs.create_index(
+        [("crew_member_id", 1), ("client_id", 1)], unique=True,
+        partialFilterExpression={"client_id": {"$exists": True}}
+    )
+    await db.sync_tombstones.create_index([("crew_id", 1), ("deleted_at", 1), ("id", 1)])
+    await db.sync_tombstones.create_index("deleted_at", expireAfterSeconds=int(SYNC_TOMBSTONE_TTL.total_seconds()))
+    await db.sync_tombstones.create_index([("id", 1), ("crew_id", 1)])
+    await db.projects.create_index([("status", 1), ("budget_variance", 1)])
+    for collection, parent_key in [
+        (db.project_tasks, "project_id"), (db.crew_logs, "project_id"),
+        (db.amc_visits, "subscription_id"), (db.invoices, "subscription_id")
+    ]:
+        await collection.create_index([(parent_key, 1), ("created_at", -1), ("id", -1)])
+    await db.orders.create_index([("status", 1), ("created_at", -1)])
+    # Every route looks documents up by their uuid `id`
+    for name in [
+        "users", "plants", "projects", "project_tasks", "crew_logs", "amc_subscriptions", "amc_visits", "invoices",
+        "partner_deals", "orders", "rfqs", "export_docs", "productions", "inquiries"
+    ]:
+        await db[name].create_index("id", unique=True)
+    await db.users.create_index("email")
+    await db.users.create_index([("role", 1), ("status", 1)])
+    await db.users.create_index("status")
+    await db.users.create_index("created_at")
+    for field in ["category", "location", "growth_stage", "name", "quantity"]:
+        await db.plants.create_index(field)
+    await db.plants.create_index("is_featured", partialFilterExpression={"is_featured": True})
+    await db.plants.create_index("name", name="name_ci", collation=PLANT_NAME_COLLATION)
+    await db.projects.create_index("project_type")
+    await db.crew_logs.create_index([("crew_member_id", 1), ("created_at", -1)])
+    await db.partner_deals.create_index("partner_id")
+    await db.partner_deals.create_index("status")
+    await db.orders.create_index([("user_id", 1), ("created_at", -1)])
+    await db.orders.create_index([("order_type", 1), ("created_at", -1)])
+    await db.orders.create_index("vendor_id")
+    for collection in [db.amc_subscriptions, db.rfqs, db.export_docs, db.inquiries]:
+        await collection.create_index([("status", 1), ("created_at", -1)])
+    # Archival finds its candidates through these; the archives get the indexes their reads use
+    await db.invoices.create_index([("status", 1), ("created_at", 1)])
+    await db.amc_visits.create_index([("status", 1), ("scheduled_date", 1)])
+    await db.crew_logs.create_index("created_at")
+    await db.stock_movements.create_index("created_at")
+    await create_archive_collections(db, list(ARCHIVE_POLICIES))
+    for name in ARCHIVE_POLICIES:
+        await db[archive_name(name)].create_index("id", unique=True)
+    await db[archive_name("orders")].create_index([("user_id", 1), ("created_at", -1)])
+    await db[archive_name("orders")].create_index([("status", 1), ("created_at", -1)])
+    for name, parent_key in [("crew_logs", "project_id"), ("amc_visits", "subscription_id"), ("invoices", "subscription_id")]:
+        await db[archive_name(name)].create_index([(parent_key, 1), ("created_at", -1), ("id", -1)])
+    await job_queue.create_indexes(db)
+    await search_index.create_indexes(db)
+    await db.request_profiles.create_index("id", unique=True)
+    await db.request_profiles.create_index([("route", 1), ("created_at", -1)])
+    await db.request_profiles.create_index("created_at", expireAfterSeconds=int(PROFILE_TTL.total_seconds()))
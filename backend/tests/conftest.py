@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Let tests import the backend modules (server, crew_calendar, ...) directly
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,134 @@
+"""
+Admission control tests (no server required)
+"""
+import asyncio
+import os
+
+import pytest
+from fastapi import APIRouter, FastAPI
+from fastapi.routing import APIRoute
+from fastapi.testclient import TestClient
+
+from admission import AdmissionClass, AdmissionController, Overloaded, admitted_route_class
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "admission")
+
+
+class TestAdmissionClass:
+    """Bounded concurrency with a bounded, timed queue"""
+
+    def test_queue_full_and_wait_timeout_are_refused(self):
+        admission = AdmissionClass("reports", limit=1, max_queue=1, max_wait=0.05)
+
+        async def scenario():
+            await admission.acquire()
+            queued = asyncio.ensure_future(admission.acquire())
+            await asyncio.sleep(0)
+            with pytest.raises(Overloaded):
+                await admission.acquire()  # queue full
+            with pytest.raises(Overloaded):
+                await queued  # waited too long
+            return admission.in_flight, admission.queued
+
+        assert asyncio.run(scenario()) == (1, 0)
+
+    def test_release_admits_waiters_in_order(self):
+        admission = AdmissionClass("checkout", limit=1, max_queue=5, max_wait=1)
+        admitted = []
+
+        async def request(n):
+            await admission.acquire()
+            admitted.append(n)
+            await asyncio.sleep(0.01)
+            admission.release()
+
+        async def scenario():
+            await asyncio.gather(*(request(n) for n in range(4)))
+
+        asyncio.run(scenario())
+        assert admitted == [0, 1, 2, 3]
+        assert admission.in_flight == 0
+
+    def test_cancelled_waiter_gives_its_place_back(self):
+        admission = AdmissionClass("catalog", limit=1, max_queue=5, max_wait=1)
+
+        async def scenario():
+            await admission.acquire()
+            waiter = asyncio.ensure_future(admission.acquire())
+            await asyncio.sleep(0)
+            waiter.cancel()
+            await asyncio.sleep(0)
+            admission.release()
+            return admission.in_flight, admission.queued
+
+        assert asyncio.run(scenario()) == (0, 0)
+
+    def test_retry_after_follows_observed_latency(self):
+        admission = AdmissionClass("reports", limit=2, max_queue=5, max_wait=1)
+        assert admission.retry_after() == 1
+        admission.observe(3.0)
+        assert admission.retry_after() == 2
+
+
+class TestAdaptiveLimits:
+    """Checkout latency drives the other classes' limits"""
+
+    def make_controller(self):
+        return AdmissionController(
+            [AdmissionClass("checkout", 10, 10, 1), AdmissionClass("reports", 8, 10, 1, adaptive=True, min_limit=2)],
+            protected="checkout", target_latency=0.2, interval=1.0
+        )
+
+    def test_slow_checkout_shrinks_other_classes(self):
+        controller = self.make_controller()
+        for _ in range(20):
+            controller.observe("checkout", 0.5, now=0.5)
+        controller.observe("checkout", 0.5, now=1.5)
+        assert controller.stats()["reports"]["limit"] == 6
+        assert controller.stats()["checkout"]["limit"] == 10
+        for _ in range(10):
+            controller.adapt(0.5)
+        assert controller.stats()["reports"]["limit"] == 2
+
+    def test_healthy_checkout_restores_limits(self):
+        controller = self.make_controller()
+        controller.adapt(1.0)
+        controller.adapt(1.0)
+        assert controller.stats()["reports"]["limit"] == 4
+        for _ in range(10):
+            controller.adapt(0.05)
+        assert controller.stats()["reports"]["limit"] == 8
+        controller.adapt(None)
+        assert controller.stats()["reports"]["limit"] == 8
+
+
+class TestAdmittedRoutes:
+    """Routes in a class answer 503 with Retry-After once it is saturated"""
+
+    def test_saturated_route_is_shed(self):
+        controller = AdmissionController([AdmissionClass("catalog", limit=1, max_queue=0, max_wait=0.01)])
+        router = APIRouter(route_class=admitted_route_class(APIRoute, controller, {"GET /products": "catalog"}))
+
+        @router.get("/products")
+        async def products():
+            return []
+
+        @router.get("/other")
+        async def other():
+            return []
+
+        app = FastAPI()
+        app.include_router(router)
+        client = TestClient(app)
+        assert client.get("/products").status_code == 200
+        controller.classes["catalog"].in_flight = 1  # saturated by another request
+        response = client.get("/products")
+        assert response.status_code == 503 and response.headers["Retry-After"] == "1"
+        assert client.get("/other").status_code == 200
+
+    def test_configured_routes_exist(self):
+        import server
+
+        routes = {f"{method} {route.path}" for route in server.api_router.routes for method in route.methods}
+        assert set(server.ROUTE_ADMISSION_CLASSES) <= routes
@@ -0,0 +1,102 @@
+"""
+AMC visit schedule tests
+
+The slot tests need no server. The generation tests run the API against a local
+MongoDB:
+
+    AMC_MONGO_URL=mongodb://localhost:27017 pytest tests/test_amc_schedule.py
+"""
+import os
+import uuid
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+MONGO_URL = os.environ.get("AMC_MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("MONGO_URL", MONGO_URL)
+os.environ.setdefault("DB_NAME", "amc")
+
+import server  # noqa: E402
+
+START = date(2026, 1, 1)
+
+
+def midnight(day: date) -> datetime:
+    return datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+
+
+class TestVisitSlots:
+    """Every day belongs to the nearest scheduled slot"""
+
+    def test_slots_follow_the_subscription_start(self):
+        dates = server.expand_visit_dates(START, "monthly", date(2026, 1, 15), date(2026, 4, 15))
+        assert dates == [date(2026, 1, 31), date(2026, 3, 2), date(2026, 4, 1)]
+
+    def test_days_either_side_of_a_slot_fill_it(self):
+        slot = server.visit_slot(START, "monthly", date(2026, 1, 31))
+        assert slot == 1
+        for moved in [-14, -1, 1, 14]:
+            assert server.visit_slot(START, "monthly", date(2026, 1, 31) + timedelta(days=moved)) == slot
+        assert server.visit_slot(START, "monthly", date(2026, 1, 31) + timedelta(days=15)) == slot + 1
+        assert server.visit_slot(START, "quarterly", date(2026, 4, 3)) == 1
+
+
+# ============= GENERATION =============
+
+@pytest.fixture
+def amc_app():
+    client = MongoClient(MONGO_URL, serverSelectionTimeoutMS=1000, tz_aware=True)
+    try:
+        client.admin.command("ping")
+    except PyMongoError:
+        client.close()
+        pytest.skip(f"No MongoDB at {MONGO_URL}")
+    database = f"amc_{uuid.uuid4().hex[:8]}"
+    seeded = client[database]
+    seeded.users.insert_many([
+        {"id": "user-admin", "email": "admin@amc.example.com", "full_name": "Admin", "role": "admin", "status": "active"},
+        {"id": "crew-0", "email": "crew@amc.example.com", "full_name": "Crew", "role": "crew", "status": "active"},
+    ])
+    seeded.amc_subscriptions.insert_one({
+        "id": "sub-0", "client_name": "Client", "status": "active", "frequency": "monthly", "start_date": midnight(START),
+    })
+
+    from fastapi.testclient import TestClient
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv("DB_NAME", database)
+        patch.setenv("DATETIME_MIGRATION_ON_STARTUP", "false")
+        patch.setattr(server, "mongo_url", MONGO_URL)
+        with TestClient(server.app) as test_client:
+            yield test_client, seeded, {"Authorization": f"Bearer {server.create_token('user-admin', 'admin')}"}
+    client.drop_database(database)
+    client.close()
+
+
+def generate(test_client, headers) -> dict:
+    response = test_client.post("/api/amc/schedule/generate", params={"horizon_days": 90, "start_date": "2026-01-01"},
+                                headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+class TestScheduleGeneration:
+    """Generated visits never duplicate one booked by hand"""
+
+    def test_visit_moved_by_a_day_fills_its_slot(self, amc_app):
+        test_client, seeded, admin = amc_app
+        # The Jan 31 visit was booked by hand for the day after
+        moved = test_client.post("/api/amc/sub-0/visit", json={
+            "subscription_id": "sub-0", "scheduled_date": "2026-02-01T00:00:00Z", "crew_assigned": "crew-0",
+        }, headers=admin)
+        assert moved.status_code == 200, moved.text
+        summary = generate(test_client, admin)
+        assert (summary["visits_created"], summary["visits_skipped"]) == (2, 1)
+        days = sorted(v["scheduled_date"].date() for v in seeded.amc_visits.find({}, {"scheduled_date": 1}))
+        assert days == [date(2026, 1, 1), date(2026, 2, 1), date(2026, 3, 2)]
+
+    def test_second_run_adds_nothing(self, amc_app):
+        test_client, _, admin = amc_app
+        generate(test_client, admin)
+        assert generate(test_client, admin)["visits_created"] == 0
@@ -0,0 +1,219 @@
+"""
+Hot/cold archival tests
+
+The merge tests need no server. The archival tests run the job against a local
+MongoDB and read the moved records back through the API:
+
+    ARCHIVE_MONGO_URL=mongodb://localhost:27017 pytest tests/test_archive.py
+"""
+import asyncio
+import os
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+MONGO_URL = os.environ.get("ARCHIVE_MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("MONGO_URL", MONGO_URL)
+os.environ.setdefault("DB_NAME", "archive")
+
+import server  # noqa: E402
+from archive import ArchivedCollection, archive_name, merge_sorted  # noqa: E402
+
+DAY = timedelta(days=1)
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def doc(doc_id: str, days: int, tier: str = "hot") -> dict:
+    return {"id": doc_id, "created_at": START + days * DAY, "tier": tier}
+
+
+class TestMergeSorted:
+    """Both tiers read as one sorted, de-duplicated list"""
+
+    def test_newest_first_across_tiers(self):
+        hot = [doc("d", 9), doc("b", 5)]
+        archive = [doc("c", 7, "archive"), doc("a", 1, "archive")]
+        merged = merge_sorted([hot, archive], [("created_at", -1), ("id", -1)])
+        assert [d["id"] for d in merged] == ["d", "c", "b", "a"]
+
+    def test_limit(self):
+        merged = merge_sorted([[doc("b", 2)], [doc("z", 0, "archive"), doc("a", 1, "archive")]], [("created_at", 1)], 2)
+        assert [d["id"] for d in merged] == ["z", "a"]
+
+    def test_document_in_both_tiers_comes_from_the_hot_one(self):
+        merged = merge_sorted([[doc("a", 1)], [doc("a", 1, "archive")]], [("created_at", -1), ("id", -1)])
+        assert [(d["id"], d["tier"]) for d in merged] == [("a", "hot")]
+
+    def test_unsorted_reads_concatenate(self):
+        merged = merge_sorted([[doc("b", 2)], [doc("a", 1, "archive"), doc("b", 2, "archive")]], [])
+        assert [(d["id"], d["tier"]) for d in merged] == [("b", "hot"), ("a", "archive")]
+
+    def test_mixed_directions_are_refused(self):
+        with pytest.raises(ValueError):
+            merge_sorted([[], []], [("created_at", -1), ("id", 1)])
+
+
+class MemoryCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, spec):
+        for field, direction in reversed(spec):
+            self.docs.sort(key=lambda d: d.get(field), reverse=direction == -1)
+        return self
+
+    def limit(self, limit):
+        self.docs = self.docs[:limit]
+        return self
+
+    async def to_list(self, length):
+        return self.docs[:length]
+
+    async def __aiter__(self):
+        for doc in self.docs:
+            yield doc
+
+
+class MemoryTier:
+    """Enough of a collection for MergedCursor, with inclusive projections only."""
+
+    def __init__(self, docs):
+        self.docs = docs
+
+    def find(self, query, projection=None):
+        return MemoryCursor([
+            {k: v for k, v in doc.items() if not projection or projection.get(k)} for doc in self.docs
+        ])
+
+
+class TestMergedCursor:
+    """Copies in both tiers are returned once even when the projection leaves out `id`"""
+
+    def tiers(self):
+        return ArchivedCollection(
+            MemoryTier([doc("a", 2), doc("b", 3)]), MemoryTier([doc("a", 2, "archive"), doc("c", 1, "archive")])
+        )
+
+    def test_iteration_with_a_narrow_projection(self):
+        async def read():
+            return [d async for d in self.tiers().find({}, {"tier": 1})]
+
+        assert asyncio.run(read()) == [{"tier": "hot"}, {"tier": "hot"}, {"tier": "archive"}]
+
+    def test_sorted_read_with_a_narrow_projection(self):
+        cursor = self.tiers().find({}, {"tier": 1}).sort("created_at", -1)
+        assert asyncio.run(cursor.to_list(None)) == [{"tier": "hot"}, {"tier": "hot"}, {"tier": "archive"}]
+
+
+# ============= ARCHIVAL =============
+
+@pytest.fixture(scope="module")
+def archived_app():
+    client = MongoClient(MONGO_URL, serverSelectionTimeoutMS=1000, tz_aware=True)
+    try:
+        client.admin.command("ping")
+    except PyMongoError:
+        client.close()
+        pytest.skip(f"No MongoDB at {MONGO_URL}")
+    database = f"archive_{uuid.uuid4().hex[:8]}"
+    seeded = client[database]
+    now = server.utc_now()
+    seeded.users.insert_many([
+        {"id": "user-admin", "email": "admin@archive.example.com", "full_name": "Admin", "role": "admin", "status": "active"},
+        {"id": "customer-0", "email": "c@archive.example.com", "full_name": "Customer", "role": "customer", "status": "active"},
+    ])
+    seeded.orders.insert_many([
+        {"id": "order-old-done", "user_id": "customer-0", "status": "completed", "total": 40, "created_at": now - 800 * DAY},
+        {"id": "order-old-open", "user_id": "customer-0", "status": "pending", "total": 30, "created_at": now - 700 * DAY},
+        {"id": "order-new-done", "user_id": "customer-0", "status": "completed", "total": 20, "created_at": now - 10 * DAY},
+    ])
+    seeded.amc_subscriptions.insert_one({"id": "sub-0", "client_name": "Client", "status": "active", "created_at": now - 900 * DAY})
+    seeded.amc_visits.insert_many([
+        {"id": f"visit-{i}", "subscription_id": "sub-0", "crew_assigned": "crew-0", "status": "completed",
+         "scheduled_date": now - (800 - i) * DAY, "created_at": now - (800 - i) * DAY}
+        for i in range(5)
+    ])
+    seeded.invoices.insert_one({"id": "invoice-0", "subscription_id": "sub-0", "status": "paid", "amount": 100,
+                                "created_at": now - 800 * DAY})
+    seeded.stock_movements.insert_many([{"id": f"move-{i}", "created_at": now - 500 * DAY} for i in range(7)])
+
+    from fastapi.testclient import TestClient
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv("DB_NAME", database)
+        patch.setenv("DATETIME_MIGRATION_ON_STARTUP", "false")
+        patch.setattr(server, "mongo_url", MONGO_URL)
+        patch.setattr(server, "ARCHIVE_BATCH", 2)
+        patch.setattr(server, "ARCHIVE_PAUSE", 0)
+        with TestClient(server.app) as test_client:
+            def as_role(user_id, role):
+                return {"Authorization": f"Bearer {server.create_token(user_id, role)}"}
+
+            admin = as_role("user-admin", "admin")
+            job_id = test_client.post("/api/admin/archive/run", headers=admin).json()["job_id"]
+            deadline = time.monotonic() + 30
+            while test_client.get(f"/api/jobs/{job_id}", headers=admin).json()["status"] != "completed":
+                assert time.monotonic() < deadline, "archival job did not finish"
+                time.sleep(0.05)
+            yield test_client, seeded, as_role
+    client.drop_database(database)
+    client.close()
+
+
+class TestArchival:
+    """Finished records past the cutoff move; reads find them either way"""
+
+    def test_only_finished_old_records_move(self, archived_app):
+        _, seeded, _ = archived_app
+        assert [d["id"] for d in seeded.orders.find({}, {"id": 1})] == ["order-old-open", "order-new-done"]
+        assert [d["id"] for d in seeded[archive_name("orders")].find({}, {"id": 1})] == ["order-old-done"]
+        assert seeded.stock_movements.count_documents({}) == 0
+        assert seeded[archive_name("stock_movements")].count_documents({}) == 7
+        assert seeded[archive_name("amc_visits")].count_documents({}) == 5
+
+    def test_run_is_recorded(self, archived_app):
+        test_client, _, as_role = archived_app
+        status = test_client.get("/api/admin/archive", headers=as_role("user-admin", "admin")).json()
+        assert status["runs"][0]["status"] == "completed"
+        assert status["runs"][0]["result"]["moved"] == {"orders": 1, "invoices": 1, "amc_visits": 5, "stock_movements": 7}
+
+    def test_archived_visits_are_dropped_from_crew_devices(self, archived_app):
+        _, seeded, _ = archived_app
+        tombstones = seeded.sync_tombstones.find({}, {"_id": 0, "kind": 1, "id": 1, "crew_id": 1}).sort("id", 1)
+        assert list(tombstones) == [{"kind": "visit", "id": f"visit-{i}", "crew_id": "crew-0"} for i in range(5)]
+
+    def test_order_reads_fall_back_to_the_archive(self, archived_app):
+        test_client, _, as_role = archived_app
+        customer = as_role("customer-0", "customer")
+        assert test_client.get("/api/orders/order-old-done", headers=customer).json()["total"] == 40
+        mine = test_client.get("/api/orders/my/all", headers=customer).json()
+        assert [o["id"] for o in mine] == ["order-new-done", "order-old-open", "order-old-done"]
+
+    def test_amc_children_span_both_tiers(self, archived_app):
+        test_client, _, as_role = archived_app
+        admin = as_role("user-admin", "admin")
+        sub = test_client.get("/api/amc/sub-0", params={"limit": 3}, headers=admin).json()
+        assert sub["children"]["visits"]["count"] == 5
+        assert [v["id"] for v in sub["visits"]] == ["visit-4", "visit-3", "visit-2"]
+        rest = test_client.get(
+            "/api/amc/sub-0/visits", params={"limit": 3, "cursor": sub["children"]["visits"]["next_cursor"]}, headers=admin
+        ).json()
+        assert [v["id"] for v in rest] == ["visit-1", "visit-0"]
+        assert [i["id"] for i in sub["invoices"]] == ["invoice-0"]
+
+
+class TestMidMove:
+    """A document caught in both tiers while it is being moved"""
+
+    def test_totals_count_it_once_and_counts_may_not(self, archived_app):
+        test_client, seeded, as_role = archived_app
+        seeded[archive_name("orders")].insert_one(seeded.orders.find_one({"id": "order-new-done"}))
+        try:
+            orders = test_client.get("/api/admin/dashboard", headers=as_role("user-admin", "admin")).json()["orders"]
+        finally:
+            seeded[archive_name("orders")].delete_one({"id": "order-new-done"})
+        assert orders["total_revenue"] == 60
+        assert orders["total"] == 4  # three orders, one of them counted in both tiers
@@ -0,0 +1,146 @@
+"""
+Request coalescing tests (no server required)
+"""
+import asyncio
+import inspect
+from typing import Optional
+
+import pytest
+
+from coalescing import SingleFlight, request_key
+from metrics import Registry
+
+
+def counting_endpoint(delay: float = 0.01):
+    calls = []
+
+    async def get_report(status: Optional[str] = None, user: dict = None, reads=None):
+        calls.append(status)
+        await asyncio.sleep(delay)
+        return {"status": status, "call": len(calls)}
+
+    return get_report, calls
+
+
+class TestRequestKey:
+    """Same endpoint, parameters and role make the same key"""
+
+    def test_role_not_user_identity(self):
+        first = request_key("get_report", {"status": "open", "user": {"id": "a", "role": "admin"}})
+        second = request_key("get_report", {"user": {"id": "b", "role": "admin"}, "status": "open"})
+        assert first == second
+        assert first != request_key("get_report", {"status": "open", "user": {"id": "c", "role": "manager"}})
+
+    def test_parameters_and_handles(self):
+        key = request_key("get_report", {"status": None, "tags": ["a", "b"], "reads": object()})
+        assert key == ("get_report", None, (("status", None), ("tags", ("a", "b"))))
+        assert key != request_key("get_report", {"status": "open", "tags": ["a", "b"]})
+
+
+class TestSingleFlight:
+    """Concurrent identical calls share one computation"""
+
+    def test_concurrent_calls_share_one_result(self):
+        flight = SingleFlight()
+        endpoint, calls = counting_endpoint()
+        coalesced = flight.coalesce(endpoint)
+
+        async def burst():
+            return await asyncio.gather(*(coalesced(status="open", user={"role": "admin"}) for _ in range(5)))
+
+        results = asyncio.run(burst())
+        assert calls == ["open"]
+        assert all(result is results[0] for result in results)
+
+    def test_different_parameters_or_roles_do_not_share(self):
+        flight = SingleFlight()
+        endpoint, calls = counting_endpoint()
+        coalesced = flight.coalesce(endpoint)
+
+        async def burst():
+            await asyncio.gather(
+                coalesced(status="open", user={"role": "admin"}),
+                coalesced(status="closed", user={"role": "admin"}),
+                coalesced(status="open", user={"role": "manager"}),
+            )
+
+        asyncio.run(burst())
+        assert sorted(calls) == ["closed", "open", "open"]
+
+    def test_sequential_calls_recompute_without_a_cache(self):
+        flight = SingleFlight()
+        endpoint, calls = counting_endpoint(delay=0)
+        coalesced = flight.coalesce(endpoint)
+
+        async def twice():
+            await coalesced(status="open")
+            await coalesced(status="open")
+
+        asyncio.run(twice())
+        assert len(calls) == 2
+
+    def test_results_are_cached_briefly(self):
+        flight = SingleFlight(cache_seconds=0.05)
+        endpoint, calls = counting_endpoint(delay=0)
+        coalesced = flight.coalesce(endpoint)
+
+        async def spread():
+            await coalesced(status="open")
+            await coalesced(status="open")
+            await asyncio.sleep(0.1)
+            await coalesced(status="open")
+
+        asyncio.run(spread())
+        assert len(calls) == 2
+
+    def test_errors_are_shared_but_not_cached(self):
+        flight = SingleFlight(cache_seconds=60)
+        calls = []
+
+        async def failing():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+
+        async def burst():
+            return await asyncio.gather(*(flight.run("key", failing) for _ in range(3)), return_exceptions=True)
+
+        assert all(isinstance(result, ValueError) for result in asyncio.run(burst()))
+        assert len(calls) == 1
+        with pytest.raises(ValueError):
+            asyncio.run(flight.run("key", failing))
+        assert len(calls) == 2
+
+    def test_cancelled_caller_does_not_cancel_the_others(self):
+        flight = SingleFlight()
+        endpoint, calls = counting_endpoint(delay=0.05)
+        coalesced = flight.coalesce(endpoint)
+
+        async def scenario():
+            first = asyncio.ensure_future(coalesced(status="open"))
+            second = asyncio.ensure_future(coalesced(status="open"))
+            await asyncio.sleep(0.01)
+            first.cancel()
+            return await second
+
+        assert asyncio.run(scenario())["status"] == "open"
+        assert calls == ["open"]
+
+    def test_outcomes_are_counted(self):
+        registry = Registry()
+        flight = SingleFlight(cache_seconds=60, registry=registry)
+        endpoint, _ = counting_endpoint()
+        coalesced = flight.coalesce(endpoint)
+
+        async def scenario():
+            await asyncio.gather(coalesced(status="open"), coalesced(status="open"))
+            await coalesced(status="open")
+
+        asyncio.run(scenario())
+        rendered = registry.render()
+        for outcome in ["computed", "joined", "cached"]:
+            assert f'http_coalesced_requests_total{{endpoint="get_report",outcome="{outcome}"}} 1' in rendered
+
+    def test_signature_is_preserved_for_fastapi(self):
+        endpoint, _ = counting_endpoint()
+        assert inspect.signature(SingleFlight().coalesce(endpoint)) == inspect.signature(endpoint)
@@ -0,0 +1,83 @@
+"""
+Crew calendar interval index tests (no server required)
+"""
+import random
+from datetime import datetime, timedelta, timezone
+
+from crew_calendar import Booking, CrewCalendar, IntervalIndex, day_inclusive_end
+
+BASE = datetime(2026, 3, 1, tzinfo=timezone.utc)
+
+
+def booking(key, start_hours, end_hours, crew_id="crew-1"):
+    return Booking(key, crew_id, "task", key, BASE + timedelta(hours=start_hours), BASE + timedelta(hours=end_hours))
+
+
+class TestIntervalIndex:
+    """Overlap queries match a brute-force scan"""
+
+    def test_matches_brute_force(self):
+        rnd = random.Random(7)
+        index = IntervalIndex()
+        live = []
+        for i in range(400):
+            start = rnd.randint(0, 1000)
+            entry = booking(f"b{i}", start, start + rnd.randint(0, 48))
+            index.add(entry)
+            live.append(entry)
+            if rnd.random() < 0.25:
+                index.remove(live.pop(rnd.randrange(len(live))))
+
+            q_start = BASE + timedelta(hours=rnd.randint(0, 1000))
+            q_end = q_start + timedelta(hours=rnd.randint(1, 24))
+            expected = {b.key for b in live if b.start < q_end and b.end > q_start}
+            assert {b.key for b in index.overlapping(q_start, q_end)} == expected
+            assert index.is_free(q_start, q_end) == (not expected)
+
+    def test_touching_intervals_do_not_overlap(self):
+        index = IntervalIndex()
+        index.add(booking("a", 0, 8))
+        assert index.is_free(BASE + timedelta(hours=8), BASE + timedelta(hours=10))
+
+    def test_bookings_with_the_same_start_are_removed_by_key(self):
+        index = IntervalIndex()
+        for key, end in [("a", 2), ("b", 30), ("c", 4)]:
+            index.add(booking(key, 0, end))
+        index.remove(booking("b", 0, 30))
+        index.remove(booking("missing", 0, 30))
+        assert len(index) == 2
+        assert [b.key for b in index.overlapping(BASE, BASE + timedelta(hours=1))] == ["a", "c"]
+        assert index.is_free(BASE + timedelta(hours=4), BASE + timedelta(hours=10))
+
+    def test_lookups_between_bookings_do_not_rebuild(self):
+        # Dispatch checks a day, books it, and checks the next: 20k rounds should take well under a second
+        index = IntervalIndex()
+        for day in range(20000):
+            start = BASE + timedelta(days=day)
+            assert index.is_free(start, start + timedelta(days=1))
+            index.add(booking(f"visit:{day}", day * 24, day * 24 + 3))
+        assert len(index) == 20000
+        assert not index.is_free(BASE + timedelta(days=500), BASE + timedelta(days=501))
+
+
+class TestCrewCalendar:
+    """Booking, release and conflict reporting"""
+
+    def test_rebooking_same_key_replaces_previous_window(self):
+        calendar = CrewCalendar()
+        calendar.book(booking("task:1", 0, 8))
+        calendar.book(booking("task:1", 24, 32))
+        assert calendar.is_free("crew-1", BASE, BASE + timedelta(hours=8))
+        assert [b.key for b in calendar.conflicts("crew-1", BASE + timedelta(hours=25), BASE + timedelta(hours=26))] == ["task:1"]
+
+    def test_free_crew_and_release(self):
+        calendar = CrewCalendar()
+        calendar.book(booking("visit:1", 0, 3, crew_id="crew-1"))
+        window = (BASE, BASE + timedelta(hours=2))
+        assert calendar.free_crew(["crew-1", "crew-2"], *window) == ["crew-2"]
+        calendar.release("visit:1")
+        assert calendar.free_crew(["crew-1", "crew-2"], *window) == ["crew-1", "crew-2"]
+
+    def test_date_only_end_covers_whole_day(self):
+        assert day_inclusive_end(BASE) == BASE + timedelta(days=1)
+        assert day_inclusive_end(BASE + timedelta(hours=5)) == BASE + timedelta(hours=5)
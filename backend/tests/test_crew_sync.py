@@ -0,0 +1,213 @@
+"""
+Crew delta sync and batch log upload tests
+
+The token tests need no server. The sync and upload tests run the API against a
+local MongoDB and replay what a crew member's device would send and see:
+
+    SYNC_MONGO_URL=mongodb://localhost:27017 pytest tests/test_crew_sync.py
+"""
+import os
+import uuid
+from datetime import timedelta
+
+import pytest
+from fastapi import HTTPException
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+MONGO_URL = os.environ.get("SYNC_MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("MONGO_URL", MONGO_URL)
+os.environ.setdefault("DB_NAME", "sync")
+
+import server  # noqa: E402
+
+NOW = server.utc_now()
+HOUR = timedelta(hours=1)
+
+
+class TestSyncToken:
+    """Tokens round-trip a position per stream and reject anything else"""
+
+    def test_round_trip(self):
+        positions = {stream: (NOW - n * HOUR, f"id-{n}") for n, stream in enumerate(server.SYNC_STREAMS)}
+        assert server.decode_sync_token(server.encode_sync_token(positions)) == positions
+
+    def test_garbage_is_refused(self):
+        for token in ["not-base64!", server.encode_sync_token({"tasks": (NOW, "")})]:
+            with pytest.raises(HTTPException) as error:
+                server.decode_sync_token(token)
+            assert error.value.status_code == 400
+
+
+# ============= SYNC =============
+
+def task(task_id: str, crew_id: str, status: str = "pending") -> dict:
+    return {
+        "id": task_id, "project_id": "project-0", "title": task_id, "assigned_to": crew_id, "status": status,
+        "start_date": NOW + 24 * HOUR, "end_date": NOW + 48 * HOUR, "priority": "medium",
+        "created_at": NOW - 48 * HOUR, "updated_at": NOW - 48 * HOUR,
+    }
+
+
+def visit(visit_id: str, crew_id: str) -> dict:
+    return {
+        "id": visit_id, "subscription_id": "sub-0", "crew_assigned": crew_id, "status": "scheduled",
+        "scheduled_date": NOW + 72 * HOUR, "created_at": NOW - 48 * HOUR, "updated_at": NOW - 48 * HOUR,
+    }
+
+
+@pytest.fixture(scope="module")
+def sync_app():
+    client = MongoClient(MONGO_URL, serverSelectionTimeoutMS=1000, tz_aware=True)
+    try:
+        client.admin.command("ping")
+    except PyMongoError:
+        client.close()
+        pytest.skip(f"No MongoDB at {MONGO_URL}")
+    database = f"sync_{uuid.uuid4().hex[:8]}"
+    seeded = client[database]
+    seeded.users.insert_many([
+        {"id": "user-admin", "email": "admin@sync.example.com", "full_name": "Admin", "role": "admin", "status": "active"},
+        *({"id": f"crew-{n}", "email": f"crew-{n}@sync.example.com", "full_name": f"Crew {n}", "role": "crew",
+           "status": "active", "hourly_rate": 20} for n in range(4)),
+    ])
+    seeded.projects.insert_many([
+        {"id": "project-0", "name": "Garden", "tasks_total": 0, "tasks_completed": 0},
+        {"id": "project-logs", "name": "Lawn", "labour_hours": 0, "actual_cost": 0, "budget_variance": 1000},
+    ])
+    seeded.amc_subscriptions.insert_one({"id": "sub-0", "client_name": "Client", "status": "active", "total_visits": 0})
+    seeded.project_tasks.insert_many([
+        task("task-0", "crew-0"), task("task-1", "crew-0"), task("task-done", "crew-0", "completed"),
+        task("task-2", "crew-2"), task("task-3", "crew-3"), task("task-4", "crew-3"), task("task-other", "crew-1"),
+    ])
+    seeded.amc_visits.insert_many([visit("visit-0", "crew-0"), visit("visit-1", "crew-0"), visit("visit-2", "crew-3")])
+
+    from fastapi.testclient import TestClient
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv("DB_NAME", database)
+        patch.setenv("DATETIME_MIGRATION_ON_STARTUP", "false")
+        patch.setattr(server, "mongo_url", MONGO_URL)
+        patch.setattr(server, "SYNC_PAGE_LIMIT", 2)
+        with TestClient(server.app) as test_client:
+            def as_role(user_id, role):
+                return {"Authorization": f"Bearer {server.create_token(user_id, role)}"}
+
+            yield test_client, seeded, as_role
+    client.drop_database(database)
+    client.close()
+
+
+def sync(test_client, headers, since=None) -> dict:
+    response = test_client.get("/api/crew/sync", params={"since": since} if since else {}, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def ids(items) -> list:
+    return [item["id"] for item in items]
+
+
+class TestCrewSync:
+    """A full snapshot first, then only what changed, including removals"""
+
+    def test_first_sync_is_the_whole_synced_set(self, sync_app):
+        test_client, _, as_role = sync_app
+        snapshot = sync(test_client, as_role("crew-0", "crew"))
+        assert snapshot["full"] and not snapshot["has_more"]
+        assert sorted(ids(snapshot["tasks"])) == ["task-0", "task-1"]
+        assert sorted(ids(snapshot["visits"])) == ["visit-0", "visit-1"]
+        assert snapshot["deleted"] == []
+
+    def test_delta_pages_through_changes_sharing_a_timestamp(self, sync_app):
+        test_client, seeded, as_role = sync_app
+        stamp = NOW - HOUR
+        seeded.crew_logs.insert_many([
+            {"id": f"log-{n}", "crew_member_id": "crew-1", "project_id": "project-0", "hours_worked": 1,
+             "created_at": stamp, "updated_at": stamp}
+            for n in [3, 0, 4, 1, 2]
+        ])
+        seeded.crew_logs.insert_one({"id": "log-synced", "crew_member_id": "crew-1", "project_id": "project-0",
+                                     "hours_worked": 1, "created_at": stamp - HOUR, "updated_at": stamp - HOUR})
+        token = server.encode_sync_token({stream: (stamp - 30 * server.SYNC_CLOCK_SKEW, "") for stream in server.SYNC_STREAMS})
+        pages = []
+        while True:
+            page = sync(test_client, as_role("crew-1", "crew"), token)
+            pages.append((ids(page["logs"]), page["has_more"]))
+            token = page["token"]
+            if not page["has_more"]:
+                break
+        assert pages == [(["log-0", "log-1"], True), (["log-2", "log-3"], True), (["log-4"], False)]
+
+    def test_completed_task_and_visit_arrive_as_tombstones(self, sync_app):
+        test_client, _, as_role = sync_app
+        crew, admin = as_role("crew-3", "crew"), as_role("user-admin", "admin")
+        token = sync(test_client, crew)["token"]
+        assert test_client.put("/api/projects/tasks/task-3", params={"status": "in_progress"}, headers=admin).status_code == 200
+        assert test_client.put("/api/projects/tasks/task-4", params={"status": "completed"}, headers=admin).status_code == 200
+        assert test_client.put("/api/amc/visits/visit-2/complete", headers=crew).status_code == 200
+        delta = sync(test_client, crew, token)
+        assert not delta["full"]
+        assert ids(delta["tasks"]) == ["task-3"]
+        assert delta["visits"] == []
+        assert sorted((d["kind"], d["id"]) for d in delta["deleted"]) == [("task", "task-4"), ("visit", "visit-2")]
+
+    def test_reopened_task_withdraws_its_tombstone(self, sync_app):
+        test_client, seeded, as_role = sync_app
+        crew, admin = as_role("crew-2", "crew"), as_role("user-admin", "admin")
+        token = sync(test_client, crew)["token"]
+        test_client.put("/api/projects/tasks/task-2", params={"status": "completed"}, headers=admin)
+        assert seeded.sync_tombstones.count_documents({"id": "task-2", "crew_id": "crew-2"}) == 1
+        test_client.put("/api/projects/tasks/task-2", params={"status": "pending"}, headers=admin)
+        delta = sync(test_client, crew, token)
+        assert ids(delta["tasks"]) == ["task-2"]
+        assert delta["deleted"] == []
+
+
+def log(client_id: str, hours: float = 2, project_id: str = "project-0") -> dict:
+    return {"client_id": client_id, "project_id": project_id, "crew_member_id": "crew-0", "date": NOW.isoformat(),
+            "hours_worked": hours, "tasks_completed": "Mowing"}
+
+
+def upload(test_client, headers, logs) -> dict:
+    response = test_client.post("/api/crew/logs/batch", json={"logs": logs}, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+class TestCrewLogBatch:
+    """Offline log uploads: per-entry statuses, replay-safe, rolled up once"""
+
+    def test_each_entry_gets_its_own_status(self, sync_app):
+        test_client, _, as_role = sync_app
+        missing_hours = log("a-2")
+        del missing_hours["hours_worked"]
+        result = upload(test_client, as_role("crew-0", "crew"), [
+            log("a-1"), missing_hours, "not a log", log("a-3", project_id="project-missing"), log("a-1"), log("a-4"),
+        ])
+        statuses = [(r["client_id"], r["status"]) for r in result["results"]]
+        assert statuses == [("a-1", "created"), ("a-2", "invalid"), (None, "invalid"), ("a-3", "invalid"),
+                            ("a-1", "duplicate"), ("a-4", "created")]
+        assert result["results"][1]["error"] == "hours_worked: Field required"
+        assert result["results"][3]["error"] == "Project not found"
+        assert (result["created"], result["duplicate"], result["invalid"]) == (2, 1, 3)
+
+    def test_reupload_is_recognised_by_client_id(self, sync_app):
+        test_client, seeded, as_role = sync_app
+        crew = as_role("crew-0", "crew")
+        first = upload(test_client, crew, [log("b-1"), log("b-2")])
+        # The device lost the response and sends the same logs again, plus one more
+        again = upload(test_client, crew, [log("b-1"), log("b-2"), log("b-3")])
+        assert [r["status"] for r in again["results"]] == ["duplicate", "duplicate", "created"]
+        assert [r["id"] for r in again["results"][:2]] == [r["id"] for r in first["results"]]
+        assert seeded.crew_logs.count_documents({"client_id": {"$in": ["b-1", "b-2", "b-3"]}}) == 3
+
+    def test_rollup_matches_the_inserted_logs(self, sync_app):
+        test_client, seeded, as_role = sync_app
+        crew = as_role("crew-0", "crew")
+        upload(test_client, crew, [log("c-1", 1.5, "project-logs"), log("c-2", 4, "project-logs"), log("c-1", 9, "project-logs")])
+        upload(test_client, crew, [log("c-2", 4, "project-logs"), log("c-3", 2.5, "project-logs"), log("c-4", 1)])
+        logs = list(seeded.crew_logs.find({"project_id": "project-logs"}))
+        project = seeded.projects.find_one({"id": "project-logs"})
+        hours, cost = sum(doc["hours_worked"] for doc in logs), sum(doc["labour_cost"] for doc in logs)
+        assert (len(logs), hours, cost) == (3, 8, 160)
+        assert (project["labour_hours"], project["actual_cost"], project["budget_variance"]) == (hours, cost, 1000 - cost)
@@ -31,6 +31,14 @@ class TestHealth:
         assert data["message"] == "Green Arcadian API"
         print("✓ API root check passed")
 
+    def test_api_ready(self):
+        response = requests.get(f"{BASE_URL}/api/ready")
+        assert response.status_code in [200, 503]
+        data = response.json()
+        assert data["checks"]["mongo"] is True
+        assert "checkout_wait_ms" in data["pool"]
+        print(f"✓ Readiness check - {data['status']}")
+
 
 class TestAuthentication:
     """Authentication flow tests"""
@@ -205,6 +213,38 @@ class TestProjects:
         print(f"✓ Project created - {data['project_number']}")
         return data["id"]
 
+    def test_project_detail_children(self, admin_token):
+        """Test project detail embeds only expanded children, with counts for all"""
+        headers = {"Authorization": f"Bearer {admin_token}"}
+        project_id = self.test_create_project(admin_token)
+        response = requests.get(f"{BASE_URL}/api/projects/{project_id}?expand=tasks&limit=5", headers=headers)
+        assert response.status_code == 200
+        data = response.json()
+        assert isinstance(data["tasks"], list)
+        assert "crew_logs" not in data
+        assert data["children"]["crew_logs"]["count"] == 0
+        assert data["children"]["tasks"]["next"] is None
+        print("✓ Project detail children paginated")
+
+    def test_task_completion_rolls_up_progress(self, admin_token):
+        """Test completing a task updates project progress counters"""
+        headers = {"Authorization": f"Bearer {admin_token}"}
+        project_id = self.test_create_project(admin_token)
+        task = requests.post(f"{BASE_URL}/api/projects/tasks", headers=headers, json={
+            "project_id": project_id,
+            "title": "TEST_Task",
+            "start_date": "2026-03-01",
+            "end_date": "2026-03-02"
+        }).json()
+        response = requests.put(f"{BASE_URL}/api/projects/tasks/{task['id']}?status=completed", headers=headers)
+        assert response.status_code == 200
+        project = requests.get(f"{BASE_URL}/api/projects/{project_id}?expand=", headers=headers).json()
+        assert project["tasks_total"] == 1
+        assert project["tasks_completed"] == 1
+        assert project["progress"] == 100
+        assert project["budget_variance"] == project["budget"] - project["actual_cost"]
+        print("✓ Project rollups updated")
+
 
 class TestOrders:
     """Order management tests"""
@@ -217,7 +257,19 @@ class TestOrders:
         data = response.json()
         assert isinstance(data, list)
         print(f"✓ Orders retrieved - {len(data)} orders")
-    
+
+    def test_orders_created_window(self, admin_token):
+        """Test orders can be filtered to a created_at window"""
+        headers = {"Authorization": f"Bearer {admin_token}"}
+        response = requests.get(
+            f"{BASE_URL}/api/orders?created_from=2026-01-01T00:00:00Z&created_to=2026-02-01T00:00:00Z",
+            headers=headers
+        )
+        assert response.status_code == 200
+        for order in response.json():
+            assert "2026-01-01" <= order["created_at"][:10] < "2026-02-01"
+        print(f"✓ Order date window works - {len(response.json())} orders")
+
     def test_create_public_order(self):
         """Test create order via public endpoint"""
         order_data = {
@@ -276,6 +328,18 @@ class TestAMC:
         assert data["status"] == "active"
         print(f"✓ AMC created - {data['contract_number']}")
 
+    def test_generate_visit_schedule_is_idempotent(self, admin_token):
+        """Test schedule generation does not duplicate visits on re-run"""
+        headers = {"Authorization": f"Bearer {admin_token}"}
+        url = f"{BASE_URL}/api/amc/schedule/generate?horizon_days=30&start_date=2026-02-01"
+        first = requests.post(url, headers=headers)
+        assert first.status_code == 200
+        assert "crew_assignments" in first.json()
+        second = requests.post(url, headers=headers)
+        assert second.status_code == 200
+        assert second.json()["visits_created"] == 0
+        print(f"✓ Visit schedule generated - {first.json()['visits_created']} visits")
+
 
 class TestRFQ:
     """RFQ (Request for Quote) tests"""
@@ -394,6 +458,34 @@ class TestExports:
         assert data["status"] == "draft"
         print(f"✓ Export doc created - {data['doc_number']}")
 
+    def test_render_export_doc_cache(self, admin_token):
+        """Test rendered output is cached and dropped when the document changes"""
+        headers = {"Authorization": f"Bearer {admin_token}"}
+        export_data = {
+            "doc_type": "packing_list",
+            "customer_name": "TEST_Render_Customer",
+            "destination_country": "UAE",
+            "items": [{"name": "Ficus", "quantity": 20, "weight": 4.5}],
+            "total_weight": 90,
+            "total_boxes": 4
+        }
+        doc = requests.post(f"{BASE_URL}/api/exports", headers=headers, json=export_data).json()
+
+        response = requests.get(f"{BASE_URL}/api/exports/{doc['id']}/render?format=pdf", headers=headers)
+        assert response.status_code == 200
+        assert response.content.startswith(b"%PDF")
+        cached = requests.get(f"{BASE_URL}/api/exports/{doc['id']}", headers=headers).json()
+        assert "pdf" in cached["render_cache"]
+
+        requests.put(f"{BASE_URL}/api/exports/{doc['id']}/status?status=final", headers=headers)
+        updated = requests.get(f"{BASE_URL}/api/exports/{doc['id']}", headers=headers).json()
+        assert "render_cache" not in updated
+
+        response = requests.get(f"{BASE_URL}/api/exports/{doc['id']}/render?format=html", headers=headers)
+        assert response.status_code == 200
+        assert "TEST_Render_Customer" in response.text
+        print("✓ Export render cache invalidated on status change")
+
 
 class TestProduction:
     """Production management tests"""
@@ -427,6 +519,34 @@ class TestProduction:
         assert data["status"] == "in_progress"
         print(f"✓ Production batch created - {data['batch_number']}")
 
+    def test_complete_production_moves_stock(self, admin_token):
+        """Test completion consumes components and stocks the product, or changes nothing"""
+        headers = {"Authorization": f"Bearer {admin_token}"}
+        stem = requests.post(f"{BASE_URL}/api/inventory", headers=headers, json={
+            "name": f"TEST_Stem_{uuid.uuid4().hex[:6]}", "category": "flowers", "price": 2, "quantity": 20
+        }).json()
+        prod = requests.post(f"{BASE_URL}/api/production", headers=headers, json={
+            "product_type": "bouquet",
+            "name": f"TEST_Bouquet_{uuid.uuid4().hex[:6]}",
+            "components": [{"plant_id": stem["id"], "quantity": 3}, {"name": "Ribbon", "quantity": 1}],
+            "quantity": 5,
+            "sell_price": 30
+        }).json()
+
+        response = requests.put(f"{BASE_URL}/api/production/{prod['id']}/complete?actual_quantity=10", headers=headers)
+        assert response.status_code == 400
+        assert requests.get(f"{BASE_URL}/api/inventory/{stem['id']}", headers=headers).json()["quantity"] == 20
+
+        response = requests.put(f"{BASE_URL}/api/production/{prod['id']}/complete?actual_quantity=5", headers=headers)
+        assert response.status_code == 200
+        data = response.json()
+        assert data["status"] == "completed"
+        assert data["untracked_components"] == [{"name": "Ribbon", "quantity": 1}]
+        assert requests.get(f"{BASE_URL}/api/inventory/{stem['id']}", headers=headers).json()["quantity"] == 5
+        product = requests.get(f"{BASE_URL}/api/inventory/{data['product_id']}", headers=headers).json()
+        assert product["quantity"] == 5
+        print("✓ Production completion moved stock")
+
 
 if __name__ == "__main__":
     pytest.main([__file__, "-v", "--tb=short"])
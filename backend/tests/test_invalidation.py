@@ -0,0 +1,190 @@
+"""
+Cross-worker cache invalidation tests
+
+The bus tests need no server. The multi-worker tests start several uvicorn
+processes on one database and need a local MongoDB, ideally a replica set like
+production:
+
+    INVALIDATION_MONGO_URL="mongodb://localhost:27017/?replicaSet=rs0" pytest tests/test_invalidation.py
+"""
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from pathlib import Path
+
+import httpx
+import pytest
+from bson import ObjectId
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+from invalidation import MongoInvalidationBus
+
+MONGO_URL = os.environ.get("INVALIDATION_MONGO_URL", "mongodb://localhost:27017")
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+WORKERS = 3
+MAX_STALENESS = 2.0
+TASK_WINDOW = {"start": "2026-03-02T09:00:00Z", "end": "2026-03-02T12:00:00Z"}
+
+
+def make_bus(max_staleness: float = 1.0):
+    bus = MongoInvalidationBus(max_staleness=max_staleness)
+    refreshed, reloads = [], []
+
+    async def refresh(keys):
+        refreshed.append(keys)
+
+    async def reload():
+        reloads.append(True)
+
+    bus.topic("calendar", refresh, reload)
+    return bus, refreshed, reloads
+
+
+class TestMongoInvalidationBus:
+    """Event handling and the staleness bound, without a database"""
+
+    def test_other_workers_events_refresh_their_keys(self):
+        bus, refreshed, _ = make_bus()
+        event = {"_id": ObjectId(), "topic": "calendar", "keys": ["task:1"], "origin": "another-worker"}
+        asyncio.run(bus._apply(event))
+        assert refreshed == [["task:1"]]
+
+    def test_own_events_only_advance_the_caught_up_time(self):
+        bus, refreshed, _ = make_bus()
+        event_id = ObjectId()
+        bus._sent[event_id] = time.monotonic() - 0.5
+        asyncio.run(bus._apply({"_id": event_id, "topic": "calendar", "keys": ["task:1"], "origin": bus.worker_id}))
+        assert refreshed == []
+        assert 0.5 <= bus.lag() < 1.0
+        assert event_id not in bus._sent
+
+    def test_unknown_topics_and_heartbeats_are_ignored(self):
+        bus, refreshed, _ = make_bus()
+        asyncio.run(bus._apply({"_id": ObjectId(), "topic": "other", "keys": ["x"], "origin": "another-worker"}))
+        asyncio.run(bus._apply({"_id": ObjectId(), "topic": None, "keys": [], "origin": "another-worker"}))
+        assert refreshed == []
+
+    def test_stale_caches_are_reloaded_before_use(self):
+        bus, _, reloads = make_bus(max_staleness=1.0)
+        bus.caught_up_at = time.monotonic() - 5
+        asyncio.run(bus.ensure_fresh())
+        assert reloads == [True]
+        assert bus.lag() < 1.0
+
+    def test_fresh_caches_are_used_as_they_are(self):
+        bus, _, reloads = make_bus(max_staleness=1.0)
+        bus.caught_up_at = time.monotonic()
+        asyncio.run(bus.ensure_fresh())
+        assert reloads == []
+
+
+# ============= MULTIPLE WORKERS =============
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until(condition, timeout: float) -> float:
+    """Poll until `condition()` holds; returns how long that took."""
+    started = time.monotonic()
+    while not condition():
+        if time.monotonic() - started > timeout:
+            raise AssertionError(f"Condition not met within {timeout}s")
+        time.sleep(0.05)
+    return time.monotonic() - started
+
+
+@pytest.fixture(scope="module")
+def workers():
+    """Separate worker processes on one database; yields an HTTP client for each."""
+    mongo = MongoClient(MONGO_URL, serverSelectionTimeoutMS=1000)
+    try:
+        mongo.admin.command("ping")
+    except PyMongoError:
+        mongo.close()
+        pytest.skip(f"No MongoDB at {MONGO_URL}")
+
+    os.environ.setdefault("MONGO_URL", MONGO_URL)
+    import server
+
+    database = f"invalidation_{uuid.uuid4().hex[:8]}"
+    mongo[database].users.insert_many([
+        {"id": "user-manager", "email": "manager@workers.example.com", "full_name": "Manager", "role": "manager",
+         "status": "active"},
+        {"id": "crew-0", "email": "crew@workers.example.com", "full_name": "Crew", "role": "crew", "status": "active"},
+    ])
+    env = {
+        **os.environ,
+        "MONGO_URL": MONGO_URL,
+        "DB_NAME": database,
+        "CACHE_INVALIDATION": "mongo",
+        "CACHE_MAX_STALENESS_SECONDS": str(MAX_STALENESS),
+        "DATETIME_MIGRATION_ON_STARTUP": "false",
+    }
+    ports = [free_port() for _ in range(WORKERS)]
+    processes = [
+        subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "server:app", "--port", str(port), "--log-level", "warning"],
+            cwd=BACKEND_DIR, env=env
+        )
+        for port in ports
+    ]
+    headers = {"Authorization": f"Bearer {server.create_token('user-manager', 'manager')}"}
+    clients = [httpx.Client(base_url=f"http://127.0.0.1:{port}", headers=headers, timeout=10) for port in ports]
+
+    def all_ready():
+        try:
+            return all(client.get("/api/ready").status_code == 200 for client in clients)
+        except httpx.HTTPError:
+            return False
+
+    try:
+        wait_until(all_ready, timeout=60)
+        yield clients
+    finally:
+        for client in clients:
+            client.close()
+        for process in processes:
+            process.terminate()
+            process.wait(timeout=10)
+        mongo.drop_database(database)
+        mongo.close()
+
+
+def is_booked(client) -> bool:
+    response = client.get("/api/crew/conflicts", params={"crew_id": "crew-0", **TASK_WINDOW})
+    response.raise_for_status()
+    return not response.json()["available"]
+
+
+class TestAcrossWorkers:
+    """A booking made on one worker shows up on every other within the staleness bound"""
+
+    def test_booking_and_release_reach_every_worker(self, workers):
+        first, second, third = workers
+        task = first.post("/api/projects/tasks", json={
+            "project_id": "project-0", "title": "Hedge trimming", "assigned_to": "crew-0",
+            "start_date": "2026-03-02T08:00:00Z", "end_date": "2026-03-02T16:00:00Z"
+        })
+        assert task.status_code == 200
+        assert is_booked(first)
+        for other in (second, third):
+            assert wait_until(lambda: is_booked(other), timeout=MAX_STALENESS * 2) <= MAX_STALENESS
+
+        done = second.put(f"/api/projects/tasks/{task.json()['id']}", params={"status": "completed"})
+        assert done.status_code == 200
+        assert not is_booked(second)
+        for other in (first, third):
+            assert wait_until(lambda: not is_booked(other), timeout=MAX_STALENESS * 2) <= MAX_STALENESS
+
+    def test_workers_report_their_lag(self, workers):
+        for client in workers:
+            lag = client.get("/api/ready").json()["cache_lag_seconds"]
+            assert lag is not None and lag <= MAX_STALENESS
@@ -0,0 +1,198 @@
+"""
+Background job queue tests
+
+The backoff and registration tests need no server. The queue tests claim and run
+jobs against a local MongoDB:
+
+    JOBS_MONGO_URL=mongodb://localhost:27017 pytest tests/test_jobs.py
+"""
+import asyncio
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+from jobs import JobQueue
+
+MONGO_URL = os.environ.get("JOBS_MONGO_URL", "mongodb://localhost:27017")
+
+
+class TestQueueSettings:
+    """Backoff and handler registration"""
+
+    def test_backoff_doubles_up_to_the_cap(self):
+        queue = JobQueue(backoff_seconds=5, max_backoff_seconds=30)
+        assert [queue.backoff(attempt).total_seconds() for attempt in range(1, 6)] == [5, 10, 20, 30, 30]
+
+    def test_unknown_job_type_is_refused(self):
+        queue = JobQueue()
+
+        @queue.handler("known")
+        async def known(job):
+            return None
+
+        with pytest.raises(ValueError):
+            asyncio.run(queue.enqueue("unknown"))
+
+
+# ============= QUEUE =============
+
+@pytest.fixture(scope="module")
+def mongo():
+    client = MongoClient(MONGO_URL, serverSelectionTimeoutMS=1000)
+    try:
+        client.admin.command("ping")
+    except PyMongoError:
+        client.close()
+        pytest.skip(f"No MongoDB at {MONGO_URL}")
+    yield client
+    client.close()
+
+
+@pytest.fixture
+def database(mongo):
+    name = f"jobs_{uuid.uuid4().hex[:8]}"
+    yield name
+    mongo.drop_database(name)
+
+
+def run_with_queues(database, scenario, *queues):
+    """Start `queues` on a fresh Motor client, run `scenario(db)` and stop them again."""
+    async def main():
+        client = AsyncIOMotorClient(MONGO_URL, tz_aware=True)
+        db = client[database]
+        await queues[0].create_indexes(db)
+        for queue in queues:
+            await queue.start(db)
+        try:
+            return await scenario(db)
+        finally:
+            for queue in queues:
+                await queue.stop()
+            client.close()
+
+    return asyncio.run(main())
+
+
+async def wait_for(queue, job_id, statuses=("completed", "failed"), timeout=10.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while True:
+        job = await queue.get(job_id)
+        if job["status"] in statuses:
+            return job
+        assert asyncio.get_running_loop().time() < deadline, f"job stuck in {job['status']}"
+        await asyncio.sleep(0.02)
+
+
+class TestJobQueue:
+    """Jobs run once, retry with backoff and survive their worker"""
+
+    def test_job_runs_and_records_progress_and_result(self, database):
+        queue = JobQueue(workers=1, poll_seconds=0.05)
+
+        @queue.handler("sum")
+        async def add(job):
+            await job.progress(done=1)
+            return {"sum": sum(job.params["values"])}
+
+        async def scenario(db):
+            job = await queue.enqueue("sum", {"values": [1, 2, 3]}, created_by="user-1")
+            return await wait_for(queue, job["id"])
+
+        job = run_with_queues(database, scenario, queue)
+        assert (job["status"], job["result"], job["progress"], job["attempts"]) == ("completed", {"sum": 6}, {"done": 1}, 1)
+        assert "lease_token" not in job
+
+    def test_failures_are_retried_then_marked_failed(self, database):
+        queue = JobQueue(workers=1, poll_seconds=0.05, backoff_seconds=0.05, max_attempts=3)
+        attempts = []
+
+        @queue.handler("flaky")
+        async def flaky(job):
+            attempts.append(job.attempt)
+            if job.params["succeed_on"] != job.attempt:
+                raise RuntimeError("not yet")
+            return "ok"
+
+        async def scenario(db):
+            recovers = await queue.enqueue("flaky", {"succeed_on": 2})
+            never = await queue.enqueue("flaky", {"succeed_on": 0})
+            return await wait_for(queue, recovers["id"]), await wait_for(queue, never["id"])
+
+        recovered, failed = run_with_queues(database, scenario, queue)
+        assert (recovered["status"], recovered["attempts"], recovered.get("error")) == ("completed", 2, None)
+        assert (failed["status"], failed["attempts"], failed["error"]) == ("failed", 3, "RuntimeError: not yet")
+
+    def test_keyed_job_is_enqueued_once(self, database):
+        queue = JobQueue(workers=0)
+
+        @queue.handler("nightly")
+        async def nightly(job):
+            return None
+
+        async def scenario(db):
+            first = await queue.enqueue("nightly", key="nightly:2026-01-01")
+            second = await queue.enqueue("nightly", key="nightly:2026-01-01")
+            return first["id"], second["id"], await db.jobs.count_documents({})
+
+        first, second, count = run_with_queues(database, scenario, queue)
+        assert first == second and count == 1
+
+    def test_expired_lease_is_taken_over(self, database):
+        queue = JobQueue(workers=1, poll_seconds=0.05)
+
+        @queue.handler("resume")
+        async def resume(job):
+            return job.attempt
+
+        async def scenario(db):
+            now = datetime.now(timezone.utc)
+            # A worker claimed this job and died before finishing it
+            await db.jobs.insert_one({
+                "id": "orphan", "type": "resume", "params": {}, "status": "running", "attempts": 1, "max_attempts": 5,
+                "run_at": now - timedelta(minutes=5), "lease_until": now - timedelta(seconds=1),
+                "lease_token": "dead-worker", "progress": {}, "created_at": now,
+            })
+            return await wait_for(queue, "orphan")
+
+        job = run_with_queues(database, scenario, queue)
+        assert (job["status"], job["result"]) == ("completed", 2)
+
+    def test_each_job_runs_once_across_processes(self, database):
+        queues = [JobQueue(workers=3, poll_seconds=0.05) for _ in range(2)]
+        runs = []
+
+        for queue in queues:
+            @queue.handler("count")
+            async def count(job, worker=queue.worker_id):
+                runs.append((job.params["n"], worker))
+                await asyncio.sleep(0.01)
+
+        async def scenario(db):
+            jobs = [await queues[n % 2].enqueue("count", {"n": n}) for n in range(30)]
+            for job in jobs:
+                await wait_for(queues[0], job["id"])
+
+        run_with_queues(database, scenario, *queues)
+        assert sorted(n for n, _ in runs) == list(range(30))
+
+    def test_shutdown_hands_running_job_back(self, database):
+        queue = JobQueue(workers=1, poll_seconds=0.05)
+
+        @queue.handler("slow")
+        async def slow(job):
+            await job.progress(started=True)
+            await asyncio.sleep(60)
+
+        async def scenario(db):
+            job = await queue.enqueue("slow")
+            await wait_for(queue, job["id"], statuses=("running",))
+            await queue.stop()
+            return await queue.get(job["id"])
+
+        job = run_with_queues(database, scenario, queue)
+        assert (job["status"], job["attempts"]) == ("queued", 0)
@@ -0,0 +1,80 @@
+"""
+Metrics registry, route instrumentation and command listener tests (no server required)
+"""
+from types import SimpleNamespace
+
+from fastapi import APIRouter, FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from metrics import Registry, instrumented_route_class
+from mongo_monitoring import CommandMonitor
+
+
+class TestRegistry:
+    """Text exposition output"""
+
+    def test_histogram_buckets_are_cumulative(self):
+        registry = Registry()
+        histogram = registry.histogram("latency_seconds", "Latency.", ["route"], buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.5, 5.0):
+            histogram.observe("/a", value=value)
+        lines = registry.render().splitlines()
+        assert "# TYPE latency_seconds histogram" in lines
+        assert 'latency_seconds_bucket{route="/a",le="0.1"} 1' in lines
+        assert 'latency_seconds_bucket{route="/a",le="1"} 3' in lines
+        assert 'latency_seconds_bucket{route="/a",le="+Inf"} 4' in lines
+        assert 'latency_seconds_count{route="/a"} 4' in lines
+        assert 'latency_seconds_sum{route="/a"} 6.05' in lines
+
+    def test_label_values_are_escaped(self):
+        registry = Registry()
+        registry.counter("things_total", "Things.", ["name"]).inc('say "hi"\n')
+        assert 'things_total{name="say \\"hi\\"\\n"} 1' in registry.render()
+
+
+class TestInstrumentedRoute:
+    """Per-route counts use the route template and the final status"""
+
+    def test_counts_by_template_and_status(self):
+        registry = Registry()
+        router = APIRouter(prefix="/api", route_class=instrumented_route_class(registry))
+
+        @router.get("/items/{item_id}")
+        async def get_item(item_id: int):
+            if item_id == 0:
+                raise HTTPException(status_code=404, detail="Not found")
+            return {"id": item_id}
+
+        app = FastAPI()
+        app.include_router(router)
+        client = TestClient(app)
+        client.get("/api/items/1")
+        client.get("/api/items/2")
+        client.get("/api/items/0")
+        client.get("/api/items/abc")
+        output = registry.render()
+        assert 'http_requests_total{method="GET",route="/api/items/{item_id}",status="200"} 2' in output
+        assert 'http_requests_total{method="GET",route="/api/items/{item_id}",status="404"} 1' in output
+        assert 'http_requests_total{method="GET",route="/api/items/{item_id}",status="422"} 1' in output
+        assert 'http_requests_in_flight{method="GET",route="/api/items/{item_id}"} 0' in output
+
+
+class TestCommandMonitor:
+    """Command events are attributed to their collection"""
+
+    def test_find_and_get_more(self):
+        registry = Registry()
+        monitor = CommandMonitor(registry)
+        monitor.started(SimpleNamespace(command_name="find", command={"find": "plants"}, connection_id=("h", 1), request_id=1))
+        monitor.succeeded(SimpleNamespace(
+            command_name="find", connection_id=("h", 1), request_id=1, duration_micros=1500,
+            reply={"cursor": {"firstBatch": [{}, {}, {}]}}
+        ))
+        monitor.started(SimpleNamespace(
+            command_name="getMore", command={"getMore": 42, "collection": "plants"}, connection_id=("h", 1), request_id=2
+        ))
+        monitor.failed(SimpleNamespace(command_name="getMore", connection_id=("h", 1), request_id=2, duration_micros=200))
+        output = registry.render()
+        assert 'mongodb_command_documents_total{collection="plants",command="find"} 3' in output
+        assert 'mongodb_command_duration_seconds_count{collection="plants",command="find"} 1' in output
+        assert 'mongodb_command_failures_total{collection="plants",command="getMore"} 1' in output
@@ -0,0 +1,56 @@
+"""
+Connection pool listener tests (no server required)
+"""
+import threading
+import time
+
+from pymongo import MongoClient
+
+from mongo_monitoring import PoolMonitor, percentile
+
+
+class TestPoolMonitor:
+    """Checkout waits and connection counters"""
+
+    def test_registers_with_driver(self):
+        monitor = PoolMonitor()
+        client = MongoClient("mongodb://localhost:1", event_listeners=[monitor], connect=False)
+        client.close()
+
+    def test_checkout_wait_is_measured_per_thread(self):
+        monitor = PoolMonitor()
+
+        def checkout(delay):
+            monitor.connection_check_out_started(None)
+            time.sleep(delay)
+            monitor.connection_checked_out(None)
+
+        threads = [threading.Thread(target=checkout, args=(delay,)) for delay in (0.0, 0.05)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stats = monitor.stats()
+        assert stats["checked_out"] == 2
+        assert stats["checkout_wait_ms"]["samples"] == 2
+        assert 40 <= stats["checkout_wait_ms"]["max"] < 1000
+
+        monitor.connection_checked_in(None)
+        monitor.connection_check_out_started(None)
+        monitor.connection_check_out_failed(None)
+        stats = monitor.stats()
+        assert stats["checked_out"] == 1
+        assert stats["checkout_failures"] == 1
+        assert stats["checkout_wait_ms"]["samples"] == 3
+
+    def test_window_drops_old_samples(self):
+        monitor = PoolMonitor(window_seconds=0.01)
+        monitor.connection_check_out_started(None)
+        monitor.connection_checked_out(None)
+        time.sleep(0.02)
+        assert monitor.stats()["checkout_wait_ms"]["samples"] == 0
+
+    def test_percentile(self):
+        assert percentile([], 95) == 0.0
+        assert percentile([5, 1, 3], 50) == 3
+        assert percentile(list(range(101)), 95) == 95
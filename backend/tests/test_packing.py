@@ -0,0 +1,78 @@
+"""
+Carton packing tests (no server required)
+"""
+import random
+from collections import Counter
+
+import pytest
+
+from packing import DEFAULT_UNIT, FREIGHT_RULES, PackItem, pack, unit_dimensions
+
+AIR = FREIGHT_RULES["air"]
+
+
+def item(line, quantity, dims=(10, 10, 10), weight=0.5):
+    return PackItem(line, f"Plant {line}", quantity, *dims, weight)
+
+
+class TestPacking:
+    """Packing plans respect carton limits and account for every unit"""
+
+    def test_random_shipment_respects_limits(self):
+        rnd = random.Random(3)
+        items = [
+            item(i, rnd.randint(1, 80), (rnd.uniform(5, 30), rnd.uniform(5, 30), rnd.uniform(5, 38)), rnd.uniform(0.1, 5))
+            for i in range(200)
+        ]
+        plan = pack(items, AIR)
+        carton = AIR.carton
+        packed = Counter()
+        for box in plan["cartons"]:
+            volume = sum(items[c["line"]].volume * c["quantity"] for c in box["contents"])
+            assert volume <= carton.volume * 0.85 + 1e-6
+            assert box["gross_weight"] <= carton.max_weight + 0.01
+            for c in box["contents"]:
+                packed[c["line"]] += c["quantity"]
+        assert packed == {i.line: i.quantity for i in items}
+        assert plan["total_boxes"] == len(plan["cartons"])
+
+    def test_weight_limited_cartons(self):
+        # 20 x 5 kg fits by volume in one carton but only 4 per carton by weight
+        plan = pack([item(0, 20, weight=5)], AIR)
+        assert plan["total_boxes"] == 5
+        assert all(box["contents"][0]["quantity"] == 4 for box in plan["cartons"])
+
+    def test_small_lines_fill_gaps(self):
+        big = item(0, 3, dims=(38, 38, 30))
+        small = item(1, 10, dims=(5, 5, 5))
+        plan = pack([small, big], AIR)
+        assert plan["total_boxes"] == 3
+        assert [c["line"] for c in plan["cartons"][0]["contents"]] == [0, 1]
+
+    def test_oversize_units_ship_individually(self):
+        plan = pack([item(0, 2, dims=(45, 45, 100), weight=12), item(1, 1)], AIR)
+        assert plan["oversize_lines"] == [0]
+        oversize = [box for box in plan["cartons"] if box["carton"] == "oversize"]
+        assert len(oversize) == 2
+        assert plan["chargeable_weight"] >= plan["total_weight"]
+
+
+class TestUnitDimensions:
+    """Line values win over the plant's, missing ones are defaulted, bad ones refused"""
+
+    def test_line_then_plant_then_default(self):
+        dims, estimated = unit_dimensions({"length_cm": "30"}, {"length_cm": 12, "width_cm": 8, "weight_kg": 0})
+        assert dims == {"length_cm": 30.0, "width_cm": 8.0, "height_cm": DEFAULT_UNIT["height_cm"],
+                        "weight_kg": DEFAULT_UNIT["weight_kg"]}
+        assert estimated
+
+    def test_fully_measured_line_is_not_estimated(self):
+        _, estimated = unit_dimensions({}, {"length_cm": 10, "width_cm": 10, "height_cm": 10, "weight_kg": 1})
+        assert not estimated
+
+    @pytest.mark.parametrize("bad", ["abc", -5, "inf", float("nan"), 10 ** 400, [1]])
+    def test_unusable_values_are_refused(self, bad):
+        with pytest.raises(ValueError, match="height_cm"):
+            unit_dimensions({"height_cm": bad}, {})
+        with pytest.raises(ValueError, match="height_cm"):
+            unit_dimensions({}, {"height_cm": bad})
@@ -0,0 +1,60 @@
+"""
+RFQ auto-quote pricing tests (no server required)
+"""
+import pytest
+
+from pricing import InvalidLine, PriceCatalog, QuoteRules, parse_tiers, quote
+
+RULES = QuoteRules(tiers=parse_tiers("50:0.05,200:0.10"), min_margin=0.2, cost_markup=0.5)
+
+CATALOG = PriceCatalog([
+    {"id": "p1", "name": "Areca Palm", "price": 100, "cost": 60, "quantity": 500, "reserved": 100},
+    {"id": "p2", "name": "Ficus", "price": 20, "cost": 18, "quantity": 1000, "reserved": 0},
+    {"id": "p3", "name": "Bougainvillea", "price": 0, "cost": 10, "quantity": 5, "reserved": 0},
+])
+
+
+class TestQuote:
+    """Tier discounts, margin floors and stock checks"""
+
+    def test_tier_discounts(self):
+        result = quote([
+            {"plant_id": "p1", "quantity": 10},
+            {"name": "areca  palm", "quantity": 50},
+            {"name": "Areca Palm", "quantity": 250},
+        ], CATALOG, RULES)
+        assert [line["discount"] for line in result["lines"]] == [0.0, 0.05, 0.10]
+        assert [line["unit_price"] for line in result["lines"]] == [100.0, 95.0, 90.0]
+        assert result["subtotal"] == 1000 + 4750 + 22500
+
+    def test_margin_floor_and_cost_plus(self):
+        result = quote([{"name": "Ficus", "quantity": 300}, {"name": "Bougainvillea", "quantity": 2}], CATALOG, RULES)
+        ficus, bougainvillea = result["lines"]
+        # 10% off would be 18.00, below cost + 20% = 21.60, which itself exceeds list
+        assert ficus["unit_price"] == 20.0
+        assert bougainvillea["list_price"] == 15.0
+        assert bougainvillea["unit_price"] == 15.0
+
+    def test_stock_checked_against_combined_demand(self):
+        result = quote([
+            {"plant_id": "p1", "quantity": 300},
+            {"plant_id": "p1", "quantity": 150},
+            {"name": "Unknown Fern", "quantity": 5},
+        ], CATALOG, RULES)
+        first, second, unknown = result["lines"]
+        assert first["available"] == 400
+        assert not first["in_stock"] and first["shortfall"] == 50
+        assert not unknown["matched"]
+        assert result["unmatched_lines"] == [2]
+        assert result["out_of_stock_lines"] == [0, 1]
+        assert not result["all_in_stock"]
+
+    def test_lines_without_a_quantity_request_none(self):
+        result = quote([{"plant_id": "p1"}, {"plant_id": "p2", "quantity": None}, {"plant_id": "p2", "quantity": "3"}], CATALOG, RULES)
+        assert [line["quantity"] for line in result["lines"]] == [0, 0, 3]
+        assert result["unmatched_lines"] == [0, 1]
+
+    @pytest.mark.parametrize("bad", ["inf", "-inf", "nan", "1e30", 10 ** 400, -1, "a dozen", [5]])
+    def test_unusable_quantity_names_the_line(self, bad):
+        with pytest.raises(InvalidLine, match="line 1"):
+            quote([{"plant_id": "p1", "quantity": 5}, {"plant_id": "p2", "quantity": bad}], CATALOG, RULES)
@@ -0,0 +1,96 @@
+"""
+Per-request profiling tests (no server required)
+"""
+import asyncio
+from types import SimpleNamespace
+
+from fastapi import APIRouter, FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from metrics import Registry, instrumented_route_class
+from profiling import ProfileCommandListener, RequestProfiler, profiled_route_class, render_session
+
+listener = ProfileCommandListener()
+
+
+def make_client(sample_rate: float = 0.0):
+    profiler = RequestProfiler(sample_rate=sample_rate)
+    saved = []
+
+    @profiler.authorizer
+    async def is_admin(request):
+        return request.headers.get("authorization") == "Bearer admin"
+
+    @profiler.sink
+    async def save(profile):
+        saved.append(profile)
+
+    router = APIRouter(prefix="/api", route_class=profiled_route_class(instrumented_route_class(Registry()), profiler))
+
+    @router.get("/items/{item_id}")
+    async def get_item(item_id: int):
+        if item_id == 0:
+            raise HTTPException(status_code=404, detail="Not found")
+        # Stands in for a Mongo round trip on the driver's executor thread
+        event = {"connection_id": ("h", 1), "request_id": item_id}
+        listener.started(SimpleNamespace(command_name="find", command={"find": "plants"}, **event))
+        await asyncio.sleep(0.01)
+        listener.succeeded(SimpleNamespace(command_name="find", duration_micros=10000, **event))
+        return {"id": item_id, "rows": [{"n": n} for n in range(1000)]}
+
+    app = FastAPI()
+    app.include_router(router)
+    return TestClient(app), saved
+
+
+class TestRequestProfiling:
+    """Profiles are produced only when asked for or sampled"""
+
+    def test_admin_header_returns_server_timing(self):
+        client, saved = make_client()
+        response = client.get("/api/items/1", headers={"X-Profile": "1", "Authorization": "Bearer admin"})
+        assert response.status_code == 200
+        timing = response.headers["Server-Timing"]
+        for name in ("total;dur=", "deps;dur=", "endpoint;dur=", "db;dur=10.0;desc=\"1 commands\"", "serialize;dur="):
+            assert name in timing
+        [profile] = saved
+        assert response.headers["X-Profile-Id"] == profile["id"]
+        assert profile["route"] == "/api/items/{item_id}" and profile["status"] == 200 and profile["requested"]
+        assert profile["mongo_commands"] == [{"command": "find", "collection": "plants", "duration_ms": 10.0, "failed": False}]
+        timings = profile["timings_ms"]
+        assert timings["endpoint"] >= 10
+        assert timings["total"] >= timings["dependencies"] + timings["endpoint"] + timings["serialize"] - 0.01
+
+    def test_call_tree_renders(self):
+        client, saved = make_client()
+        client.get("/api/items/1", headers={"X-Profile": "1", "Authorization": "Bearer admin"})
+        text = render_session(saved[0]["session"], "text")
+        assert "get_item" in text
+        assert "<html" in render_session(saved[0]["session"], "html").lower()
+
+    def test_header_ignored_for_non_admins(self):
+        client, saved = make_client()
+        response = client.get("/api/items/1", headers={"X-Profile": "1", "Authorization": "Bearer someone"})
+        assert response.status_code == 200
+        assert "Server-Timing" not in response.headers
+        assert saved == []
+
+    def test_no_profile_without_header(self):
+        client, saved = make_client()
+        response = client.get("/api/items/1", headers={"Authorization": "Bearer admin"})
+        assert "Server-Timing" not in response.headers
+        assert saved == []
+
+    def test_sampled_requests_are_stored_silently(self):
+        client, saved = make_client(sample_rate=1.0)
+        response = client.get("/api/items/0")
+        assert response.status_code == 404
+        assert "Server-Timing" not in response.headers
+        [profile] = saved
+        assert profile["status"] == 404 and not profile["requested"]
+        assert "endpoint" in profile["timings_ms"] and "serialize" not in profile["timings_ms"]
+
+    def test_commands_outside_a_profile_are_ignored(self):
+        event = {"connection_id": ("h", 1), "request_id": 1}
+        listener.started(SimpleNamespace(command_name="find", command={"find": "plants"}, **event))
+        listener.succeeded(SimpleNamespace(command_name="find", duration_micros=5, **event))
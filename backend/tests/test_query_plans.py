@@ -0,0 +1,635 @@
+"""
+Query-plan regression suite (needs a local MongoDB)
+
+Seeds a throwaway database, sends a representative request to every route on
+`api_router`, captures the commands each one issues through command monitoring
+and explains them. A route fails when a filtered query runs a collection scan,
+or when a query examines far more documents than it returns.
+
+    QUERY_PLAN_MONGO_URL=mongodb://localhost:27017 pytest tests/test_query_plans.py
+
+Without a reachable server only the route coverage check runs. The production
+completion route needs transactions, so it is only exercised against a replica set.
+"""
+import copy
+import os
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+import pytest
+from pymongo import MongoClient, monitoring
+from pymongo.errors import PyMongoError
+
+MONGO_URL = os.environ.get("QUERY_PLAN_MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("MONGO_URL", MONGO_URL)
+os.environ.setdefault("DB_NAME", "query_plans")
+
+import server  # noqa: E402
+
+# A query may examine this many documents per document it returns, plus the slack
+MAX_EXAMINED_RATIO = 10
+EXAMINED_SLACK = 20
+
+EXPLAINED_COMMANDS = {"find", "aggregate", "count", "distinct", "findAndModify", "update", "delete"}
+SESSION_FIELDS = {
+    "lsid", "$db", "$clusterTime", "$readPreference", "txnNumber", "autocommit", "startTransaction",
+    "readConcern", "writeConcern",
+}
+
+# Scans a route accepts on purpose: (method, route, collection or None for any, operator) -> reason
+ALLOWED_SCANS = {
+    ("GET", "/api/admin/dashboard", "plants", "$expr"):
+        "low-stock count compares two fields of every plant, which no index can answer",
+    ("GET", "/api/inventory", "plants", "$regex"):
+        "substring search over three fields; unanchored case-insensitive regexes cannot use an index",
+    ("POST", "/api/admin/migrations/datetime/run", None, "$type"):
+        "one-off migration pass that walks each collection in _id order",
+}
+
+PASSWORD = "query-plan-pass"
+NOW = server.utc_now()
+CATEGORIES = ["indoor", "outdoor", "succulent", "flowering", "herb", "tree", "shrub", "bonsai"]
+LOCATIONS = ["main", "greenhouse-a", "greenhouse-b", "nursery"]
+GROWTH_STAGES = ["seedling", "juvenile", "mature", "flowering"]
+CREW_IDS = [f"crew-{i}" for i in range(6)]
+PARTNER_IDS = [f"partner-{i}" for i in range(4)]
+CUSTOMER_IDS = [f"customer-{i}" for i in range(40)]
+
+
+def days_ago(days: float):
+    return NOW - timedelta(days=days)
+
+
+# ============= SEED DATA =============
+
+def seed(db, password_hash: str):
+    """Realistic volumes for every collection the routes read; ids are fixed so requests can name them."""
+    users = [
+        {"id": "user-admin", "email": "admin@plans.example.com", "full_name": "Admin", "role": "admin", "status": "active"},
+        {"id": "user-manager", "email": "manager@plans.example.com", "full_name": "Manager", "role": "manager", "status": "active"},
+        {"id": "user-delete", "email": "leaver@plans.example.com", "full_name": "Leaver", "role": "customer", "status": "active"},
+    ]
+    users += [
+        {"id": crew_id, "email": f"{crew_id}@plans.example.com", "full_name": f"Crew {i}", "role": "crew",
+         "status": "active", "hourly_rate": 20 + i}
+        for i, crew_id in enumerate(CREW_IDS)
+    ]
+    users += [
+        {"id": partner_id, "email": f"{partner_id}@plans.example.com", "full_name": f"Partner {i}", "role": "partner",
+         "status": "active", "commission_rate": 10}
+        for i, partner_id in enumerate(PARTNER_IDS)
+    ]
+    users += [
+        {"id": f"vendor-{i}", "email": f"vendor-{i}@plans.example.com", "full_name": f"Vendor {i}", "role": "vendor", "status": "active"}
+        for i in range(3)
+    ]
+    users += [
+        {"id": customer_id, "email": f"{customer_id}@plans.example.com", "full_name": f"Customer {i}", "role": "customer",
+         "status": "active"}
+        for i, customer_id in enumerate(CUSTOMER_IDS)
+    ]
+    users += [
+        {"id": f"pending-{i}", "email": f"pending-{i}@plans.example.com", "full_name": f"Applicant {i}",
+         "role": ["partner", "vendor", "crew"][i % 3], "status": "pending"}
+        for i in range(10)
+    ]
+    for i, user in enumerate(users):
+        user.update(password=password_hash, created_at=days_ago(400 - i))
+    db.users.insert_many(users)
+
+    plants = [
+        {
+            "id": f"plant-{i}", "sku": f"GA-PLT-{i:05d}", "batch_number": f"B-{i:05d}", "name": f"Plant {i}",
+            "scientific_name": f"Planta {i}", "category": CATEGORIES[i % len(CATEGORIES)],
+            "growth_stage": GROWTH_STAGES[i % len(GROWTH_STAGES)], "location": LOCATIONS[i % len(LOCATIONS)],
+            "price": 5 + i % 50, "cost": 2 + i % 20, "quantity": 0 if i % 15 == 0 else 20 + i % 400,
+            "reserved": 0, "min_stock": 10, "length_cm": 15, "width_cm": 15, "height_cm": 25, "weight_kg": 0.8,
+            "created_at": days_ago(300 - i % 300), "updated_at": days_ago(i % 30),
+            **({"is_featured": True} if i % 25 == 0 else {}),
+        }
+        for i in range(300)
+    ]
+    plants.append({**plants[1], "id": "plant-discontinued", "name": "Discontinued", "sku": "GA-PLT-OLD"})
+    db.plants.insert_many(plants)
+
+    projects, tasks, logs = [], [], []
+    for p in range(40):
+        project_id = f"project-{p}"
+        projects.append({
+            "id": project_id, "project_number": f"PRJ-{p:04d}", "name": f"Garden {p}", "client_name": f"Client {p}",
+            "project_type": ["landscaping", "maintenance", "installation"][p % 3], "site_address": f"{p} Park Lane",
+            "start_date": days_ago(120 - p), "end_date": days_ago(60 - p), "budget": 10000,
+            "status": ["planning", "in_progress", "completed"][p % 3], "progress": 0, "actual_cost": 0,
+            "labour_hours": 0, "budget_variance": 10000 - p * 400, "tasks_total": 8, "tasks_completed": 0,
+            "created_at": days_ago(130 - p),
+        })
+        for t in range(8):
+            tasks.append({
+                "id": f"task-{p}-{t}", "project_id": project_id, "title": f"Task {t}",
+                "assigned_to": CREW_IDS[(p + t) % len(CREW_IDS)], "start_date": days_ago(40 - t), "end_date": days_ago(38 - t),
+                "priority": "medium", "status": "completed" if t < 3 else "pending",
+                "created_at": days_ago(50 - t), "updated_at": days_ago(10 - t),
+            })
+    for c, crew_id in enumerate(CREW_IDS):
+        for n in range(30):
+            logs.append({
+                "id": f"log-{c}-{n}", "project_id": f"project-{(c + n) % 40}", "crew_member_id": crew_id,
+                "date": days_ago(n), "hours_worked": 6, "tasks_completed": "Planting", "hourly_rate": 20,
+                "labour_cost": 120, "created_at": days_ago(n), "updated_at": days_ago(n),
+            })
+    db.projects.insert_many(projects)
+    db.project_tasks.insert_many(tasks)
+    db.crew_logs.insert_many(logs)
+
+    subscriptions, visits, invoices = [], [], []
+    for s in range(30):
+        sub_id = f"amc-{s}"
+        subscriptions.append({
+            "id": sub_id, "contract_number": f"AMC-{s:04d}", "client_name": f"Estate {s}",
+            "client_email": f"estate-{s}@plans.example.com", "service_type": "garden care",
+            "frequency": ["monthly", "quarterly", "yearly"][s % 3], "amount": 500 + s * 10,
+            "start_date": days_ago(200 - s), "next_billing_date": days_ago(-10 - s), "property_address": f"{s} Estate Road",
+            "status": "cancelled" if s % 10 == 9 else "active", "total_visits": 0, "created_at": days_ago(210 - s),
+        })
+        for v in range(6):
+            visits.append({
+                "id": f"visit-{s}-{v}", "subscription_id": sub_id, "scheduled_date": days_ago(150 - v * 30 - s),
+                "crew_assigned": CREW_IDS[(s + v) % len(CREW_IDS)], "status": "completed" if v < 4 else "scheduled",
+                "created_at": days_ago(160 - v * 30), "updated_at": days_ago(100 - v * 15),
+            })
+        for n in range(3):
+            invoices.append({
+                "id": f"invoice-{s}-{n}", "invoice_number": f"INV-{s:04d}-{n}", "subscription_id": sub_id,
+                "client_name": f"Estate {s}", "client_email": f"estate-{s}@plans.example.com", "amount": 500,
+                "service_type": "garden care", "status": "paid" if n < 2 else "pending",
+                "due_date": days_ago(90 - n * 30), "created_at": days_ago(105 - n * 30),
+            })
+    db.amc_subscriptions.insert_many(subscriptions)
+    db.amc_visits.insert_many(visits)
+    db.invoices.insert_many(invoices)
+
+    db.partner_deals.insert_many([
+        {
+            "id": f"deal-{p}-{n}", "partner_id": partner_id, "partner_name": f"Partner {p}", "client_name": f"Lead {n}",
+            "deal_value": 1000 + n * 100, "commission_rate": 10, "commission": 100 + n * 10,
+            "status": ["pending", "approved", "paid"][n % 3], "locked": True, "created_at": days_ago(90 - n),
+        }
+        for p, partner_id in enumerate(PARTNER_IDS) for n in range(10)
+    ])
+
+    db.orders.insert_many([
+        {
+            "id": f"order-{n}", "order_number": f"GA-{n:05d}", "user_id": CUSTOMER_IDS[n % len(CUSTOMER_IDS)],
+            **({"vendor_id": f"vendor-{n % 3}"} if n % 5 == 0 else {}),
+            "customer_name": f"Customer {n % 40}", "customer_email": f"customer-{n % 40}@plans.example.com",
+            "customer_phone": "555-0100", "customer_address": "1 High Street",
+            "items": [{"plant_id": f"plant-{n % 300}", "name": f"Plant {n % 300}", "quantity": 2, "price": 10}],
+            "subtotal": 20, "total": 20, "order_type": ["retail", "wholesale", "export"][n % 3],
+            "status": ["pending", "processing", "shipped", "completed", "cancelled"][n % 5], "created_at": days_ago(n),
+        }
+        for n in range(400)
+    ])
+
+    db.rfqs.insert_many([
+        {
+            "id": f"rfq-{n}", "rfq_number": f"RFQ-{n:04d}", "company_name": f"Builder {n}", "contact_name": "Buyer",
+            "email": f"buyer-{n}@plans.example.com",
+            "items": [{"name": f"Plant {(n + k) % 300}", "quantity": 50 + k * 100} for k in range(5)],
+            "delivery_date": days_ago(-30), "delivery_address": "Site 1",
+            "status": ["pending", "quoted", "accepted"][n % 3], "created_at": days_ago(n * 2),
+        }
+        for n in range(60)
+    ])
+
+    db.export_docs.insert_many([
+        {
+            "id": f"export-{n}", "doc_number": f"EXP-{n:04d}", "doc_type": "packing_list", "customer_name": f"Importer {n}",
+            "destination_country": "NL", "items": [{"plant_id": f"plant-{n}", "name": f"Plant {n}", "quantity": 40}],
+            "total_weight": 32, "total_boxes": 2, "shipping_method": "air",
+            "status": ["draft", "issued", "shipped"][n % 3], "created_by": "user-admin", "created_at": days_ago(n * 3),
+        }
+        for n in range(40)
+    ])
+
+    db.productions.insert_many([
+        {
+            "id": f"prod-{n}", "batch_number": f"PROD-{n:04d}", "product_type": "terrarium", "name": f"Terrarium {n % 4}",
+            "components": [{"plant_id": f"plant-{n + 1}", "name": f"Plant {n + 1}", "quantity": 1}, {"name": "Glass jar", "quantity": 1}],
+            "quantity": 5, "cost_per_unit": 12, "sell_price": 30,
+            "status": "completed" if n >= 10 else "in_progress", "created_at": days_ago(n * 5),
+        }
+        for n in range(20)
+    ])
+
+    db.inquiries.insert_many([
+        {
+            "id": f"inquiry-{n}", "name": f"Visitor {n}", "email": f"visitor-{n}@plans.example.com", "inquiry_type": "general",
+            "message": "Do you deliver?", "status": ["new", "contacted", "closed"][n % 3], "created_at": days_ago(n),
+        }
+        for n in range(80)
+    ])
+
+    db.request_profiles.insert_many([
+        {
+            "id": f"profile-{n}", "method": "GET", "route": "/api/admin/dashboard", "status": 200, "requested": True,
+            "timings_ms": {"total": 40 + n}, "mongo_commands": [], "session": {}, "created_at": days_ago(n / 24),
+        }
+        for n in range(50)
+    ])
+
+    db.jobs.insert_many([
+        {
+            "id": f"job-{n}", "type": "archive", "params": {}, "status": "completed", "attempts": 1, "max_attempts": 5,
+            "run_at": days_ago(n), "progress": {}, "result": {"moved": {}}, "created_by": "user-admin", "created_at": days_ago(n),
+        }
+        for n in range(20)
+    ])
+
+
+# ============= REPRESENTATIVE REQUESTS =============
+
+def req(role, url, **kwargs):
+    return role, url, kwargs
+
+
+def crew_log(project_id="project-0", crew_id="crew-0", **extra):
+    return {"project_id": project_id, "crew_member_id": crew_id, "date": NOW.isoformat(), "hours_worked": 4,
+            "tasks_completed": "Mulching", **extra}
+
+
+ORDER = {
+    "customer_name": "Walk In", "customer_email": "walkin@plans.example.com", "customer_phone": "555-0199",
+    "customer_address": "2 High Street", "items": [{"plant_id": "plant-3", "quantity": 1, "price": 8}],
+    "subtotal": 8, "total": 8,
+}
+SINCE = server.encode_sync_token({stream: (days_ago(7), "") for stream in server.SYNC_STREAMS})
+WEEK = {"start": days_ago(7).isoformat(), "end": NOW.isoformat()}
+
+# (method, route) -> [(role, url, request kwargs)], sent in this order; a None role sends no token
+REQUESTS = {
+    ("POST", "/api/auth/register"): [req(None, "/api/auth/register", json={
+        "email": "new@plans.example.com", "password": PASSWORD, "full_name": "Newcomer", "role": "vendor"})],
+    ("POST", "/api/auth/login"): [req(None, "/api/auth/login", json={"email": "admin@plans.example.com", "password": PASSWORD})],
+    ("GET", "/api/auth/me"): [req("customer", "/api/auth/me")],
+    ("PUT", "/api/auth/profile"): [req("customer", "/api/auth/profile", json={"phone": "555-0123"})],
+    ("PUT", "/api/auth/change-password"): [req("customer", "/api/auth/change-password", params={
+        "old_password": PASSWORD, "new_password": PASSWORD})],
+    ("GET", "/api/admin/users"): [
+        req("admin", "/api/admin/users"),
+        req("admin", "/api/admin/users", params={"role": "crew"}),
+        req("admin", "/api/admin/users", params={"status": "pending"}),
+        req("admin", "/api/admin/users", params={"role": "partner", "status": "active"}),
+    ],
+    ("GET", "/api/admin/users/pending"): [req("admin", "/api/admin/users/pending")],
+    ("PUT", "/api/admin/users/{user_id}"): [req("admin", "/api/admin/users/crew-5", json={"hourly_rate": 28})],
+    ("POST", "/api/admin/users/{user_id}/approve"): [req("admin", "/api/admin/users/pending-0/approve")],
+    ("POST", "/api/admin/users/{user_id}/reject"): [req("admin", "/api/admin/users/pending-1/reject")],
+    ("POST", "/api/admin/users/{user_id}/suspend"): [req("admin", "/api/admin/users/customer-39/suspend")],
+    ("DELETE", "/api/admin/users/{user_id}"): [req("admin", "/api/admin/users/user-delete")],
+    ("GET", "/api/admin/dashboard"): [req("manager", "/api/admin/dashboard")],
+    ("GET", "/api/inventory"): [
+        req("manager", "/api/inventory"),
+        req("manager", "/api/inventory", params={"category": "bonsai"}),
+        req("manager", "/api/inventory", params={"location": "nursery"}),
+        req("manager", "/api/inventory", params={"growth_stage": "mature", "low_stock": True}),
+        req("manager", "/api/inventory", params={"search": "planta 12"}),
+    ],
+    ("POST", "/api/inventory"): [req("manager", "/api/inventory", json={"name": "Fern", "category": "indoor", "price": 12})],
+    ("GET", "/api/inventory/{plant_id}"): [req("crew", "/api/inventory/plant-7")],
+    ("PUT", "/api/inventory/{plant_id}"): [req("manager", "/api/inventory/plant-7", json={"price": 14})],
+    ("PUT", "/api/inventory/{plant_id}/stock"): [req("crew", "/api/inventory/plant-7/stock", params={
+        "quantity_change": -2, "reason": "Damaged"})],
+    ("DELETE", "/api/inventory/{plant_id}"): [req("admin", "/api/inventory/plant-discontinued")],
+    ("GET", "/api/inventory/categories/list"): [req("manager", "/api/inventory/categories/list")],
+    ("GET", "/api/inventory/locations/list"): [req("manager", "/api/inventory/locations/list")],
+    ("GET", "/api/crew/availability"): [req("manager", "/api/crew/availability", params=WEEK)],
+    ("GET", "/api/crew/conflicts"): [req("manager", "/api/crew/conflicts", params={**WEEK, "crew_id": "crew-1"})],
+    ("GET", "/api/crew/calendar"): [
+        req("manager", "/api/crew/calendar", params=WEEK),
+        req("crew", "/api/crew/calendar", params=WEEK),
+    ],
+    ("GET", "/api/projects"): [
+        req("manager", "/api/projects"),
+        req("manager", "/api/projects", params={"status": "in_progress"}),
+        req("manager", "/api/projects", params={"project_type": "maintenance"}),
+        req("manager", "/api/projects", params={"over_budget": False, "sort_by": "budget_variance"}),
+    ],
+    ("POST", "/api/projects"): [req("manager", "/api/projects", json={
+        "name": "Roof Garden", "client_name": "Tower Ltd", "site_address": "1 Tower Road",
+        "start_date": NOW.isoformat(), "end_date": days_ago(-30).isoformat(), "budget": 8000})],
+    ("GET", "/api/projects/{project_id}"): [req("manager", "/api/projects/project-1")],
+    ("PUT", "/api/projects/{project_id}"): [
+        req("manager", "/api/projects/project-1", json={"status": "in_progress"}),
+        req("manager", "/api/projects/project-1", json={"budget": 12000}),
+    ],
+    ("POST", "/api/projects/{project_id}/signoff"): [req("manager", "/api/projects/project-2/signoff", params={
+        "signature": "T. Client"})],
+    ("POST", "/api/projects/{project_id}/rollups/rebuild"): [req("admin", "/api/projects/project-1/rollups/rebuild")],
+    ("POST", "/api/projects/tasks"): [req("manager", "/api/projects/tasks", json={
+        "project_id": "project-1", "title": "Edging", "assigned_to": "crew-2",
+        "start_date": NOW.isoformat(), "end_date": days_ago(-2).isoformat()})],
+    ("PUT", "/api/projects/tasks/{task_id}"): [req("crew", "/api/projects/tasks/task-1-5", params={"status": "completed"})],
+    ("POST", "/api/projects/crew-logs"): [req("manager", "/api/projects/crew-logs", json=crew_log())],
+    ("GET", "/api/projects/{project_id}/crew-logs"): [req("manager", "/api/projects/project-1/crew-logs", params={"limit": 5})],
+    ("GET", "/api/projects/{project_id}/tasks"): [req("manager", "/api/projects/project-1/tasks", params={"limit": 5})],
+    ("GET", "/api/amc"): [
+        req("manager", "/api/amc"),
+        req("manager", "/api/amc", params={"status": "active"}),
+    ],
+    ("POST", "/api/amc"): [req("manager", "/api/amc", json={
+        "client_name": "Manor", "client_email": "manor@plans.example.com", "service_type": "lawn care",
+        "amount": 650, "start_date": NOW.isoformat(), "property_address": "Manor Lane"})],
+    ("GET", "/api/amc/{sub_id}"): [req("manager", "/api/amc/amc-3")],
+    ("GET", "/api/amc/{sub_id}/visits"): [req("manager", "/api/amc/amc-3/visits", params={"limit": 2})],
+    ("GET", "/api/amc/{sub_id}/invoices"): [req("manager", "/api/amc/amc-3/invoices", params={"limit": 2})],
+    ("POST", "/api/amc/schedule/generate"): [
+        req("manager", "/api/amc/schedule/generate", params={"horizon_days": 60}),
+        req("manager", "/api/amc/schedule/generate", params={"horizon_days": 60, "background": True}),
+    ],
+    ("POST", "/api/amc/{sub_id}/visit"): [req("manager", "/api/amc/amc-4/visit", json={
+        "subscription_id": "amc-4", "scheduled_date": days_ago(-3).isoformat(), "crew_assigned": "crew-3"})],
+    ("PUT", "/api/amc/visits/{visit_id}/complete"): [req("crew", "/api/amc/visits/visit-4-5/complete")],
+    ("POST", "/api/amc/{sub_id}/invoice"): [req("manager", "/api/amc/amc-4/invoice")],
+    ("GET", "/api/amc/invoices/all"): [
+        req("manager", "/api/amc/invoices/all"),
+        req("manager", "/api/amc/invoices/all", params={"status": "pending"}),
+        req("manager", "/api/amc/invoices/all", params={"due_from": days_ago(40).isoformat(), "due_to": NOW.isoformat()}),
+    ],
+    ("GET", "/api/partners"): [req("manager", "/api/partners")],
+    ("GET", "/api/partners/me"): [req("partner", "/api/partners/me")],
+    ("POST", "/api/partners/deals"): [req("partner", "/api/partners/deals", json={"client_name": "Hotel", "deal_value": 5000})],
+    ("GET", "/api/partners/{partner_id}/deals"): [req("manager", "/api/partners/partner-1/deals")],
+    ("POST", "/api/partners/deals/{deal_id}/approve"): [req("admin", "/api/partners/deals/deal-1-0/approve")],
+    ("POST", "/api/partners/deals/{deal_id}/pay"): [req("admin", "/api/partners/deals/deal-1-1/pay")],
+    ("GET", "/api/orders"): [
+        req("manager", "/api/orders"),
+        req("manager", "/api/orders", params={"status": "pending"}),
+        req("manager", "/api/orders", params={"order_type": "export"}),
+        req("manager", "/api/orders", params={"status": "shipped", "created_from": days_ago(30).isoformat()}),
+    ],
+    ("POST", "/api/orders"): [req("customer", "/api/orders", json=ORDER)],
+    ("POST", "/api/orders/public"): [req(None, "/api/orders/public", json=ORDER)],
+    ("GET", "/api/orders/{order_id}"): [
+        req("manager", "/api/orders/order-12"),
+        req("customer", "/api/orders/order-40"),
+    ],
+    ("PUT", "/api/orders/{order_id}/status"): [req("manager", "/api/orders/order-12/status", params={"status": "processing"})],
+    ("GET", "/api/orders/my/all"): [req("customer", "/api/orders/my/all")],
+    ("GET", "/api/rfq"): [
+        req("manager", "/api/rfq"),
+        req("manager", "/api/rfq", params={"status": "pending"}),
+    ],
+    ("POST", "/api/rfq"): [req(None, "/api/rfq", json={
+        "company_name": "Builder", "contact_name": "Buyer", "email": "buyer@plans.example.com",
+        "items": [{"name": "Plant 4", "quantity": 120}], "delivery_date": days_ago(-20).isoformat(),
+        "delivery_address": "Site 9"})],
+    ("PUT", "/api/rfq/{rfq_id}/quote"): [req("manager", "/api/rfq/rfq-3/quote", params={
+        "quote_amount": 900, "valid_until": days_ago(-14).isoformat()})],
+    ("POST", "/api/rfq/{rfq_id}/auto-quote"): [req("manager", "/api/rfq/rfq-6/auto-quote", params={"apply": True})],
+    ("GET", "/api/exports"): [
+        req("manager", "/api/exports"),
+        req("manager", "/api/exports", params={"status": "draft"}),
+    ],
+    ("POST", "/api/exports"): [req("manager", "/api/exports", json={
+        "doc_type": "packing_list", "customer_name": "Importer", "destination_country": "DE",
+        "items": [{"plant_id": "plant-8", "quantity": 30}, {"name": "Plant 9", "quantity": 12}]})],
+    ("POST", "/api/exports/pack"): [req("manager", "/api/exports/pack", json={
+        "items": [{"plant_id": "plant-10", "quantity": 60}, {"name": "Plant 11", "quantity": 25}], "shipping_method": "sea"})],
+    ("GET", "/api/exports/{doc_id}"): [req("manager", "/api/exports/export-2")],
+    ("PUT", "/api/exports/{doc_id}"): [req("manager", "/api/exports/export-2", json={"notes": "Fragile"})],
+    ("PUT", "/api/exports/{doc_id}/status"): [req("manager", "/api/exports/export-2/status", params={"status": "issued"})],
+    ("GET", "/api/exports/{doc_id}/render"): [req("manager", "/api/exports/export-2/render", params={"format": "html"})],
+    ("GET", "/api/production"): [req("manager", "/api/production")],
+    ("POST", "/api/production"): [req("manager", "/api/production", json={
+        "product_type": "terrarium", "name": "Terrarium 9", "quantity": 4,
+        "components": [{"plant_id": "plant-20", "quantity": 1}]})],
+    ("PUT", "/api/production/{prod_id}/complete"): [req("manager", "/api/production/prod-2/complete", params={
+        "actual_quantity": 5})],
+    ("GET", "/api/products"): [
+        req(None, "/api/products"),
+        req(None, "/api/products", params={"category": "succulent"}),
+        req(None, "/api/products", params={"featured": True}),
+    ],
+    ("GET", "/api/products/{product_id}"): [req(None, "/api/products/plant-21")],
+    ("POST", "/api/inquiries"): [req(None, "/api/inquiries", json={
+        "name": "Visitor", "email": "visitor@plans.example.com", "message": "Wholesale prices?"})],
+    ("GET", "/api/inquiries"): [
+        req("manager", "/api/inquiries"),
+        req("manager", "/api/inquiries", params={"status": "new"}),
+    ],
+    ("PUT", "/api/inquiries/{inquiry_id}/status"): [req("manager", "/api/inquiries/inquiry-3/status", params={
+        "status": "contacted"})],
+    ("GET", "/api/vendor/me"): [req("vendor", "/api/vendor/me")],
+    ("GET", "/api/vendor/orders"): [req("vendor", "/api/vendor/orders")],
+    ("GET", "/api/customer/me"): [req("customer", "/api/customer/me")],
+    ("GET", "/api/crew/me"): [req("crew", "/api/crew/me")],
+    ("GET", "/api/crew/sync"): [
+        req("crew", "/api/crew/sync"),
+        req("crew", "/api/crew/sync", params={"since": SINCE}),
+    ],
+    ("POST", "/api/crew/log"): [req("crew", "/api/crew/log", json=crew_log("project-3"))],
+    ("POST", "/api/crew/logs/batch"): [req("crew", "/api/crew/logs/batch", json={"logs": [
+        crew_log("project-4", client_id="device-1"), crew_log("project-5", client_id="device-2")]})],
+    ("GET", "/api/admin/profiles"): [
+        req("admin", "/api/admin/profiles"),
+        req("admin", "/api/admin/profiles", params={"route": "/api/admin/dashboard", "limit": 10}),
+    ],
+    ("GET", "/api/admin/profiles/{profile_id}"): [req("admin", "/api/admin/profiles/profile-3", params={"format": "json"})],
+    ("GET", "/api/admin/migrations/datetime"): [req("admin", "/api/admin/migrations/datetime")],
+    ("POST", "/api/admin/migrations/datetime/run"): [req("admin", "/api/admin/migrations/datetime/run")],
+    ("GET", "/api/admin/archive"): [req("admin", "/api/admin/archive")],
+    ("POST", "/api/admin/archive/run"): [req("admin", "/api/admin/archive/run")],
+    ("GET", "/api/admin/search"): [
+        req("admin", "/api/admin/search", params={"q": "customer 12"}),
+        req("admin", "/api/admin/search", params={"q": "customer-12@plans.example.com"}),
+        req("manager", "/api/admin/search", params={"q": "estate", "type": "amc"}),
+    ],
+    ("POST", "/api/admin/search/reindex"): [req("admin", "/api/admin/search/reindex")],
+    ("GET", "/api/jobs/{job_id}"): [req("admin", "/api/jobs/job-3")],
+    ("GET", "/api/"): [req(None, "/api/")],
+    ("GET", "/api/health"): [req(None, "/api/health")],
+    ("GET", "/api/ready"): [req(None, "/api/ready")],
+}
+
+# Logged-in identity per role; "customer" and "crew" also own seeded orders, logs and visits
+ROLE_USERS = {
+    "admin": "user-admin", "manager": "user-manager", "crew": "crew-0", "partner": "partner-1",
+    "vendor": "vendor-0", "customer": "customer-0",
+}
+TRANSACTION_ROUTES = {("PUT", "/api/production/{prod_id}/complete")}
+
+
+# ============= CAPTURE AND EXPLAIN =============
+
+class CommandRecorder(monitoring.CommandListener):
+    """Keeps the explainable commands sent to one database while recording is switched on."""
+
+    def __init__(self, database: str):
+        self.database = database
+        self.recording = False
+        self.commands = []
+        self._lock = threading.Lock()
+
+    def take(self) -> list:
+        with self._lock:
+            commands, self.commands = self.commands, []
+        return commands
+
+    def started(self, event):
+        if self.recording and event.database_name == self.database and event.command_name in EXPLAINED_COMMANDS:
+            command = copy.deepcopy(dict(event.command))
+            with self._lock:
+                self.commands.append((event.command_name, command))
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+def wait_for_migration(timeout: float = 30):
+    # The migration route and queued jobs return at once; their queries belong to them, not to the next request
+    deadline = time.monotonic() + timeout
+    while server._migration_task is not None and not server._migration_task.done() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    while server.job_queue.busy and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+
+def statements(name: str, command: dict):
+    """Explainable single statements for a captured command: (filter, sorted, limited, explain body)."""
+    body = {k: v for k, v in command.items() if k not in SESSION_FIELDS}
+    if name in ("update", "delete"):
+        key = "updates" if name == "update" else "deletes"
+        for statement in body.get(key, []):
+            yield statement.get("q") or {}, False, False, {name: body[name], key: [statement]}
+    elif name == "aggregate":
+        pipeline = body.get("pipeline", [])
+        match = pipeline[0].get("$match", {}) if pipeline else {}
+        stages = {stage_name for stage in pipeline for stage_name in stage}
+        yield match, "$sort" in stages, "$limit" in stages, body
+    elif name in ("count", "distinct", "findAndModify"):
+        yield body.get("query") or {}, bool(body.get("sort")), name == "findAndModify", body
+    else:
+        yield body.get("filter") or {}, bool(body.get("sort")), bool(body.get("limit")), body
+
+
+def plan_stages(node):
+    # Only the winning plan counts, so rejected and trial plans are skipped
+    if isinstance(node, dict):
+        for key, value in node.items():
+            if key in ("rejectedPlans", "allPlansExecution"):
+                continue
+            if key == "stage" and isinstance(value, str):
+                yield value
+            else:
+                yield from plan_stages(value)
+    elif isinstance(node, list):
+        for item in node:
+            yield from plan_stages(item)
+
+
+def uses_operator(node, operator: str) -> bool:
+    if isinstance(node, dict):
+        return any(key == operator or uses_operator(value, operator) for key, value in node.items())
+    if isinstance(node, list):
+        return any(uses_operator(item, operator) for item in node)
+    return False
+
+
+def allowed_scan(route, collection: str, query: dict):
+    for (allowed_method, allowed_path, allowed_collection, operator), reason in ALLOWED_SCANS.items():
+        if (allowed_method, allowed_path) == route and allowed_collection in (None, collection) and uses_operator(query, operator):
+            return reason
+    return None
+
+
+def plan_problems(route, name: str, command: dict, explain) -> list:
+    collection = command[name]
+    problems = []
+    for query, sorted_, limited, body in statements(name, command):
+        # Reading a whole collection is what an unfiltered route asks for, unless it only wants the top few
+        if not query and not (sorted_ and limited):
+            continue
+        if allowed_scan(route, collection, query):
+            continue
+        plan = explain(body)
+        if "COLLSCAN" in set(plan_stages(plan)):
+            problems.append(f"{name} on {collection} scans the collection for {query}")
+        stats = plan.get("executionStats")
+        if name != "aggregate" and stats:
+            examined, returned = stats.get("totalDocsExamined", 0), stats.get("nReturned", 0)
+            if examined > MAX_EXAMINED_RATIO * max(returned, 1) + EXAMINED_SLACK:
+                problems.append(f"{name} on {collection} examined {examined} documents to return {returned} for {query}")
+    return problems
+
+
+@pytest.fixture(scope="module")
+def mongo():
+    client = MongoClient(MONGO_URL, serverSelectionTimeoutMS=1000, tz_aware=True)
+    try:
+        hello = client.admin.command("hello")
+    except PyMongoError:
+        client.close()
+        pytest.skip(f"No MongoDB at {MONGO_URL}")
+    yield client, bool(hello.get("setName"))
+    client.close()
+
+
+@pytest.fixture(scope="module")
+def captured(mongo, tmp_path_factory):
+    """Runs every request once; returns {route: [(url, status, commands)]} and the explain helper."""
+    client, replica_set = mongo
+    database = f"query_plans_{uuid.uuid4().hex[:8]}"
+    recorder = CommandRecorder(database)
+    monitoring.register(recorder)
+
+    seed(client[database], server.hash_password(PASSWORD))
+    tokens = {role: server.create_token(user_id, role) for role, user_id in ROLE_USERS.items()}
+    results = {}
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv("DB_NAME", database)
+        patch.setenv("DATETIME_MIGRATION_ON_STARTUP", "false")
+        patch.setattr(server, "mongo_url", MONGO_URL)
+        patch.setattr(server, "EXPORT_CACHE_DIR", tmp_path_factory.mktemp("export_cache"))
+        from fastapi.testclient import TestClient
+        with TestClient(server.app) as app_client:
+            for route, requests in REQUESTS.items():
+                if route in TRANSACTION_ROUTES and not replica_set:
+                    continue
+                results[route] = []
+                for role, url, kwargs in requests:
+                    headers = {"Authorization": f"Bearer {tokens[role]}"} if role else {}
+                    recorder.recording = True
+                    response = app_client.request(route[0], url, headers=headers, **kwargs)
+                    wait_for_migration()
+                    recorder.recording = False
+                    results[route].append((url, response.status_code, recorder.take()))
+
+    def explain(body: dict) -> dict:
+        return client[database].command({"explain": body, "verbosity": "executionStats"})
+
+    yield results, explain
+    client.drop_database(database)
+
+
+def test_every_route_has_a_request():
+    routes = {(method, route.path) for route in server.api_router.routes for method in route.methods}
+    assert sorted(routes - REQUESTS.keys()) == []
+    assert sorted(REQUESTS.keys() - routes) == []
+
+
+@pytest.mark.parametrize("route", list(REQUESTS), ids=lambda route: f"{route[0]} {route[1]}")
+def test_route_query_plans(route, captured):
+    results, explain = captured
+    if route not in results:
+        pytest.skip("Needs a replica set for transactions")
+    problems = []
+    for url, status_code, commands in results[route]:
+        assert status_code < 400, f"{route[0]} {url} returned {status_code}"
+        for name, command in commands:
+            problems.extend(f"{url}: {problem}" for problem in plan_problems(route, name, command, explain))
+    assert problems == []
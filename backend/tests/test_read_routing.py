@@ -0,0 +1,151 @@
+"""
+Read routing tests
+
+The configuration tests need no server. The routing tests need a replica set with
+at least one secondary, and check which member served each route's reads:
+
+    READ_ROUTING_MONGO_URL="mongodb://localhost:27017,localhost:27018,localhost:27019/?replicaSet=rs0" \\
+        pytest tests/test_read_routing.py
+"""
+import os
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from fastapi.routing import APIRoute
+from pymongo import MongoClient, monitoring
+from pymongo.errors import PyMongoError
+
+MONGO_URL = os.environ.get("READ_ROUTING_MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("MONGO_URL", MONGO_URL)
+os.environ.setdefault("DB_NAME", "read_routing")
+
+import server  # noqa: E402
+
+READ_COMMANDS = {"find", "aggregate", "count", "distinct"}
+
+
+def get_routes():
+    return {route.path: route for route in server.api_router.routes if isinstance(route, APIRoute) and "GET" in route.methods}
+
+
+class TestReadPreferenceConfig:
+    """Every configured route exists and reads through its configured preference"""
+
+    def test_configured_routes_read_through_route_reads(self):
+        routes = get_routes()
+        for key in server.ROUTE_READ_PREFERENCES:
+            method, path = key.split(" ", 1)
+            assert method == "GET" and path in routes, f"{key} is not a GET route"
+            assert any(dep.call is server.route_reads for dep in routes[path].dependant.dependencies), \
+                f"{key} is configured but does not read through route_reads"
+
+    def test_routes_get_their_configured_handle(self, monkeypatch):
+        monkeypatch.setattr(server, "read_dbs", {mode: mode for mode in server.READ_PREFERENCE_MODES})
+        monkeypatch.setitem(server.ROUTE_READ_PREFERENCES, "GET /api/exports", "nearest")
+
+        def request(path):
+            return SimpleNamespace(method="GET", scope={"route": SimpleNamespace(path=path)})
+
+        assert server.route_reads(request("/api/orders")) == "secondaryPreferred"
+        assert server.route_reads(request("/api/exports")) == "nearest"
+        assert server.route_reads(request("/api/unlisted")) == "primary"
+
+    def test_secondaries_are_bounded_by_max_staleness(self):
+        for mode, preference in server.READ_PREFERENCE_MODES.items():
+            if mode != "primary":
+                assert preference.max_staleness == server.READ_MAX_STALENESS_SECONDS
+
+
+# ============= REPLICA SET =============
+
+class ServerRecorder(monitoring.CommandListener):
+    """Which member served each read command against one database."""
+
+    def __init__(self, database: str):
+        self.database = database
+        self.reads = []
+
+    def started(self, event):
+        if event.database_name == self.database and event.command_name in READ_COMMANDS:
+            self.reads.append((event.command_name, event.command.get(event.command_name), event.connection_id))
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+@pytest.fixture(scope="module")
+def replica_set():
+    client = MongoClient(MONGO_URL, serverSelectionTimeoutMS=1000)
+    try:
+        hello = client.admin.command("hello")
+    except PyMongoError:
+        client.close()
+        pytest.skip(f"No MongoDB at {MONGO_URL}")
+    if not hello.get("setName") or not hello.get("hosts") or len(hello["hosts"]) < 2:
+        client.close()
+        pytest.skip("Needs a replica set with a secondary")
+    yield client, hello["primary"]
+    client.close()
+
+
+@pytest.fixture(scope="module")
+def app_client(replica_set):
+    client, primary = replica_set
+    database = f"read_routing_{uuid.uuid4().hex[:8]}"
+    recorder = ServerRecorder(database)
+    monitoring.register(recorder)
+    seeded = client[database]
+    seeded.users.insert_one(
+        {"id": "user-admin", "email": "admin@routing.example.com", "full_name": "Admin", "role": "admin",
+         "status": "active", "password": server.hash_password("routing-pass")}
+    )
+    seeded.inquiries.insert_one({"id": "inquiry-0", "name": "Visitor", "status": "new", "created_at": server.utc_now()})
+    token = server.create_token("user-admin", "admin")
+    from fastapi.testclient import TestClient
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv("DB_NAME", database)
+        patch.setenv("DATETIME_MIGRATION_ON_STARTUP", "false")
+        patch.setattr(server, "mongo_url", MONGO_URL)
+        with TestClient(server.app, headers={"Authorization": f"Bearer {token}"}) as test_client:
+            yield test_client, recorder, primary
+    client.drop_database(database)
+
+
+def served_by(app_client, method, url, **kwargs):
+    test_client, recorder, primary = app_client
+    recorder.reads.clear()
+    response = test_client.request(method, url, **kwargs)
+    assert response.status_code < 400, response.text
+    return [(name, collection, "primary" if f"{host}:{port}" == primary else "secondary")
+            for name, collection, (host, port) in recorder.reads]
+
+
+class TestReadRouting:
+    """Reporting reads go to secondaries; reads that must see the request's writes stay on the primary"""
+
+    @pytest.mark.parametrize("url", [
+        "/api/admin/dashboard", "/api/partners", "/api/orders", "/api/amc", "/api/amc/invoices/all",
+        "/api/exports", "/api/inquiries",
+    ])
+    def test_reporting_routes_read_from_secondaries(self, app_client, url):
+        reads = served_by(app_client, "GET", url)
+        # The first read authenticates the caller, which always happens on the primary
+        assert reads[0] == ("find", "users", "primary")
+        assert reads[1:] and all(member == "secondary" for _, _, member in reads[1:]), reads
+
+    def test_authentication_reads_from_primary(self, app_client):
+        assert served_by(app_client, "GET", "/api/auth/me") == [("find", "users", "primary")]
+
+    def test_read_after_update_stays_on_primary(self, app_client):
+        reads = served_by(app_client, "PUT", "/api/inquiries/inquiry-0/status", params={"status": "contacted"})
+        assert reads and {member for _, _, member in reads} == {"primary"}
+
+    def test_checkout_stays_on_primary(self, app_client):
+        order = {"customer_name": "Shopper", "customer_email": "shopper@routing.example.com", "customer_phone": "555-0100",
+                 "customer_address": "1 Road", "items": [], "subtotal": 0, "total": 0}
+        reads = served_by(app_client, "POST", "/api/orders/public", json=order)
+        assert {member for _, _, member in reads} <= {"primary"}
@@ -0,0 +1,181 @@
+"""
+Admin search index tests
+
+The tokenising and pipeline tests need no server. The search tests index records
+in a local MongoDB and rank them with the real aggregation:
+
+    SEARCH_MONGO_URL=mongodb://localhost:27017 pytest tests/test_search_index.py
+"""
+import asyncio
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+from search_index import SearchEntity, SearchIndex, key, words
+
+MONGO_URL = os.environ.get("SEARCH_MONGO_URL", "mongodb://localhost:27017")
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+ENTITIES = [
+    SearchEntity("order", "orders", title="customer_name", subtitle=["order_number", "customer_email"],
+                 fields=["customer_name"], keys=["order_number", "customer_email", "customer_phone"]),
+    SearchEntity("inquiry", "inquiries", title="name", subtitle=["email"], fields=["name", "company"], keys=["email"]),
+]
+
+
+def order(order_id: str, name: str, email: str, phone: str = "", days: int = 0) -> dict:
+    return {
+        "id": order_id, "order_number": f"GA-2026-{order_id.upper()}", "customer_name": name,
+        "customer_email": email, "customer_phone": phone, "created_at": START + timedelta(days=days),
+    }
+
+
+class TestTokens:
+    """Words, prefixes and whole-value keys"""
+
+    def test_words_ignore_case_accents_and_punctuation(self):
+        assert words("Émile  O'Brien-Zola") == ["emile", "o", "brien", "zola"]
+
+    def test_phone_keys_keep_digits_and_other_keys_keep_text(self):
+        assert key("+44 (20) 7946-0958") == "442079460958"
+        assert key(" Emile@Example.COM ") == "emile@example.com"
+        assert key("GA-2026-AB12") == "ga-2026-ab12"
+        assert key("12") == "12"
+
+    def test_entry_holds_prefixes_words_and_keys(self):
+        index = SearchIndex(ENTITIES, max_prefix=4)
+        entry = index.entry("order", order("a1", "Émile Zola", "emile@zola.example.com", "555 0199"))
+        assert entry["_id"] == "order:a1" and entry["entity_id"] == "a1"
+        assert entry["title"] == "Émile Zola"
+        assert entry["subtitle"] == "GA-2026-A1 · emile@zola.example.com"
+        assert entry["title_words"] == ["emile", "zola"]
+        assert {"em", "emi", "emil", "zo", "zol", "zola", "55", "555", "5550"} <= set(entry["terms"])
+        assert "emile" not in entry["terms"]  # longer than max_prefix
+        assert "5550199" in entry["words"]
+        assert entry["keys"] == ["5550199", "emile@zola.example.com", "ga-2026-a1"]
+
+
+class TestPipeline:
+    """The query becomes one indexed match and a bounded ranking"""
+
+    def test_every_word_must_match_and_short_words_are_dropped(self):
+        index = SearchIndex(ENTITIES, max_prefix=4, candidates=50)
+        pipeline = index.pipeline("Emile a Zola emile", ["order"], limit=5)
+        prefixed = pipeline[2]["$unionWith"]["pipeline"]
+        assert prefixed[0] == {"$match": {"terms": {"$all": ["emil", "zola"]}, "type": {"$in": ["order"]}}}
+        assert prefixed[2] == {"$limit": 50}
+        assert pipeline[-2] == {"$limit": 5}
+
+    def test_exact_keys_are_looked_up_outside_the_candidate_cap(self):
+        pipeline = SearchIndex(ENTITIES, candidates=50).pipeline("John@Gmail.com", limit=5)
+        assert pipeline[:2] == [{"$match": {"keys": "john@gmail.com"}}, {"$limit": 5}]
+
+    def test_query_without_usable_words(self):
+        assert SearchIndex(ENTITIES).pipeline("a ! b") is None
+
+
+# ============= SEARCH =============
+
+@pytest.fixture(scope="module")
+def mongo():
+    client = MongoClient(MONGO_URL, serverSelectionTimeoutMS=1000)
+    try:
+        client.admin.command("ping")
+    except PyMongoError:
+        client.close()
+        pytest.skip(f"No MongoDB at {MONGO_URL}")
+    yield client
+    client.close()
+
+
+@pytest.fixture
+def database(mongo):
+    name = f"search_{uuid.uuid4().hex[:8]}"
+    yield name
+    mongo.drop_database(name)
+
+
+def run(database, scenario):
+    async def main():
+        client = AsyncIOMotorClient(MONGO_URL, tz_aware=True)
+        try:
+            db = client[database]
+            index = SearchIndex(ENTITIES)
+            await index.create_indexes(db)
+            return await scenario(db, index)
+        finally:
+            client.close()
+
+    return asyncio.run(main())
+
+
+class TestSearch:
+    """Ranked, typed hits across collections"""
+
+    def test_exact_keys_then_title_words_then_prefixes(self, database):
+        async def scenario(db, index):
+            await index.index(db, "order", order("a", "Emilia Clarke", "clarke@example.com", days=3))
+            await index.index(db, "order", order("b", "Emile Zola", "emile@zola.example.com", "020 7946 0958", days=1))
+            await index.index(db, "inquiry", {"id": "c", "name": "Zola Budd", "email": "zb@example.com", "created_at": START})
+            await index.index(db, "inquiry", {"id": "d", "name": "Zolander", "email": "z@example.com", "created_at": START + timedelta(days=5)})
+            return {
+                query: [(hit["type"], hit["id"]) for hit in await index.search(db, query)]
+                for query in ["emil", "emile", "zola", "emile@zola.example.com", "(020) 7946-0958", "nobody"]
+            }
+
+        results = run(database, scenario)
+        assert results["emil"] == [("order", "a"), ("order", "b")]  # prefix only: newest first
+        assert results["emile"] == [("order", "b")]
+        assert results["zola"] == [("order", "b"), ("inquiry", "c"), ("inquiry", "d")]
+        assert results["emile@zola.example.com"] == [("order", "b")]
+        assert results["(020) 7946-0958"] == [("order", "b")]
+        assert results["nobody"] == []
+
+    def test_exact_key_outranks_more_than_candidates_newer_prefix_matches(self, database):
+        async def scenario(db, index):
+            index.candidates = 5
+            await index.index(db, "order", order("old", "John Smith", "john@gmail.com"))
+            for n in range(10):
+                await index.index(db, "order", order(f"new{n}", f"John {n}", f"john.{n}@gmail.com", days=n + 1))
+            return await index.search(db, "john@gmail.com", limit=3)
+
+        hits = run(database, scenario)
+        assert [hit["id"] for hit in hits] == ["old", "new9", "new8"]
+
+    def test_types_filter_and_reindex_removes_missing_records(self, database):
+        async def scenario(db, index):
+            await db.orders.insert_one(order("a", "Zola Budd", "zb@example.com"))
+            await index.reindex(db, "order", "a")
+            await index.index(db, "inquiry", {"id": "c", "name": "Zola Budd", "email": "zb@example.com", "created_at": START})
+            inquiries = await index.search(db, "zola", ["inquiry"])
+            await db.orders.delete_one({"id": "a"})
+            await index.reindex(db, "order", "a")
+            return inquiries, await index.search(db, "zola")
+
+        inquiries, remaining = run(database, scenario)
+        assert [hit["type"] for hit in inquiries] == ["inquiry"]
+        assert [hit["type"] for hit in remaining] == ["inquiry"]
+
+    def test_rebuild_indexes_every_source_and_drops_stale_entries(self, database):
+        async def scenario(db, index):
+            await db.orders.insert_many([order(f"o{n}", f"Customer {n}", f"c{n}@example.com", days=n) for n in range(7)])
+            await db.orders_archive.insert_one(order("old", "Archived Customer", "old@example.com"))
+            # Indexed by an earlier run; its order has since been deleted
+            await db.search_index.insert_one({**index.entry("order", order("gone", "Deleted Customer", "gone@example.com")),
+                                              "indexed_at": START})
+            seen = []
+
+            async def progress(count):
+                seen.append(count)
+
+            indexed = await index.rebuild(db, "order", [db.orders, db.orders_archive], batch_size=3, progress=progress)
+            return indexed, seen, await index.search(db, "customer", limit=20)
+
+        indexed, seen, hits = run(database, scenario)
+        assert indexed == 8 and seen == [3, 6, 7, 8]
+        assert {hit["id"] for hit in hits} == {f"o{n}" for n in range(7)} | {"old"}
@@ -0,0 +1,79 @@
+"""
+Write concern tier tests and replica set checks (no server required)
+"""
+import asyncio
+import os
+
+import pytest
+from fastapi import HTTPException
+from pymongo import MongoClient, WriteConcern
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "write_concerns")
+
+import server  # noqa: E402
+from write_concerns import TieredDatabase  # noqa: E402
+
+DURABLE = WriteConcern(w="majority", j=True)
+FAST = WriteConcern(w=1)
+
+
+def make_db():
+    client = MongoClient("mongodb://localhost:1", connect=False)
+    return TieredDatabase(client["tiers"], {"orders": DURABLE, "crew_logs": FAST})
+
+
+class TestTieredDatabase:
+    """Collections carry their tier however they are reached"""
+
+    def test_attribute_and_item_access_use_the_tier(self):
+        db = make_db()
+        assert db.orders.write_concern == DURABLE
+        assert db["orders"].write_concern == DURABLE
+        assert db.crew_logs.write_concern == FAST
+
+    def test_other_collections_keep_the_default(self):
+        db = make_db()
+        assert db.plants.write_concern == WriteConcern()
+        assert db["users"].name == "users"
+
+    def test_database_api_passes_through(self):
+        db = make_db()
+        assert db.name == "tiers"
+        assert db.with_options(write_concern=FAST).write_concern == FAST
+
+    def test_server_policy(self):
+        policy = server.COLLECTION_WRITE_CONCERNS
+        for name in ["orders", "invoices", "partner_deals"]:
+            assert policy[name].document == {"w": "majority", "j": True}
+        for name in ["crew_logs", "stock_movements", "inquiries"]:
+            assert policy[name].document == {"w": 1}
+
+
+class HelloDatabase:
+    def __init__(self, hello: dict):
+        self.hello = hello
+
+    async def command(self, name):
+        assert name == "hello"
+        return self.hello
+
+
+class TestTransactionsRequired:
+    """Production completion needs a replica set, and says so instead of failing"""
+
+    @pytest.mark.parametrize("hello, expected", [
+        ({"isWritablePrimary": True}, False),
+        ({"isWritablePrimary": True, "setName": "rs0"}, True),
+        ({"isWritablePrimary": True, "msg": "isdbgrid"}, True),
+    ])
+    def test_topology_detection(self, monkeypatch, hello, expected):
+        monkeypatch.setattr(server, "db", HelloDatabase(hello))
+        assert asyncio.run(server.supports_transactions()) is expected
+
+    def test_standalone_server_answers_503(self, monkeypatch):
+        monkeypatch.setattr(server.app.state, "transactions", False, raising=False)
+        with pytest.raises(HTTPException) as error:
+            asyncio.run(server.complete_production("prod-1", 5, {"id": "user-admin", "role": "admin"}))
+        assert error.value.status_code == 503
+        assert "replica set" in error.value.detail
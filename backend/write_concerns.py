@@ -0,0 +1,30 @@
+"""Per-collection write concerns, applied once for every write the app makes.
+
+The app reaches collections as `db.orders` or `db["orders"]`. `TieredDatabase` wraps the
+database so those lookups return the collection already configured with its tier's write
+concern. Individual calls never choose their own. Collections without a tier keep the
+client's default. Writes inside a transaction use the transaction's write concern, as the
+driver requires.
+"""
+from typing import Dict
+
+from pymongo import WriteConcern
+
+
+class TieredDatabase:
+    """A Motor (or PyMongo) database whose collections carry their configured write concern."""
+
+    def __init__(self, database, policy: Dict[str, WriteConcern]):
+        self._database = database
+        self._collections = {name: database[name].with_options(write_concern=concern) for name, concern in policy.items()}
+
+    def __getattr__(self, name: str):
+        # Only reached for names not set on the wrapper itself: collections and the database's own API
+        if name.startswith("__"):
+            raise AttributeError(name)
+        collection = self._collections.get(name)
+        return collection if collection is not None else getattr(self._database, name)
+
+    def __getitem__(self, name: str):
+        collection = self._collections.get(name)
+        return collection if collection is not None else self._database[name]
@@ -160,8 +160,8 @@ const AdminAMC = () => {
                 <div><h4 className="font-medium text-primary mb-2">Client</h4><p className="text-primary/80">{selectedSub.client_name}</p><p className="text-sm text-primary/60">{selectedSub.client_email}</p><p className="text-sm text-primary/60">{selectedSub.property_address}</p></div>
                 <div><h4 className="font-medium text-primary mb-2">Contract</h4><p className="text-sm text-primary/60">Service: {selectedSub.service_type}</p><p className="text-sm text-primary/60 capitalize">Frequency: {selectedSub.frequency}</p><p className="text-sm text-primary/60">Amount: ${selectedSub.amount}</p><p className="text-sm text-primary/60">Next Billing: {selectedSub.next_billing_date?.split('T')[0]}</p></div>
               </div>
-              {selectedSub.visits?.length > 0 && (<div><h4 className="font-medium text-primary mb-3">Visits ({selectedSub.visits.length})</h4><div className="space-y-2">{selectedSub.visits.map(v => (<div key={v.id} className="flex items-center justify-between p-3 bg-surface/30 rounded-lg"><span className="text-primary">{v.scheduled_date}</span><Badge variant="outline">{v.status}</Badge></div>))}</div></div>)}
-              {selectedSub.invoices?.length > 0 && (<div><h4 className="font-medium text-primary mb-3">Invoices ({selectedSub.invoices.length})</h4><div className="space-y-2">{selectedSub.invoices.map(i => (<div key={i.id} className="flex items-center justify-between p-3 bg-surface/30 rounded-lg"><div><span className="font-mono text-sm">{i.invoice_number}</span><p className="text-xs text-primary/50">{i.created_at?.split('T')[0]}</p></div><div className="text-right"><span className="font-medium">${i.amount}</span><Badge className={i.status === 'paid' ? 'bg-green-100 text-green-800 ml-2' : 'bg-yellow-100 text-yellow-800 ml-2'}>{i.status}</Badge></div></div>))}</div></div>)}
+              {selectedSub.visits?.length > 0 && (<div><h4 className="font-medium text-primary mb-3">Visits ({selectedSub.children?.visits?.count ?? selectedSub.visits.length})</h4><div className="space-y-2">{selectedSub.visits.map(v => (<div key={v.id} className="flex items-center justify-between p-3 bg-surface/30 rounded-lg"><span className="text-primary">{new Date(v.scheduled_date).toLocaleDateString()}</span><Badge variant="outline">{v.status}</Badge></div>))}</div></div>)}
+              {selectedSub.invoices?.length > 0 && (<div><h4 className="font-medium text-primary mb-3">Invoices ({selectedSub.children?.invoices?.count ?? selectedSub.invoices.length})</h4><div className="space-y-2">{selectedSub.invoices.map(i => (<div key={i.id} className="flex items-center justify-between p-3 bg-surface/30 rounded-lg"><div><span className="font-mono text-sm">{i.invoice_number}</span><p className="text-xs text-primary/50">{i.created_at?.split('T')[0]}</p></div><div className="text-right"><span className="font-medium">${i.amount}</span><Badge className={i.status === 'paid' ? 'bg-green-100 text-green-800 ml-2' : 'bg-yellow-100 text-yellow-800 ml-2'}>{i.status}</Badge></div></div>))}</div></div>)}
               <div className="flex gap-3"><Button className="bg-primary hover:bg-primary/90 text-white" onClick={() => generateInvoice(selectedSub.id)}><FileText className="w-4 h-4 mr-2" />Generate Invoice</Button></div>
             </div>
           )}
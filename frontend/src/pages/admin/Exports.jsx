@@ -45,8 +45,8 @@ const AdminExports = () => {
     try {
       await axios.post(`${API}/exports`, {
         ...form,
-        total_weight: parseFloat(form.total_weight),
-        total_boxes: parseInt(form.total_boxes)
+        total_weight: form.total_weight === '' ? null : parseFloat(form.total_weight),
+        total_boxes: form.total_boxes === '' ? null : parseInt(form.total_boxes)
       });
       toast.success('Export document created!');
       setDialogOpen(false);
@@ -150,8 +150,8 @@ const AdminExports = () => {
               <div className="space-y-2"><Label>Destination Country *</Label><Input value={form.destination_country} onChange={e => setForm({...form, destination_country: e.target.value})} className="bg-paper border-primary/10" required /></div>
             </div>
             <div className="grid grid-cols-2 gap-4">
-              <div className="space-y-2"><Label>Total Weight (kg) *</Label><Input type="number" step="0.1" value={form.total_weight} onChange={e => setForm({...form, total_weight: e.target.value})} className="bg-paper border-primary/10" required /></div>
-              <div className="space-y-2"><Label>Total Boxes *</Label><Input type="number" value={form.total_boxes} onChange={e => setForm({...form, total_boxes: e.target.value})} className="bg-paper border-primary/10" required /></div>
+              <div className="space-y-2"><Label>Total Weight (kg)</Label><Input type="number" step="0.1" placeholder="Auto from packing" value={form.total_weight} onChange={e => setForm({...form, total_weight: e.target.value})} className="bg-paper border-primary/10" /></div>
+              <div className="space-y-2"><Label>Total Boxes</Label><Input type="number" placeholder="Auto from packing" value={form.total_boxes} onChange={e => setForm({...form, total_boxes: e.target.value})} className="bg-paper border-primary/10" /></div>
             </div>
             <div className="space-y-2">
               <Label>Items</Label>
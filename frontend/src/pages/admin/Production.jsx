@@ -60,7 +60,7 @@ const AdminProduction = () => {
       toast.success('Production completed!');
       setCompleteOpen(false);
       fetchProductions();
-    } catch (e) { toast.error('Failed to complete'); }
+    } catch (e) { toast.error(e.response?.data?.detail || 'Failed to complete'); }
   };
 
   const addComponent = () => {
@@ -151,7 +151,7 @@ const AdminProduction = () => {
               <Label>Components (Materials Used)</Label>
               <div className="flex gap-2">
                 <Input placeholder="Component name" value={componentInput.name} onChange={e => setComponentInput({...componentInput, name: e.target.value})} className="bg-paper border-primary/10" />
-                <Input placeholder="Qty" type="number" value={componentInput.quantity} onChange={e => setComponentInput({...componentInput, quantity: e.target.value})} className="bg-paper border-primary/10 w-24" />
+                <Input placeholder="Qty / unit" type="number" value={componentInput.quantity} onChange={e => setComponentInput({...componentInput, quantity: e.target.value})} className="bg-paper border-primary/10 w-24" />
                 <Button type="button" variant="outline" onClick={addComponent}>Add</Button>
               </div>
               {form.components.length > 0 && <div className="mt-2 flex flex-wrap gap-2">{form.components.map((c, i) => (<span key={i} className="text-sm bg-surface/30 px-3 py-1 rounded">{c.name} × {c.quantity}</span>))}</div>}
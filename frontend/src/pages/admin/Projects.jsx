@@ -160,10 +160,10 @@ const AdminProjects = () => {
               <div className="flex items-center gap-3"><Badge className={statusColors[selectedProject.status]}>{selectedProject.status.replace('_', ' ')}</Badge><Badge variant="outline">#{selectedProject.project_number}</Badge></div>
               <div className="grid grid-cols-2 gap-6">
                 <div><h4 className="font-medium text-primary mb-2">Client Information</h4><p className="text-primary/80">{selectedProject.client_name}</p>{selectedProject.client_email && <p className="text-sm text-primary/60">{selectedProject.client_email}</p>}{selectedProject.client_phone && <p className="text-sm text-primary/60">{selectedProject.client_phone}</p>}</div>
-                <div><h4 className="font-medium text-primary mb-2">Project Details</h4><p className="text-sm text-primary/60">Site: {selectedProject.site_address}</p><p className="text-sm text-primary/60">Budget: ${selectedProject.budget?.toLocaleString()}</p><p className="text-sm text-primary/60">Duration: {selectedProject.start_date} - {selectedProject.end_date}</p></div>
+                <div><h4 className="font-medium text-primary mb-2">Project Details</h4><p className="text-sm text-primary/60">Site: {selectedProject.site_address}</p><p className="text-sm text-primary/60">Budget: ${selectedProject.budget?.toLocaleString()}</p><p className="text-sm text-primary/60">Duration: {new Date(selectedProject.start_date).toLocaleDateString()} - {new Date(selectedProject.end_date).toLocaleDateString()}</p></div>
               </div>
-              {selectedProject.tasks?.length > 0 && (<div><h4 className="font-medium text-primary mb-3">Tasks ({selectedProject.tasks.length})</h4><div className="space-y-2">{selectedProject.tasks.map(t => (<div key={t.id} className="flex items-center justify-between p-3 bg-surface/30 rounded-lg"><span className="text-primary">{t.title}</span><Badge variant="outline">{t.status}</Badge></div>))}</div></div>)}
-              {selectedProject.crew_logs?.length > 0 && (<div><h4 className="font-medium text-primary mb-3">Crew Logs ({selectedProject.crew_logs.length})</h4><div className="space-y-2">{selectedProject.crew_logs.slice(0, 5).map(l => (<div key={l.id} className="flex items-center justify-between p-3 bg-surface/30 rounded-lg"><div><span className="text-primary">{l.tasks_completed}</span><p className="text-xs text-primary/50">{l.date}</p></div><span className="text-primary font-medium">{l.hours_worked}h</span></div>))}</div></div>)}
+              {selectedProject.tasks?.length > 0 && (<div><h4 className="font-medium text-primary mb-3">Tasks ({selectedProject.children?.tasks?.count ?? selectedProject.tasks.length})</h4><div className="space-y-2">{selectedProject.tasks.map(t => (<div key={t.id} className="flex items-center justify-between p-3 bg-surface/30 rounded-lg"><span className="text-primary">{t.title}</span><Badge variant="outline">{t.status}</Badge></div>))}</div></div>)}
+              {selectedProject.crew_logs?.length > 0 && (<div><h4 className="font-medium text-primary mb-3">Crew Logs ({selectedProject.children?.crew_logs?.count ?? selectedProject.crew_logs.length})</h4><div className="space-y-2">{selectedProject.crew_logs.slice(0, 5).map(l => (<div key={l.id} className="flex items-center justify-between p-3 bg-surface/30 rounded-lg"><div><span className="text-primary">{l.tasks_completed}</span><p className="text-xs text-primary/50">{new Date(l.date).toLocaleDateString()}</p></div><span className="text-primary font-medium">{l.hours_worked}h</span></div>))}</div></div>)}
             </div>
           )}
         </DialogContent>
@@ -39,6 +39,15 @@ const AdminRFQ = () => {
     setQuoteOpen(true);
   };
 
+  const runAutoQuote = async () => {
+    if (!selectedRfq) return;
+    try {
+      const res = await axios.post(`${API}/rfq/${selectedRfq.id}/auto-quote`);
+      setSelectedRfq(res.data);
+      setQuoteForm({ ...quoteForm, amount: res.data.auto_quote.subtotal });
+    } catch (e) { toast.error('Failed to generate auto-quote'); }
+  };
+
   const submitQuote = async () => {
     if (!selectedRfq) return;
     try {
@@ -109,15 +118,23 @@ const AdminRFQ = () => {
               <h4 className="font-medium text-primary mb-2">Request Details</h4>
               <p className="text-sm text-primary/60">Company: {selectedRfq?.company_name}</p>
               <p className="text-sm text-primary/60">Items: {selectedRfq?.items?.length || 0}</p>
-              <p className="text-sm text-primary/60">Delivery by: {selectedRfq?.delivery_date}</p>
+              <p className="text-sm text-primary/60">Delivery by: {selectedRfq?.delivery_date && new Date(selectedRfq.delivery_date).toLocaleDateString()}</p>
               {selectedRfq?.notes && <p className="text-sm text-primary/60 mt-2">Notes: {selectedRfq.notes}</p>}
             </div>
+            {selectedRfq?.auto_quote && (
+              <div className="bg-surface/50 p-4 rounded-lg text-sm text-primary/60 space-y-1">
+                <h4 className="font-medium text-primary mb-2">Auto-quote</h4>
+                <p>Subtotal: ${selectedRfq.auto_quote.subtotal} (list ${selectedRfq.auto_quote.list_total}, margin {selectedRfq.auto_quote.margin_pct}%)</p>
+                {selectedRfq.auto_quote.unmatched_lines.length > 0 && <p className="text-yellow-700">{selectedRfq.auto_quote.unmatched_lines.length} lines not matched to the catalog</p>}
+                {selectedRfq.auto_quote.out_of_stock_lines.length > 0 && <p className="text-red-700">{selectedRfq.auto_quote.out_of_stock_lines.length} lines short on stock</p>}
+              </div>
+            )}
             <div className="grid grid-cols-2 gap-4">
               <div className="space-y-2"><Label>Quote Amount ($) *</Label><Input type="number" value={quoteForm.amount} onChange={e => setQuoteForm({...quoteForm, amount: e.target.value})} className="bg-paper border-primary/10" required /></div>
               <div className="space-y-2"><Label>Valid Until *</Label><Input type="date" value={quoteForm.valid_until} onChange={e => setQuoteForm({...quoteForm, valid_until: e.target.value})} className="bg-paper border-primary/10" required /></div>
             </div>
             <div className="space-y-2"><Label>Notes</Label><Textarea value={quoteForm.notes} onChange={e => setQuoteForm({...quoteForm, notes: e.target.value})} className="bg-paper border-primary/10" rows={3} placeholder="Additional terms or notes..." /></div>
-            <div className="flex justify-end gap-3 pt-2"><Button variant="ghost" onClick={() => setQuoteOpen(false)}>Cancel</Button><Button className="bg-primary hover:bg-primary/90 text-white" onClick={submitQuote} disabled={!quoteForm.amount || !quoteForm.valid_until}>Send Quote</Button></div>
+            <div className="flex justify-end gap-3 pt-2"><Button variant="ghost" onClick={() => setQuoteOpen(false)}>Cancel</Button><Button variant="outline" onClick={runAutoQuote}><DollarSign className="w-4 h-4 mr-1" />Auto-quote</Button><Button className="bg-primary hover:bg-primary/90 text-white" onClick={submitQuote} disabled={!quoteForm.amount || !quoteForm.valid_until}>Send Quote</Button></div>
           </div>
         </DialogContent>
       </Dialog>